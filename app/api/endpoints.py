@@ -1,26 +1,103 @@
 """
 API endpoints for the OSINT Weather Aggregator.
 """
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
-from app.services.aggregator import aggregate_all_data
-from app.database import get_db
-from app.models.data_record import DataRecord
-from app.schemas.data_record import DataRecordReadLatest
+from datetime import datetime
+from typing import AsyncIterator, List, Literal, Optional
+import httpx
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.services.aggregator import slim_results
+from app.services.jobs import refresh_jobs
+from app.services.http_client import get_http_client, get_connection_stats
+from app.services.rate_limit import get_rate_limit_stats
+from app.services.llm_cache import get_cache_stats
+from app.services.weather_cache import get_weather_cache_stats
+from app.services.latest_cache import latest_record_cache, get_latest_cache_stats
+from app.api.http_cache import make_etag, cache_headers, is_not_modified, not_modified_response
+from app.api.pagination import encode_cursor, decode_cursor
+from app.database import AsyncSessionLocal, get_async_db
+from app.crud.data_record import (
+    get_latest_record,
+    get_record,
+    get_record_payload,
+    history_query,
+    get_history_page,
+    stream_history,
+)
+from app.crud.rollup import get_rollups
+from app.schemas.data_record import DataRecordReadLatest, DataRecordPage, DataRecordRaw
+from app.schemas.rollup import DataRollupRead
 
 router = APIRouter()
 
+HISTORY_PAGE_SIZE = 100
+HISTORY_MAX_PAGE_SIZE = 1000
 
-@router.post("/data/refresh")
-async def trigger_aggregation():
+
+@router.post("/data/refresh", status_code=202)
+async def trigger_aggregation(
+    request: Request,
+    response: Response,
+    wait: bool = Query(False, description="Wait for the run and return its results"),
+    slim: bool = Query(False, description="With wait=true, leave the raw source payloads out of the results"),
+    client: httpx.AsyncClient = Depends(get_http_client)
+):
     """
-    Manually trigger data aggregation from all sources.
+    Trigger data aggregation from all sources as a background job.
+
+    If a refresh of the same targets is already running, the trigger joins
+    it instead of starting a duplicate run.
 
     Returns:
-        Dict containing aggregation results and statistics
+        202 with the job ID and its status URL, or with wait=true,
+        the aggregation results and statistics (without raw payloads if slim)
+
+    Raises:
+        HTTPException: 400 if slim=true without wait=true (use GET /jobs/{job_id}?slim=true),
+            500 if wait=true and the run failed
     """
-    results = await aggregate_all_data()
-    return results
+    if slim and not wait:
+        raise HTTPException(
+            status_code=400,
+            detail="slim=true requires wait=true; poll GET /jobs/{job_id}?slim=true for slim job results"
+        )
+    job, created = await refresh_jobs.submit(client=client)
+    if wait:
+        await refresh_jobs.wait(job)
+        if job.result is None:
+            raise HTTPException(status_code=500, detail=f"Refresh job {job.status}: {job.error}")
+        # Results are plain JSON types, so they skip jsonable_encoder and go straight to orjson
+        return ORJSONResponse(slim_results(job.result) if slim else job.result)
+
+    status_url = str(request.url_for("get_refresh_job", job_id=job.id))
+    response.headers["Location"] = status_url
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "deduplicated": not created,
+        "status_url": status_url
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_refresh_job(
+    job_id: str,
+    slim: bool = Query(False, description="Leave the raw source payloads out of the results")
+):
+    """
+    Get a refresh job's status, per-stage progress and timings, and its results once finished.
+
+    Returns:
+        Dict with the job status, stages and result
+
+    Raises:
+        HTTPException: 404 if the job is unknown or has been forgotten
+    """
+    job = await refresh_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Refresh job not found")
+    return ORJSONResponse(job.to_dict(slim=slim))
 
 
 @router.get("/status")
@@ -33,26 +110,159 @@ async def get_status():
     """
     return {
         "status": "operational",
-        "message": "OSINT Weather Aggregator is running"
+        "message": "OSINT Weather Aggregator is running",
+        "http_pool": get_connection_stats(),
+        "upstream_limits": get_rate_limit_stats(),
+        "llm_cache": get_cache_stats(),
+        "weather_cache": get_weather_cache_stats(),
+        "latest_cache": get_latest_cache_stats()
     }
 
 
 @router.get("/data/latest", response_model=DataRecordReadLatest)
-async def get_latest_data(db: Session = Depends(get_db)):
+async def get_latest_data(
+    request: Request,
+    response: Response,
+    city: Optional[str] = Query(None, description="Only consider records for this city"),
+    brand: Optional[str] = Query(None, description="Only consider records for this brand"),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     Get the most recent data record (excludes raw API responses).
 
+    Served from the in-process latest-record cache when possible. Supports
+    conditional requests: If-None-Match / If-Modified-Since get an empty 304
+    while the latest record is unchanged.
+
     Returns:
         Latest data record without raw fields
 
     Raises:
         HTTPException: 404 if no data records exist
     """
-    latest_record = db.query(DataRecord).order_by(
-        DataRecord.aggregation_timestamp_utc.desc()
-    ).first()
+    latest = latest_record_cache.get(city, brand)
+    if latest is None:
+        generation = latest_record_cache.generation
+        latest_record = await get_latest_record(db, city=city, brand=brand)
+
+        if not latest_record:
+            raise HTTPException(status_code=404, detail="No data records found")
+
+        latest = DataRecordReadLatest.model_validate(latest_record)
+        latest_record_cache.set(city, brand, latest, generation)
+
+    etag = make_etag(latest.id, latest.aggregation_timestamp_utc)
+    headers = cache_headers(etag, latest.aggregation_timestamp_utc)
+    if is_not_modified(request, etag, latest.aggregation_timestamp_utc):
+        return not_modified_response(headers)
+
+    response.headers.update(headers)
+    return latest
+
+
+@router.get("/data/history", response_model=DataRecordPage)
+async def get_history(
+    start: Optional[datetime] = Query(None, description="Only records at or after this time (UTC)"),
+    end: Optional[datetime] = Query(None, description="Only records before this time (UTC)"),
+    city: Optional[str] = Query(None, description="Only records for this city"),
+    brand: Optional[str] = Query(None, description="Only records for this brand"),
+    order: Literal["desc", "asc"] = Query("desc", description="Newest first (desc) or oldest first (asc)"),
+    limit: Optional[int] = Query(None, ge=1, description="Page size (default 100, max 1000); no limit when streaming"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    format: Literal["json", "ndjson"] = Query("json", description="json pages or a streamed NDJSON export"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get record history (excludes raw API responses), filtered by time range, city and brand.
+
+    JSON mode returns one page plus a `next_cursor` for keyset pagination on
+    (timestamp, id). NDJSON mode streams every matching record, one JSON
+    object per line, from a server-side cursor.
+
+    Returns:
+        Page of records, or an NDJSON stream
+
+    Raises:
+        HTTPException: 400 if the cursor is invalid or the page size is too large
+    """
+    after = decode_cursor(cursor) if cursor else None
+    query = history_query(start, end, city, brand, after, descending=order == "desc")
+
+    if format == "ndjson":
+        return StreamingResponse(_stream_ndjson(query, limit), media_type="application/x-ndjson")
+
+    limit = limit or HISTORY_PAGE_SIZE
+    if limit > HISTORY_MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be at most {HISTORY_MAX_PAGE_SIZE}")
+
+    records, has_more = await get_history_page(db, query, limit)
+    last = records[-1] if records else None
+    return DataRecordPage(
+        items=[DataRecordReadLatest.model_validate(record) for record in records],
+        next_cursor=encode_cursor(last.aggregation_timestamp_utc, last.id) if has_more else None
+    )
+
+
+async def _stream_ndjson(query, limit: Optional[int]) -> AsyncIterator[bytes]:
+    # The stream outlives the request handler, so it gets its own session
+    async with AsyncSessionLocal() as db:
+        async for record in stream_history(db, query, limit):
+            yield DataRecordReadLatest.model_validate(record).model_dump_json().encode("utf-8") + b"\n"
+
+
+@router.get("/data/rollups", response_model=List[DataRollupRead])
+async def get_rollup_data(
+    period: Literal["day", "week"] = Query("day", description="Rollup period (weeks start on Monday)"),
+    city: Optional[str] = Query(None, description="Only buckets for this city"),
+    brand: Optional[str] = Query(None, description="Only buckets for this brand"),
+    start: Optional[datetime] = Query(None, description="Only periods starting at or after this time (UTC)"),
+    end: Optional[datetime] = Query(None, description="Only periods starting before this time (UTC)"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of buckets"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get daily or weekly averages and record counts per city and brand.
+
+    Reads only the incrementally maintained rollup table, never data_records.
+
+    Returns:
+        Rollup buckets, newest period first
+    """
+    rollups = await get_rollups(db, period, city=city, brand=brand, start=start, end=end, limit=limit)
+    return [DataRollupRead.from_rollup(rollup) for rollup in rollups]
+
+
+@router.get("/data/{record_id}/raw", response_model=DataRecordRaw)
+async def get_raw_data(
+    record_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get the raw weather, OSINT and Gemini responses behind one data record.
+
+    Raw payloads are stored compressed in a side table and only read here,
+    never by the list / latest queries. Compaction deletes the payloads of
+    old records while keeping the records themselves.
+
+    Returns:
+        Raw API responses of the record
+
+    Raises:
+        HTTPException: 404 if the record doesn't exist, 410 if its raw payload was compacted
+    """
+    payload = await get_record_payload(db, record_id)
+    if payload is None:
+        if await get_record(db, record_id) is not None:
+            raise HTTPException(status_code=410, detail="Raw payload was removed by compaction")
+        raise HTTPException(status_code=404, detail="Data record not found")
 
-    if not latest_record:
-        raise HTTPException(status_code=404, detail="No data records found")
+    # Payloads never change after insert, so the record id identifies them
+    etag = f'"raw-{record_id}"'
+    headers = cache_headers(etag, immutable=True)
+    if is_not_modified(request, etag):
+        return not_modified_response(headers)
 
-    return latest_record
+    response.headers.update(headers)
+    return DataRecordRaw.model_validate(payload)
@@ -0,0 +1,109 @@
+"""
+HTTP conditional caching helpers for read endpoints.
+
+Records never change once written, so a record's id and timestamp identify
+its representation exactly: they make a strong ETag and the Last-Modified
+date. Pollers that send If-None-Match / If-Modified-Since get an empty 304
+when nothing changed, and Cache-Control lets a CDN or reverse proxy answer
+repeat polls on its own.
+"""
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+from fastapi import Request, Response
+from app.config import API_CACHE_MAX_AGE_SECONDS, API_CACHE_STALE_WHILE_REVALIDATE_SECONDS
+
+# One year, the conventional maximum for content that never changes
+IMMUTABLE_MAX_AGE_SECONDS = 31536000
+
+
+def make_etag(record_id: int, timestamp: datetime) -> str:
+    """
+    Build a strong ETag for a record.
+
+    Args:
+        record_id: Record ID
+        timestamp: Record aggregation timestamp
+
+    Returns:
+        Quoted ETag value
+    """
+    return f'"{record_id}-{int(_as_utc(timestamp).timestamp() * 1_000_000)}"'
+
+
+def cache_headers(
+    etag: str,
+    last_modified: Optional[datetime] = None,
+    immutable: bool = False
+) -> Dict[str, str]:
+    """
+    Build the caching headers for a read response.
+
+    Args:
+        etag: ETag from make_etag
+        last_modified: When the representation last changed (UTC)
+        immutable: The representation can never change (e.g. one record's raw payload)
+
+    Returns:
+        Dict of ETag, Last-Modified and Cache-Control headers
+    """
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_as_utc(last_modified).replace(microsecond=0), usegmt=True)
+    if immutable:
+        headers["Cache-Control"] = f"public, max-age={IMMUTABLE_MAX_AGE_SECONDS}, immutable"
+    else:
+        headers["Cache-Control"] = (
+            f"public, max-age={API_CACHE_MAX_AGE_SECONDS}, "
+            f"stale-while-revalidate={API_CACHE_STALE_WHILE_REVALIDATE_SECONDS}"
+        )
+    return headers
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    Evaluate the request's conditional headers (RFC 9110 section 13.2.2).
+
+    If-None-Match takes precedence; If-Modified-Since is only used without it.
+
+    Args:
+        request: Incoming request
+        etag: Current ETag of the representation
+        last_modified: When the representation last changed (UTC)
+
+    Returns:
+        True if the client's copy is still current
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # Weak comparison: W/"x" matches "x"
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return etag.removeprefix("W/") in candidates
+
+    if_modified_since = _parse_http_date(request.headers.get("if-modified-since"))
+    if if_modified_since is not None and last_modified is not None:
+        # HTTP dates have one-second resolution
+        return _as_utc(last_modified).replace(microsecond=0) <= if_modified_since
+    return False
+
+
+def not_modified_response(headers: Dict[str, str]) -> Response:
+    """Build an empty 304 response carrying the caching headers."""
+    return Response(status_code=304, headers=headers)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Timestamps are stored as naive UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def _parse_http_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return _as_utc(parsedate_to_datetime(value))
+    except (TypeError, ValueError):
+        # Invalid dates are ignored, as the spec requires
+        return None
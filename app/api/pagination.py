@@ -0,0 +1,48 @@
+"""
+Opaque keyset-pagination cursors.
+
+A cursor is the (aggregation timestamp, id) of the last row a client has
+seen, base64url-encoded so clients treat it as an opaque token.
+"""
+import base64
+from datetime import datetime
+from typing import Tuple
+from fastapi import HTTPException
+
+Cursor = Tuple[datetime, int]
+
+
+def encode_cursor(timestamp: datetime, record_id: int) -> str:
+    """
+    Encode the position after a row.
+
+    Args:
+        timestamp: Row aggregation timestamp
+        record_id: Row ID
+
+    Returns:
+        Opaque cursor string
+    """
+    raw = f"{timestamp.isoformat()}|{record_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """
+    Decode a cursor from encode_cursor.
+
+    Args:
+        cursor: Opaque cursor string
+
+    Returns:
+        Tuple of (timestamp, record id)
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        timestamp, record_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(record_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -0,0 +1,56 @@
+"""
+Rollup backfill script.
+Run this to rebuild the data_rollups table from the full record history,
+e.g. after upgrading a database that predates rollups.
+"""
+import logging
+from sqlalchemy import delete, select
+from app.crud.rollup import apply_rollups_sync
+from app.database import SessionLocal, init_db
+from app.models.data_record import DataRecord
+from app.models.rollup import DataRollup
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def backfill_rollups(batch_size: int = 5000) -> int:
+    """
+    Rebuild every rollup bucket from data_records in one transaction.
+
+    Records are streamed in batches and each batch is folded into the
+    buckets with one multi-row upsert. Pause refreshes while it runs, or
+    records inserted meanwhile may be counted twice.
+
+    Args:
+        batch_size: Records read per round trip
+
+    Returns:
+        Number of records rolled up
+    """
+    columns = select(
+        DataRecord.aggregation_timestamp_utc,
+        DataRecord.city_name,
+        DataRecord.brand_name,
+        DataRecord.current_temperature_c,
+        DataRecord.popularity_score
+    ).execution_options(yield_per=batch_size)
+
+    total = 0
+    db = SessionLocal()
+    try:
+        db.execute(delete(DataRollup))
+        for batch in db.execute(columns).partitions():
+            apply_rollups_sync(db, batch)
+            total += len(batch)
+        db.commit()
+    finally:
+        db.close()
+    return total
+
+
+if __name__ == "__main__":
+    init_db()
+    logger.info("Rebuilding rollups from record history...")
+    count = backfill_rollups()
+    logger.info(f"Rolled up {count} records")
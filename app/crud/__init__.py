@@ -1,6 +1,31 @@
 """
 CRUD operations module.
 """
-from app.crud.data_record import create_data_record
+from app.crud.data_record import (
+    create_data_record,
+    create_data_records,
+    create_data_record_sync,
+    get_latest_record,
+    get_latest_record_by_brand,
+    get_record,
+    get_record_payload,
+    history_query,
+    get_history_page,
+    stream_history,
+)
+from app.crud.rollup import apply_rollups, get_rollups
 
-__all__ = ["create_data_record"]
+__all__ = [
+    "create_data_record",
+    "create_data_records",
+    "create_data_record_sync",
+    "get_latest_record",
+    "get_latest_record_by_brand",
+    "get_record",
+    "get_record_payload",
+    "history_query",
+    "get_history_page",
+    "stream_history",
+    "apply_rollups",
+    "get_rollups",
+]
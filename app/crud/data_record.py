@@ -1,41 +1,307 @@
 """
 CRUD operations for data records.
+
+The API and the aggregator use the async functions; create_data_record_sync
+is kept for scripts that run outside an event loop.
 """
 import logging
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+from sqlalchemy import Select, and_, insert, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.models.data_record import DataRecord
+from app.models.data_record_payload import DataRecordPayload
 from app.schemas.data_record import DataRecordCreate
+from app.crud.rollup import apply_rollups, apply_rollups_sync
+from app.services.latest_cache import latest_record_cache
 
 logger = logging.getLogger(__name__)
 
 
-def create_data_record(db: Session, record: DataRecordCreate) -> DataRecord:
+def _build_record(record: DataRecordCreate) -> DataRecord:
+    return DataRecord(
+        aggregation_timestamp_utc=record.aggregation_timestamp_utc,
+        city_name=record.city_name,
+        current_temperature_c=record.current_temperature_c,
+        brand_name=record.brand_name,
+        sentiment_summary=record.sentiment_summary,
+        news_summary=record.news_summary,
+        popularity_score=record.popularity_score,
+        payload=DataRecordPayload(
+            raw_weather_response=record.raw_weather_response,
+            raw_osint_response=record.raw_osint_response,
+            raw_gemini_response=record.raw_gemini_response
+        )
+    )
+
+
+async def create_data_record(db: AsyncSession, record: DataRecordCreate) -> DataRecord:
     """
     Create a new data record in the database.
 
     Args:
-        db: Database session
+        db: Async database session
         record: DataRecordCreate schema with record data (already transformed)
 
     Returns:
         Created DataRecord instance with auto-generated ID
     """
-    db_record = DataRecord(
-        aggregation_timestamp_utc=record.aggregation_timestamp_utc,
-        city_name=record.city_name,
-        current_temperature_c=record.current_temperature_c,
-        brand_name=record.brand_name,
-        sentiment_summary=record.sentiment_summary,
-        news_summary=record.news_summary,
-        popularity_score=record.popularity_score,
-        raw_weather_response=record.raw_weather_response,
-        raw_osint_response=record.raw_osint_response,
-        raw_gemini_response=record.raw_gemini_response
+    db_record = _build_record(record)
+
+    db.add(db_record)
+    await apply_rollups(db, [record])
+    await db.commit()
+    await db.refresh(db_record)
+    latest_record_cache.invalidate(db_record.city_name, db_record.brand_name)
+
+    logger.info(f"Created data record ID {db_record.id}: {record.city_name}, {record.brand_name}")
+    return db_record
+
+
+async def create_data_records(db: AsyncSession, records: List[DataRecordCreate]) -> List[int]:
+    """
+    Create a batch of data records in one transaction.
+
+    Rows are written with multi-row INSERT statements (RETURNING the new
+    IDs), followed by one batched insert of their raw payloads, instead of
+    an add / commit / refresh round trip per record.
+
+    Args:
+        db: Async database session
+        records: DataRecordCreate schemas (already transformed)
+
+    Returns:
+        IDs of the created records, in the same order as records
+    """
+    if not records:
+        return []
+
+    result = await db.execute(
+        insert(DataRecord).returning(DataRecord.id, sort_by_parameter_order=True),
+        [
+            {
+                "aggregation_timestamp_utc": record.aggregation_timestamp_utc,
+                "city_name": record.city_name,
+                "current_temperature_c": record.current_temperature_c,
+                "brand_name": record.brand_name,
+                "sentiment_summary": record.sentiment_summary,
+                "news_summary": record.news_summary,
+                "popularity_score": record.popularity_score
+            }
+            for record in records
+        ]
     )
+    ids = list(result.scalars())
+
+    await db.execute(
+        insert(DataRecordPayload),
+        [
+            {
+                "record_id": record_id,
+                "raw_weather_response": record.raw_weather_response,
+                "raw_osint_response": record.raw_osint_response,
+                "raw_gemini_response": record.raw_gemini_response
+            }
+            for record_id, record in zip(ids, records)
+        ]
+    )
+    await apply_rollups(db, records)
+    await db.commit()
+
+    for city_name, brand_name in {(record.city_name, record.brand_name) for record in records}:
+        latest_record_cache.invalidate(city_name, brand_name)
+
+    logger.info(f"Created {len(ids)} data records in one batch")
+    return ids
+
+
+def create_data_record_sync(db: Session, record: DataRecordCreate) -> DataRecord:
+    """
+    Create a new data record with a sync session (for scripts).
+
+    Args:
+        db: Database session
+        record: DataRecordCreate schema with record data (already transformed)
+
+    Returns:
+        Created DataRecord instance with auto-generated ID
+    """
+    db_record = _build_record(record)
 
     db.add(db_record)
+    apply_rollups_sync(db, [record])
     db.commit()
     db.refresh(db_record)
+    latest_record_cache.invalidate(db_record.city_name, db_record.brand_name)
 
     logger.info(f"Created data record ID {db_record.id}: {record.city_name}, {record.brand_name}")
     return db_record
+
+
+async def get_latest_record(
+    db: AsyncSession,
+    city: Optional[str] = None,
+    brand: Optional[str] = None
+) -> Optional[DataRecord]:
+    """
+    Get the most recent data record, optionally for one city and/or brand.
+
+    Args:
+        db: Async database session
+        city: Only consider records for this city
+        brand: Only consider records for this brand
+
+    Returns:
+        Latest matching DataRecord, or None if there is none
+    """
+    query = select(DataRecord)
+    if city is not None:
+        query = query.where(DataRecord.city_name == city)
+    if brand is not None:
+        query = query.where(DataRecord.brand_name == brand)
+    result = await db.execute(
+        query.order_by(DataRecord.aggregation_timestamp_utc.desc()).limit(1)
+    )
+    return result.scalars().first()
+
+
+async def get_latest_record_by_brand(db: AsyncSession, brand_name: str) -> Optional[DataRecord]:
+    """
+    Get the most recent data record for a brand.
+
+    Args:
+        db: Async database session
+        brand_name: Brand to look up
+
+    Returns:
+        Latest DataRecord for the brand, or None if there is none
+    """
+    return await get_latest_record(db, brand=brand_name)
+
+
+async def get_record(db: AsyncSession, record_id: int) -> Optional[DataRecord]:
+    """
+    Get a data record by ID.
+
+    Args:
+        db: Async database session
+        record_id: Data record ID
+
+    Returns:
+        DataRecord, or None if it doesn't exist
+    """
+    return await db.get(DataRecord, record_id)
+
+
+async def get_record_payload(db: AsyncSession, record_id: int) -> Optional[DataRecordPayload]:
+    """
+    Get the raw API responses stored for a record.
+
+    Args:
+        db: Async database session
+        record_id: Data record ID
+
+    Returns:
+        DataRecordPayload, or None if the record doesn't exist or was compacted
+    """
+    return await db.get(DataRecordPayload, record_id)
+
+
+def history_query(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    city: Optional[str] = None,
+    brand: Optional[str] = None,
+    after: Optional[Tuple[datetime, int]] = None,
+    descending: bool = True
+) -> Select:
+    """
+    Build the keyset-paginated history query.
+
+    Rows are ordered by (aggregation timestamp, id), so a page starts right
+    after the last row of the previous one with an indexed range condition,
+    however deep the client has paged.
+
+    Args:
+        start: Only records at or after this time (UTC)
+        end: Only records before this time (UTC)
+        city: Only records for this city
+        brand: Only records for this brand
+        after: (timestamp, id) of the last row already returned
+        descending: Newest first (default) or oldest first
+
+    Returns:
+        SELECT statement for DataRecord rows
+    """
+    timestamp, record_id = DataRecord.aggregation_timestamp_utc, DataRecord.id
+    query = select(DataRecord)
+    if start is not None:
+        query = query.where(timestamp >= start)
+    if end is not None:
+        query = query.where(timestamp < end)
+    if city is not None:
+        query = query.where(DataRecord.city_name == city)
+    if brand is not None:
+        query = query.where(DataRecord.brand_name == brand)
+    if after is not None:
+        after_timestamp, after_id = after
+        if descending:
+            query = query.where(or_(
+                timestamp < after_timestamp, and_(timestamp == after_timestamp, record_id < after_id)
+            ))
+        else:
+            query = query.where(or_(
+                timestamp > after_timestamp, and_(timestamp == after_timestamp, record_id > after_id)
+            ))
+    if descending:
+        return query.order_by(timestamp.desc(), record_id.desc())
+    return query.order_by(timestamp.asc(), record_id.asc())
+
+
+async def get_history_page(db: AsyncSession, query: Select, limit: int) -> Tuple[List[DataRecord], bool]:
+    """
+    Fetch one page of a history query.
+
+    Args:
+        db: Async database session
+        query: Query from history_query
+        limit: Page size
+
+    Returns:
+        Tuple of (records, whether more records follow)
+    """
+    result = await db.execute(query.limit(limit + 1))
+    records = list(result.scalars())
+    return records[:limit], len(records) > limit
+
+
+async def stream_history(
+    db: AsyncSession,
+    query: Select,
+    limit: Optional[int] = None,
+    batch_size: int = 500
+) -> AsyncIterator[DataRecord]:
+    """
+    Stream a history query from a server-side cursor.
+
+    Rows are fetched batch_size at a time, so memory stays flat however
+    many records match.
+
+    Args:
+        db: Async database session
+        query: Query from history_query
+        limit: Optional maximum number of records
+        batch_size: Rows fetched per round trip
+
+    Yields:
+        DataRecord rows in query order
+    """
+    if limit is not None:
+        query = query.limit(limit)
+    result = await db.stream(query.execution_options(yield_per=batch_size))
+    try:
+        async for record in result.scalars():
+            yield record
+    finally:
+        await result.close()
@@ -0,0 +1,167 @@
+"""
+CRUD operations for the data_rollups table.
+
+Rollups hold running sums and counts per (period, period start, city,
+brand), so daily and weekly averages are read without scanning
+data_records. They are updated in the same transaction as every record
+insert with an atomic upsert (INSERT ... ON CONFLICT DO UPDATE, supported by
+Postgres and SQLite), which keeps concurrent writers consistent.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.models.rollup import DataRollup
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ("day", "week")
+
+_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def period_start(period: str, timestamp: datetime) -> datetime:
+    """
+    Get the start of the period a timestamp falls into.
+
+    Args:
+        period: "day" or "week" (weeks start on Monday)
+        timestamp: UTC timestamp
+
+    Returns:
+        UTC midnight of the day, or of the week's Monday
+
+    Raises:
+        ValueError: If the period is unknown
+    """
+    day = timestamp.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+    if period == "day":
+        return day
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    raise ValueError(f"Unknown rollup period: {period}")
+
+
+def rollup_deltas(records: Iterable[Any]) -> List[Dict[str, Any]]:
+    """
+    Sum records into per-bucket increments.
+
+    Args:
+        records: Objects with aggregation_timestamp_utc, city_name, brand_name,
+            current_temperature_c and popularity_score (records, schemas or rows)
+
+    Returns:
+        One row of increments per (period, period start, city, brand)
+    """
+    buckets: Dict[Tuple[str, datetime, str, str], Dict[str, Any]] = {}
+    now = datetime.utcnow()
+    for record in records:
+        for period in PERIODS:
+            key = (period, period_start(period, record.aggregation_timestamp_utc), record.city_name, record.brand_name)
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = {
+                    "period": key[0],
+                    "period_start": key[1],
+                    "city_name": key[2],
+                    "brand_name": key[3],
+                    "record_count": 0,
+                    "temperature_sum": 0.0,
+                    "popularity_sum": 0.0,
+                    "popularity_count": 0,
+                    "updated_at": now
+                }
+            bucket["record_count"] += 1
+            bucket["temperature_sum"] += record.current_temperature_c
+            if record.popularity_score is not None:
+                bucket["popularity_sum"] += record.popularity_score
+                bucket["popularity_count"] += 1
+    return list(buckets.values())
+
+
+def _upsert(dialect_name: str, rows: List[Dict[str, Any]]):
+    if dialect_name not in _INSERTS:
+        raise RuntimeError(f"Rollups need INSERT ... ON CONFLICT; unsupported database: {dialect_name}")
+    stmt = _INSERTS[dialect_name](DataRollup).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=["period", "period_start", "city_name", "brand_name"],
+        set_={
+            "record_count": DataRollup.record_count + stmt.excluded.record_count,
+            "temperature_sum": DataRollup.temperature_sum + stmt.excluded.temperature_sum,
+            "popularity_sum": DataRollup.popularity_sum + stmt.excluded.popularity_sum,
+            "popularity_count": DataRollup.popularity_count + stmt.excluded.popularity_count,
+            "updated_at": stmt.excluded.updated_at
+        }
+    )
+
+
+async def apply_rollups(db: AsyncSession, records: Iterable[Any]) -> None:
+    """
+    Add records to their rollup buckets, in the caller's transaction.
+
+    Args:
+        db: Async database session (committed by the caller)
+        records: Newly inserted records
+    """
+    rows = rollup_deltas(records)
+    if rows:
+        await db.execute(_upsert(db.get_bind().dialect.name, rows))
+
+
+def apply_rollups_sync(db: Session, records: Iterable[Any]) -> None:
+    """
+    Add records to their rollup buckets with a sync session, in the caller's transaction.
+
+    Args:
+        db: Database session (committed by the caller)
+        records: Newly inserted records
+    """
+    rows = rollup_deltas(records)
+    if rows:
+        db.execute(_upsert(db.get_bind().dialect.name, rows))
+
+
+async def get_rollups(
+    db: AsyncSession,
+    period: str,
+    city: Optional[str] = None,
+    brand: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 100
+) -> List[DataRollup]:
+    """
+    Get rollup buckets, newest period first.
+
+    Args:
+        db: Async database session
+        period: "day" or "week"
+        city: Only buckets for this city
+        brand: Only buckets for this brand
+        start: Only periods starting at or after this time (UTC)
+        end: Only periods starting before this time (UTC)
+        limit: Maximum number of buckets
+
+    Returns:
+        List of DataRollup rows
+    """
+    query = select(DataRollup).where(DataRollup.period == period)
+    if city is not None:
+        query = query.where(DataRollup.city_name == city)
+    if brand is not None:
+        query = query.where(DataRollup.brand_name == brand)
+    if start is not None:
+        query = query.where(DataRollup.period_start >= start)
+    if end is not None:
+        query = query.where(DataRollup.period_start < end)
+    query = query.order_by(
+        DataRollup.period_start.desc(), DataRollup.city_name, DataRollup.brand_name
+    ).limit(limit)
+    result = await db.execute(query)
+    return list(result.scalars())
@@ -1,23 +1,104 @@
 """
 Database connection and session management.
+
+The API and the aggregator use the async engine (asyncpg / aiosqlite) so
+database round trips never block the event loop. The sync engine remains
+for scripts such as app/init_db.py and the maintenance CLI, which run in
+their own processes; inside the app every write goes through the async
+engine, so SQLite never sees two engines competing for its write lock.
 """
 import logging
-from sqlalchemy import create_engine
+from typing import Any, AsyncIterator, Dict
+from sqlalchemy import create_engine, inspect, select, text
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
-from app.config import DATABASE_URL
+from sqlalchemy.pool import NullPool
+from app.config import (
+    DATABASE_URL,
+    ASYNC_DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT_SECONDS,
+    DB_POOL_RECYCLE_SECONDS,
+    DB_POOL_PRE_PING,
+)
+from app.serialization import json_serializer, loads
 
 logger = logging.getLogger(__name__)
 
+# Async driver for each sync backend
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> URL:
+    """
+    Derive the async driver URL from a sync database URL.
+
+    Args:
+        url: Database URL, e.g. postgresql://... or sqlite:///...
+
+    Returns:
+        URL using the matching async driver
+
+    Raises:
+        ValueError: If the backend has no known async driver
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for database backend: {backend}")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend])
+
+
+def pool_options(url: URL) -> Dict[str, Any]:
+    """
+    Connection pool settings for an engine.
+
+    SQLite (tests / local development) has no server connections worth
+    pooling, so it gets no pool settings and async SQLite connections are
+    not pooled at all.
+    """
+    if url.get_backend_name() == "sqlite":
+        return {"poolclass": NullPool} if url.get_dialect().is_async else {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
 # Create SQLAlchemy engine
 engine = create_engine(
     DATABASE_URL,
     connect_args={},
-    echo=False
+    echo=False,
+    json_serializer=json_serializer,
+    json_deserializer=loads,
+    **pool_options(make_url(DATABASE_URL))
 )
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+_async_url = make_url(ASYNC_DATABASE_URL) if ASYNC_DATABASE_URL else to_async_url(DATABASE_URL)
+
+# Async engine and session factory used by the API and the aggregator
+async_engine = create_async_engine(
+    _async_url,
+    echo=False,
+    json_serializer=json_serializer,
+    json_deserializer=loads,
+    **pool_options(_async_url)
+)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 
 # Base class for SQLAlchemy models
 class Base(DeclarativeBase):
@@ -38,10 +119,97 @@ def get_db():
         db.close()
 
 
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """
+    Dependency function to get an async database session.
+
+    Yields:
+        Async database session
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def close_db() -> None:
+    """
+    Close every pooled connection of both engines.
+    """
+    await async_engine.dispose()
+    engine.dispose()
+    logger.info("Database connection pools closed")
+
+
 def init_db():
     """
     Initialize database by creating all tables.
     """
+    # Register every model on Base.metadata before creating tables
+    import app.models  # noqa: F401
+    from app.services.data_lifecycle import create_partitioned_table, ensure_partitions
+
     logger.info("Initializing database...")
+    with engine.begin() as conn:
+        # On Postgres, data_records is created partitioned before create_all sees it
+        create_partitioned_table(conn)
     Base.metadata.create_all(bind=engine)
-    logger.info("Database initialized successfully")
\ No newline at end of file
+    with engine.begin() as conn:
+        ensure_partitions(conn)
+
+    # create_all skips existing tables, so add indexes introduced since they were created
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+    _migrate_raw_payloads()
+    logger.info("Database initialized successfully")
+
+
+RAW_PAYLOAD_COLUMNS = ("raw_weather_response", "raw_osint_response", "raw_gemini_response")
+
+
+def _migrate_raw_payloads(batch_size: int = 500):
+    """
+    Move raw payloads of databases created before data_record_payloads existed.
+
+    Copies the inline raw_* JSON columns of data_records into the compressed
+    side table in batches, then drops them.
+    """
+    from app.models.data_record_payload import DataRecordPayload
+
+    columns = {column["name"] for column in inspect(engine).get_columns("data_records")}
+    legacy = [name for name in RAW_PAYLOAD_COLUMNS if name in columns]
+    if not legacy:
+        return
+
+    logger.info("Moving raw payloads from data_records to data_record_payloads...")
+    payloads = DataRecordPayload.__table__
+    selected = ", ".join(legacy)
+    last_id, moved = 0, 0
+    with engine.begin() as conn:
+        while True:
+            rows = conn.execute(
+                text(f"SELECT id, {selected} FROM data_records WHERE id > :last_id ORDER BY id LIMIT :limit"),
+                {"last_id": last_id, "limit": batch_size}
+            ).mappings().all()
+            if not rows:
+                break
+            existing = set(conn.execute(
+                select(payloads.c.record_id).where(payloads.c.record_id.in_([row["id"] for row in rows]))
+            ).scalars())
+            values = [
+                {
+                    "record_id": row["id"],
+                    "raw_weather_response": row.get("raw_weather_response") or "{}",
+                    "raw_osint_response": row.get("raw_osint_response") or "{}",
+                    "raw_gemini_response": row.get("raw_gemini_response")
+                }
+                for row in rows if row["id"] not in existing
+            ]
+            if values:
+                conn.execute(payloads.insert(), values)
+            moved += len(values)
+            last_id = rows[-1]["id"]
+
+        for name in legacy:
+            conn.execute(text(f"ALTER TABLE data_records DROP COLUMN {name}"))
+    logger.info(f"Moved {moved} raw payloads to data_record_payloads")
@@ -1,11 +1,16 @@
 """
 Main FastAPI application entry point.
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
 import logging
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from app.api.endpoints import router
-from app.database import init_db
+from app.database import init_db, close_db
+from app.services.http_client import init_http_client, close_http_client
+from app.services.gemini import close_gemini_client
+from app.services.jobs import refresh_jobs
 
 # Configure logging
 logging.basicConfig(
@@ -28,18 +33,26 @@ async def lifespan(app: FastAPI):
     # Initialize database
     init_db()
     logger.info("Database initialized")
+
+    # Shared HTTP connection pool for all upstream fetchers
+    init_http_client()
     logger.info("Daily automation managed by n8n - see README for setup")
 
     yield
 
     # Shutdown
     logger.info("Shutting down application...")
+    await refresh_jobs.shutdown()
+    await close_http_client()
+    await close_gemini_client()
+    await close_db()
 
 
 app = FastAPI(
     title="OSINT Weather Aggregator",
     description="API for aggregating weather data from multiple OSINT sources",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -64,3 +77,9 @@ async def health_check():
         "status": "healthy",
         "automation": "n8n (external)"
     }
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: stage latencies, errors and timeouts, upstream bytes, Gemini tokens and cache hits"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
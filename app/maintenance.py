@@ -0,0 +1,44 @@
+"""
+Data lifecycle maintenance script.
+Run this to premake partitions, apply retention and compact raw payloads,
+or to convert an existing data_records table to a partitioned one:
+
+    python -m app.maintenance [all|partitions|retention|compact|partition-existing]
+"""
+import logging
+import sys
+from app.database import engine, init_db
+from app.services.data_lifecycle import (
+    apply_retention,
+    compact_payloads,
+    ensure_partitions,
+    partition_existing_table,
+    run_maintenance,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _create_partitions():
+    with engine.begin() as conn:
+        return ensure_partitions(conn)
+
+
+COMMANDS = {
+    "all": run_maintenance,
+    "partitions": _create_partitions,
+    "retention": apply_retention,
+    "compact": compact_payloads,
+    "partition-existing": partition_existing_table,
+}
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "all"
+    if command not in COMMANDS:
+        sys.exit(f"Unknown command {command!r}; expected one of: {', '.join(COMMANDS)}")
+    if command != "partition-existing":
+        init_db()
+    logger.info(f"Running maintenance: {command}")
+    logger.info(f"Maintenance finished: {COMMANDS[command]()}")
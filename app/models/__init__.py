@@ -3,5 +3,12 @@ SQLAlchemy models.
 """
 from app.database import Base
 from app.models.data_record import DataRecord
+from app.models.data_record_payload import DataRecordPayload
+from app.models.llm_cache import LLMCacheEntry
+from app.models.weather_cache import WeatherCacheEntry
+from app.models.osint_state import OsintWatermark, SeenPost
+from app.models.rollup import DataRollup
+from app.models.scheduler import SchedulerLease, ScheduledShard
+from app.models.refresh_job import RefreshJobRecord
 
-__all__ = ["Base", "DataRecord"]
+__all__ = ["Base", "DataRecord", "DataRecordPayload", "LLMCacheEntry", "WeatherCacheEntry", "OsintWatermark", "SeenPost", "DataRollup", "SchedulerLease", "ScheduledShard", "RefreshJobRecord"]
@@ -2,7 +2,8 @@
 SQLAlchemy model for data records.
 """
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, Text, DateTime
+from sqlalchemy import Column, Integer, String, Float, Text, DateTime, Index
+from sqlalchemy.orm import relationship
 from app.database import Base
 
 
@@ -11,13 +12,29 @@ class DataRecord(Base):
     __tablename__ = "data_records"
 
     id = Column(Integer, primary_key=True, index=True)
-    aggregation_timestamp_utc = Column(DateTime, nullable=False, default=datetime.utcnow)
+    aggregation_timestamp_utc = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
     city_name = Column(String(100), nullable=False)
     current_temperature_c = Column(Float, nullable=False)
     brand_name = Column(String(100), nullable=False)
     sentiment_summary = Column(Text, nullable=False)
     news_summary = Column(Text, nullable=False)
     popularity_score = Column(Float, nullable=True)
-    raw_weather_response = Column(Text, nullable=False)  # JSON string
-    raw_osint_response = Column(Text, nullable=False)  # JSON string
-    raw_gemini_response = Column(Text, nullable=True)  # JSON string (optional)
\ No newline at end of file
+
+    # Raw API responses live in data_record_payloads and are only loaded on access
+    payload = relationship(
+        "DataRecordPayload",
+        primaryjoin="DataRecord.id == foreign(DataRecordPayload.record_id)",
+        uselist=False,
+        lazy="select",
+        cascade="all, delete-orphan"
+    )
+
+    __table_args__ = (
+        # Latest record per target: /data/latest?city=...&brand=...
+        Index(
+            "ix_data_records_city_brand_timestamp",
+            "city_name",
+            "brand_name",
+            aggregation_timestamp_utc.desc()
+        ),
+    )
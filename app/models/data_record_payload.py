@@ -0,0 +1,17 @@
+"""
+SQLAlchemy model for the raw upstream payloads of a data record.
+"""
+from sqlalchemy import Column, Integer
+from app.database import Base
+from app.models.types import CompressedJSON
+
+
+class DataRecordPayload(Base):
+    """Raw API responses behind a data record, kept out of data_records so row scans stay small."""
+    __tablename__ = "data_record_payloads"
+
+    # data_records.id; no foreign key, because Postgres can't reference a partitioned table by id alone
+    record_id = Column(Integer, primary_key=True)
+    raw_weather_response = Column(CompressedJSON, nullable=False)
+    raw_osint_response = Column(CompressedJSON, nullable=False)
+    raw_gemini_response = Column(CompressedJSON, nullable=True)
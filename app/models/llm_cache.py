@@ -0,0 +1,18 @@
+"""
+SQLAlchemy model for cached Gemini responses.
+"""
+from datetime import datetime
+from sqlalchemy import Column, String, Text, DateTime
+from app.database import Base
+
+
+class LLMCacheEntry(Base):
+    """Persistent tier of the Gemini result cache, keyed on a content hash."""
+    __tablename__ = "llm_cache_entries"
+
+    cache_key = Column(String(64), primary_key=True)  # sha256 hex digest
+    model = Column(String(100), nullable=False)
+    template = Column(String(50), nullable=False)
+    response_text = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,30 @@
+"""
+SQLAlchemy models for incremental OSINT ingestion state.
+"""
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Float, DateTime, UniqueConstraint
+from app.database import Base
+
+
+class OsintWatermark(Base):
+    """Newest post already ingested for a (brand, source) pair."""
+    __tablename__ = "osint_watermarks"
+    __table_args__ = (UniqueConstraint("brand_name", "source", name="uq_osint_watermarks_brand_source"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    brand_name = Column(String(100), nullable=False)
+    source = Column(String(50), nullable=False)
+    last_created_utc = Column(Float, nullable=False)  # Unix timestamp of the newest ingested post
+    last_post_id = Column(String(100), nullable=True)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class SeenPost(Base):
+    """Index of post IDs already ingested for a (brand, source) pair."""
+    __tablename__ = "osint_seen_posts"
+
+    brand_name = Column(String(100), primary_key=True)
+    source = Column(String(50), primary_key=True)
+    post_id = Column(String(100), primary_key=True)
+    created_utc = Column(Float, nullable=True, index=True)
+    seen_at = Column(DateTime, nullable=False, default=datetime.utcnow)
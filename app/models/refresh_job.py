@@ -0,0 +1,28 @@
+"""
+SQLAlchemy model for refresh jobs, shared by every worker.
+"""
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from app.database import Base
+from app.models.types import CompressedJSON
+
+
+class RefreshJobRecord(Base):
+    """A refresh job's status, progress and result, visible to every worker and replica."""
+    __tablename__ = "refresh_jobs"
+
+    id = Column(String(32), primary_key=True)
+    target_keys = Column(Text, nullable=False)  # JSON list of Target.key
+    # Hash of the target set while the job is queued or running, NULL once it finishes;
+    # unique, so two workers can't both start a job for the same targets
+    active_key = Column(String(40), nullable=True, unique=True)
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, succeeded, failed, cancelled
+    worker = Column(String(200), nullable=False)  # node running the job
+    triggers = Column(Integer, nullable=False, default=1)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    stages = Column(Text, nullable=True)  # JSON progress snapshot
+    result = Column(CompressedJSON, nullable=True)
+    error = Column(Text, nullable=True)
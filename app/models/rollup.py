@@ -0,0 +1,25 @@
+"""
+SQLAlchemy model for pre-aggregated record statistics.
+"""
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Float, DateTime, UniqueConstraint
+from app.database import Base
+
+
+class DataRollup(Base):
+    """Running sums and counts of records per (period, period start, city, brand)."""
+    __tablename__ = "data_rollups"
+    __table_args__ = (
+        UniqueConstraint("period", "period_start", "city_name", "brand_name", name="uq_data_rollups_bucket"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    period = Column(String(10), nullable=False)  # "day" or "week"
+    period_start = Column(DateTime, nullable=False)  # UTC midnight / Monday midnight
+    city_name = Column(String(100), nullable=False)
+    brand_name = Column(String(100), nullable=False)
+    record_count = Column(Integer, nullable=False, default=0)
+    temperature_sum = Column(Float, nullable=False, default=0.0)
+    popularity_sum = Column(Float, nullable=False, default=0.0)
+    popularity_count = Column(Integer, nullable=False, default=0)  # records with a popularity score
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
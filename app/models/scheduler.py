@@ -0,0 +1,37 @@
+"""
+SQLAlchemy models for coordinating the scheduler across workers and replicas.
+"""
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from app.database import Base
+
+
+class SchedulerLease(Base):
+    """Leadership lease of a schedule: only the holder plans runs until it expires."""
+    __tablename__ = "scheduler_leases"
+
+    name = Column(String(100), primary_key=True)
+    holder = Column(String(200), nullable=False)  # node id of the current leader
+    acquired_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+
+
+class ScheduledShard(Base):
+    """A slice of a run's targets, due at a staggered time and claimed by one worker."""
+    __tablename__ = "scheduler_shards"
+    __table_args__ = (
+        Index("ix_scheduler_shards_schedule_status_due", "schedule", "status", "due_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    schedule = Column(String(100), nullable=False)
+    run_started_at = Column(DateTime, nullable=False, index=True)
+    shard_index = Column(Integer, nullable=False)
+    target_keys = Column(Text, nullable=False)  # JSON list of Target.key
+    due_at = Column(DateTime, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # pending, claimed, done, failed
+    claimed_by = Column(String(200), nullable=True)
+    claimed_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    finished_at = Column(DateTime, nullable=True)
+    error = Column(Text, nullable=True)
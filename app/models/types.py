@@ -0,0 +1,50 @@
+"""
+Custom SQLAlchemy column types.
+"""
+import zlib
+from typing import Any, Optional
+from sqlalchemy import LargeBinary
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.types import TypeDecorator
+from app.serialization import RawJSON, dumps, loads
+
+
+class CompressedJSON(TypeDecorator):
+    """
+    JSON document stored as JSONB on Postgres and as zlib-compressed JSON elsewhere.
+
+    Postgres compresses large JSONB values itself (TOAST), and keeps them
+    queryable. Values can be bound as Python objects or as already-serialized
+    JSON strings / bytes, which are stored without being parsed again; they
+    are always loaded back as Python objects.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, level: int = 6):
+        super().__init__()
+        self.level = level
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(JSONB())
+        return dialect.type_descriptor(LargeBinary())
+
+    def process_bind_param(self, value: Any, dialect) -> Any:
+        if value is None:
+            return None
+        if dialect.name == "postgresql":
+            if isinstance(value, bytes):
+                return RawJSON(value.decode("utf-8"))
+            return RawJSON(value) if isinstance(value, str) else value
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        elif not isinstance(value, bytes):
+            value = dumps(value)
+        return zlib.compress(value, self.level)
+
+    def process_result_value(self, value: Any, dialect) -> Optional[Any]:
+        if value is None or dialect.name == "postgresql":
+            return value
+        return loads(zlib.decompress(value))
@@ -0,0 +1,15 @@
+"""
+SQLAlchemy model for cached Open-Meteo `current` blocks.
+"""
+from sqlalchemy import Column, String, Text, DateTime
+from app.database import Base
+
+
+class WeatherCacheEntry(Base):
+    """Shared tier of the weather cache, so workers don't re-fetch the same location."""
+    __tablename__ = "weather_cache_entries"
+
+    cache_key = Column(String(200), primary_key=True)  # rounded coordinates + variables
+    current = Column(Text, nullable=False)  # JSON string of the `current` block
+    fetched_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
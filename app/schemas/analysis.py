@@ -0,0 +1,15 @@
+"""
+Pydantic schema for structured Gemini analysis output.
+"""
+from pydantic import BaseModel, Field
+
+
+class GeminiAnalysis(BaseModel):
+    """Combined analysis returned by a single structured Gemini call."""
+    sentiment_summary: str = Field(description="1-2 sentence summary of overall public sentiment")
+    news_summary: str = Field(description="1-2 sentence summary of major news or emerging trends")
+    popularity_score: float = Field(
+        ge=0,
+        le=100,
+        description="Public interest and engagement from 0 (none) to 100 (very high)"
+    )
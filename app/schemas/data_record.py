@@ -2,7 +2,7 @@
 Pydantic schemas for data records (API contract).
 """
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel, ConfigDict
 
 
@@ -15,26 +15,12 @@ class DataRecordCreate(BaseModel):
     sentiment_summary: str
     news_summary: str
     popularity_score: Optional[float] = None
-    raw_weather_response: str  # JSON string
-    raw_osint_response: str  # JSON string
-    raw_gemini_response: Optional[str] = None  # JSON string (optional)
+    raw_weather_response: bytes  # Serialized JSON (str is accepted too)
+    raw_osint_response: bytes  # Serialized JSON
+    raw_gemini_response: Optional[bytes] = None  # Serialized JSON (optional)
 
 
-class DataRecordRead(BaseModel):
-    """Schema for reading a data record."""
-    id: int
-    aggregation_timestamp_utc: datetime
-    city_name: str
-    current_temperature_c: float
-    brand_name: str
-    sentiment_summary: str
-    news_summary: str
-    popularity_score: Optional[float] = None
-    raw_weather_response: str  # JSON string
-    raw_osint_response: str  # JSON string
-    raw_gemini_response: Optional[str] = None  # JSON string (optional)
-
-    model_config = ConfigDict(from_attributes=True)
+RAW_PAYLOAD_FIELDS = {"raw_weather_response", "raw_osint_response", "raw_gemini_response"}
 
 
 class DataRecordReadLatest(BaseModel):
@@ -48,4 +34,20 @@ class DataRecordReadLatest(BaseModel):
     news_summary: str
     popularity_score: Optional[float] = None
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+
+class DataRecordPage(BaseModel):
+    """Schema for one page of record history."""
+    items: List[DataRecordReadLatest]
+    next_cursor: Optional[str] = None  # pass as `cursor` to get the next page
+
+
+class DataRecordRaw(BaseModel):
+    """Schema for reading the raw API responses behind a data record."""
+    record_id: int
+    raw_weather_response: Dict[str, Any]
+    raw_osint_response: Dict[str, Any]
+    raw_gemini_response: Optional[Dict[str, Any]] = None
+
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,32 @@
+"""
+Pydantic schemas for rollups (API contract).
+"""
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel
+
+
+class DataRollupRead(BaseModel):
+    """Schema for reading one rollup bucket."""
+    period: str
+    period_start: datetime
+    city_name: str
+    brand_name: str
+    record_count: int
+    avg_temperature_c: Optional[float] = None
+    avg_popularity_score: Optional[float] = None
+
+    @classmethod
+    def from_rollup(cls, rollup) -> "DataRollupRead":
+        """Build the read schema from a DataRollup row's running sums."""
+        return cls(
+            period=rollup.period,
+            period_start=rollup.period_start,
+            city_name=rollup.city_name,
+            brand_name=rollup.brand_name,
+            record_count=rollup.record_count,
+            avg_temperature_c=rollup.temperature_sum / rollup.record_count if rollup.record_count else None,
+            avg_popularity_score=(
+                rollup.popularity_sum / rollup.popularity_count if rollup.popularity_count else None
+            )
+        )
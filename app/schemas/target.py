@@ -0,0 +1,36 @@
+"""
+Pydantic schema for aggregation targets (city + brand pairs).
+"""
+from typing import Optional, Tuple
+from pydantic import BaseModel, ConfigDict
+
+
+class Target(BaseModel):
+    """A single (city, brand) pair tracked by the aggregator."""
+    city: str
+    latitude: float
+    longitude: float
+    brand: str
+    query: Optional[str] = None  # Reddit search query (defaults to brand)
+
+    model_config = ConfigDict(frozen=True)
+
+    @property
+    def key(self) -> str:
+        """Unique identifier for the target."""
+        return f"{self.city}|{self.brand}"
+
+    @property
+    def search_query(self) -> str:
+        """Search query used by OSINT sources."""
+        return self.query or self.brand.lower()
+
+    @property
+    def location_key(self) -> Tuple[float, float]:
+        """Key shared by targets that need the same weather data."""
+        return (self.latitude, self.longitude)
+
+    @property
+    def brand_key(self) -> Tuple[str, str]:
+        """Key shared by targets that need the same OSINT data and analysis."""
+        return (self.brand, self.search_query)
@@ -0,0 +1,39 @@
+"""
+Fast JSON encoding shared by the pipeline, the database layer and the API.
+
+Uses orjson, which serializes straight to UTF-8 bytes several times faster
+than the standard library. Raw upstream payloads are serialized once, in the
+data transformer, and those bytes are what the database stores (compressed
+on SQLite, passed through as JSONB text on Postgres).
+"""
+from typing import Any, Union
+import orjson
+
+# Integer dict keys (e.g. weather codes) are written as strings, as json.dumps does
+_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+class RawJSON(str):
+    """Already-serialized JSON text that json_serializer passes through unchanged."""
+
+
+def dumps(value: Any) -> bytes:
+    """Serialize a value to UTF-8 JSON bytes."""
+    return orjson.dumps(value, option=_OPTIONS)
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """Parse JSON bytes or text."""
+    return orjson.loads(data)
+
+
+def json_serializer(value: Any) -> str:
+    """
+    SQLAlchemy json_serializer for JSON/JSONB columns.
+
+    RawJSON text is bound as is, so payloads serialized upstream are not
+    parsed and serialized again on their way to Postgres.
+    """
+    if isinstance(value, RawJSON):
+        return value
+    return orjson.dumps(value, option=_OPTIONS).decode("utf-8")
@@ -1,143 +1,522 @@
 """
 Data aggregation service that collects weather data from multiple sources.
+
+Every registered target (city, brand) is processed concurrently. Stage work is
+shared between targets that need the same data: weather is fetched in
+batches of locations (one Open-Meteo request per batch) and OSINT + Gemini
+analysis run once per brand, with all OSINT sources queried concurrently. Each stage runs
+under its own concurrency cap, and each target under its own timeout, so a
+slow target never holds up the rest of the batch.
 """
+import asyncio
+import heapq
+import itertools
 import logging
 from datetime import datetime
-from typing import Dict, Any
-from app.services.weather import fetch_weather_data
-from app.services.osint import fetch_osint_data
-from app.services.gemini import analyze_sentiment, analyze_trends
+from typing import Dict, Any, List, Optional, Tuple
+import httpx
+from app.config import (
+    WEATHER_CONCURRENCY,
+    OSINT_CONCURRENCY,
+    LLM_CONCURRENCY,
+    TARGET_TIMEOUT_SECONDS,
+    WEATHER_BATCH_SIZE,
+    OSINT_INCREMENTAL,
+    OSINT_STORED_POSTS,
+    OSINT_STORED_TEXT_CHARS,
+)
+from app.schemas.target import Target
+from app.services.targets import get_targets
+from app.services.http_client import get_http_client
+from app.services.weather import fetch_weather_batch
+from app.services.osint_sources import OsintSource, collect_from_sources, get_osint_sources
+from app.services.osint_state import IncrementalState, load_incremental_state
+from app.services.gemini import analyze_osint_async
+from app.services.metrics import (
+    OSINT_POSTS,
+    OSINT_SOURCE_DURATION,
+    OSINT_SOURCE_RESULTS,
+    TARGET_TIMEOUTS,
+    observe_stage,
+)
+from app.services.progress import RunProgress
+from app.services.summarizer import StreamingPromptBuilder
 from app.services.data_transformer import transform_aggregate_to_record
-from app.database import SessionLocal
-from app.crud.data_record import create_data_record
+from app.schemas.data_record import DataRecordCreate, RAW_PAYLOAD_FIELDS
+from app.database import AsyncSessionLocal
+from app.crud.data_record import create_data_records, get_latest_record_by_brand
 
 logger = logging.getLogger(__name__)
 
 
-async def aggregate_all_data() -> Dict[str, Any]:
+class StageLimits:
+    """Per-stage concurrency caps shared by all targets of a run."""
+
+    def __init__(
+        self,
+        weather: int = WEATHER_CONCURRENCY,
+        osint: int = OSINT_CONCURRENCY,
+        llm: int = LLM_CONCURRENCY,
+    ):
+        self.weather = asyncio.Semaphore(weather)
+        self.osint = asyncio.Semaphore(osint)
+        self.llm = asyncio.Semaphore(llm)
+
+
+class StoredPosts:
     """
-    Aggregate weather and OSINT data from all configured sources.
+    The posts kept for a record's raw OSINT payload: the newest max_posts, with trimmed text.
 
-    Returns:
-        Dict containing aggregation results and statistics
+    Every post still reaches the prompt builder, which condenses as it goes,
+    so memory per brand stays bounded however many posts the sources return.
     """
-    start_time = datetime.now()
-    results = {
-        "timestamp": start_time.isoformat(),
-        "sources": {},
-        "success_count": 0,
-        "error_count": 0,
-        "total_records": 0
+
+    def __init__(self, max_posts: int = OSINT_STORED_POSTS, max_text_chars: int = OSINT_STORED_TEXT_CHARS):
+        self.max_posts = max_posts
+        self.max_text_chars = max_text_chars
+        self.count = 0
+        self._heap: List[Tuple[float, int, Dict[str, Any]]] = []
+        self._order = itertools.count()
+
+    def add(self, post: Dict[str, Any]) -> None:
+        self.count += 1
+        if self.max_posts <= 0:
+            return
+        text = post.get("text") or ""
+        if len(text) > self.max_text_chars:
+            post = {**post, "text": text[:self.max_text_chars]}
+        # Min-heap on age, so the oldest kept post is the one replaced
+        item = (post.get("created_utc") or 0.0, next(self._order), post)
+        if len(self._heap) < self.max_posts:
+            heapq.heappush(self._heap, item)
+        elif item[0] > self._heap[0][0]:
+            heapq.heapreplace(self._heap, item)
+
+    @property
+    def truncated(self) -> bool:
+        return self.count > len(self._heap)
+
+    def newest_first(self) -> List[Dict[str, Any]]:
+        return [post for _, _, post in sorted(self._heap, key=lambda item: (item[0], item[1]), reverse=True)]
+
+
+async def _run_weather_stage(
+    targets: List[Target],
+    limits: StageLimits,
+    client: httpx.AsyncClient,
+    progress: RunProgress
+) -> Dict[str, Dict[str, Any]]:
+    """Fetch weather for a batch of targets and return each target's `sources.weather` entry."""
+    try:
+        async with limits.weather:
+            progress.begin("weather")
+            with observe_stage("weather_fetch"):
+                weather_by_target = await fetch_weather_batch(targets, client=client)
+        progress.advance("weather")
+        return {
+            key: {
+                "status": "success",
+                "records": len(weather_data) if weather_data else 0,
+                "data": weather_data
+            }
+            for key, weather_data in weather_by_target.items()
+        }
+    except Exception as e:
+        logger.error(f"Error fetching weather data for {len(targets)} targets: {str(e)}", exc_info=True)
+        progress.advance("weather")
+        return {
+            target.key: {
+                "status": "error",
+                "error": str(e)
+            }
+            for target in targets
+        }
+
+
+async def _load_previous_analysis(brand_name: str) -> Optional[Dict[str, Any]]:
+    """Load the summaries of the brand's latest record, to carry forward when nothing is new."""
+    async with AsyncSessionLocal() as db:
+        record = await get_latest_record_by_brand(db, brand_name)
+    if record is None:
+        return None
+    return {
+        "sentiment_summary": record.sentiment_summary,
+        "news_summary": record.news_summary,
+        "popularity_score": record.popularity_score,
+        "previous_record_id": record.id
     }
 
-    logger.info("Starting data aggregation from all sources...")
 
-    # Fetch weather data
+async def _run_gemini_stage(
+    target: Target,
+    osint_data: Optional[Dict[str, Any]],
+    builder: StreamingPromptBuilder,
+    limits: StageLimits,
+    states: Optional[Dict[str, IncrementalState]] = None
+) -> Dict[str, Any]:
+    """Finish building the analysis input, analyze it with Gemini and return the `sources.gemini` entry."""
+    has_history = any(state.has_history for state in (states or {}).values())
+    if osint_data and not osint_data["post_count"] and has_history:
+        # Nothing new since the last run: reuse its analysis instead of calling Gemini
+        builder.cancel()
+        previous = await _load_previous_analysis(target.brand)
+        if previous is not None:
+            logger.info(f"No new posts for {target.brand} - reusing previous analysis")
+            return {
+                "status": "unchanged",
+                "reason": "No new posts since last run",
+                **previous
+            }
+
+    if not osint_data or not osint_data["post_count"]:
+        builder.cancel()
+        logger.warning("Skipping Gemini analysis - no OSINT data available")
+        return {
+            "status": "skipped",
+            "reason": "No OSINT data available"
+        }
+
     try:
-        weather_data = await fetch_weather_data()
-        results["sources"]["weather"] = {
+        # Posts were packed (and, if over budget, summarized) while they streamed in
+        with observe_stage("prompt_build"):
+            osint_text, input_stats = await builder.finish()
+
+        # Sentiment and trend prompts run concurrently on the shared async client
+        async with limits.llm:
+            with observe_stage("gemini"):
+                analysis = await analyze_osint_async(osint_text)
+
+        logger.info("Gemini analysis completed successfully")
+        return {
             "status": "success",
-            "records": len(weather_data) if weather_data else 0,
-            "data": weather_data
+            **analysis,
+            "input": input_stats
         }
-        results["success_count"] += 1
-        results["total_records"] += len(weather_data) if weather_data else 0
-
-        logger.info(f"Weather data fetched successfully: {len(weather_data) if weather_data else 0} records")
     except Exception as e:
-        logger.error(f"Error fetching weather data: {str(e)}", exc_info=True)
-        results["sources"]["weather"] = {
+        builder.cancel()
+        logger.error(f"Error analyzing with Gemini: {str(e)}", exc_info=True)
+        return {
             "status": "error",
             "error": str(e)
         }
-        results["error_count"] += 1
 
-    # Fetch OSINT data
+
+async def _run_osint_stage(
+    target: Target,
+    limits: StageLimits,
+    client: httpx.AsyncClient,
+    sources: List[OsintSource],
+    progress: RunProgress
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Collect OSINT posts for a brand from every source, analyze them, and return the `osint` and `gemini` entries.
+
+    Posts stream into the prompt builder; only a capped sample (see StoredPosts)
+    is kept for the raw payload.
+    """
     osint_data = None
+    states: Dict[str, IncrementalState] = {}
+    source_results: Dict[str, Dict[str, Any]] = {}
+    builder = StreamingPromptBuilder(semaphore=limits.llm)
     try:
-        osint_data = await fetch_osint_data()
-        results["sources"]["osint"] = {
-            "status": "success",
-            "records": len(osint_data) if osint_data else 0,
-            "data": osint_data
-        }
-        results["success_count"] += 1
-        results["total_records"] += len(osint_data) if osint_data else 0
+        stored = StoredPosts()
 
-        logger.info(f"OSINT data fetched successfully: {len(osint_data) if osint_data else 0} records")
+        def on_post(post: Dict[str, Any]) -> None:
+            stored.add(post)
+            builder.add(post)
+
+        async with limits.osint:
+            progress.begin("osint")
+            if OSINT_INCREMENTAL:
+                loaded = await asyncio.gather(*[
+                    load_incremental_state(target.brand, source.name) for source in sources
+                ])
+                states = {source.name: state for source, state in zip(sources, loaded)}
+            with observe_stage("osint_fetch"):
+                source_results = await collect_from_sources(target, sources, client, on_post, states)
+
+        for name, source_result in source_results.items():
+            OSINT_SOURCE_DURATION.labels(name).observe(source_result.get("duration_seconds", 0.0))
+            OSINT_SOURCE_RESULTS.labels(name, source_result["status"]).inc()
+            OSINT_POSTS.labels(name).inc(source_result["posts"])
+
+        statuses = [result["status"] for result in source_results.values()]
+        if not stored.count and "success" not in statuses:
+            failed = "error" if "error" in statuses else "timeout"
+            logger.error(f"No OSINT source returned results for {target.brand}")
+            osint_result = {
+                "status": failed,
+                "error": "No OSINT source returned results",
+                "sources": source_results
+            }
+        else:
+            osint_data = {
+                "brand_name": target.brand,
+                "post_count": stored.count,
+                "posts": stored.newest_first()
+            }
+            if stored.truncated:
+                osint_data["posts_truncated"] = True
+            osint_result = {
+                "status": "success",
+                "records": stored.count,
+                "data": osint_data,
+                "sources": source_results
+            }
+            if states:
+                osint_result["new_posts"] = stored.count
+            logger.info(f"OSINT data fetched successfully: {stored.count} posts for {target.brand}")
     except Exception as e:
-        logger.error(f"Error fetching OSINT data: {str(e)}", exc_info=True)
-        results["sources"]["osint"] = {
+        logger.error(f"Error fetching OSINT data for {target.brand}: {str(e)}", exc_info=True)
+        osint_result = {
             "status": "error",
             "error": str(e)
         }
-        results["error_count"] += 1
 
-    # Analyze OSINT data with Gemini (if OSINT data was successfully fetched)
-    if osint_data and len(osint_data.get("posts", [])) > 0:
+    progress.advance("osint")
+    progress.begin("gemini")
+    gemini_result = await _run_gemini_stage(target, osint_data, builder, limits, states)
+    progress.advance("gemini")
+
+    # Only mark posts as ingested once they have been analyzed. Sources that were
+    # cut off (timed out or stopped at their post cap) keep their watermark so the
+    # posts they never reached aren't skipped.
+    if states and gemini_result["status"] == "success":
         try:
-            # Format OSINT posts for Gemini analysis
-            osint_text = "\n\n".join([
-                f"Post {i+1}:\nTitle: {post.get('title', '')}\nText: {post.get('text', '')}"
-                for i, post in enumerate(osint_data["posts"])
+            await asyncio.gather(*[
+                state.commit(advance_watermark=(
+                    source_results[name]["status"] == "success" and not source_results[name].get("truncated")
+                ))
+                for name, state in states.items()
             ])
+        except Exception as e:
+            logger.error(f"Error saving ingestion state for {target.brand}: {str(e)}", exc_info=True)
+    return osint_result, gemini_result
 
-            # Analyze sentiment
-            sentiment_summary = analyze_sentiment(osint_text)
 
-            # Analyze trends
-            news_summary = analyze_trends(osint_text)
+def _batch_by_location(targets: List[Target], batch_size: int) -> List[List[Target]]:
+    """Split targets into batches covering at most batch_size unique locations each."""
+    by_location: Dict[Tuple[float, float], List[Target]] = {}
+    for target in targets:
+        by_location.setdefault(target.location_key, []).append(target)
 
-            results["sources"]["gemini"] = {
-                "status": "success",
-                "sentiment_summary": sentiment_summary,
-                "news_summary": news_summary
-            }
-            results["success_count"] += 1
+    groups = list(by_location.values())
+    return [
+        [target for group in groups[i:i + batch_size] for target in group]
+        for i in range(0, len(groups), max(batch_size, 1))
+    ]
 
-            logger.info("Gemini analysis completed successfully")
-        except Exception as e:
-            logger.error(f"Error analyzing with Gemini: {str(e)}", exc_info=True)
-            results["sources"]["gemini"] = {
-                "status": "error",
-                "error": str(e)
-            }
-            results["error_count"] += 1
+
+async def _save_records(transformed_records: List[DataRecordCreate]) -> List[int]:
+    """Persist a run's transformed records in one batch and return their database IDs."""
+    async with AsyncSessionLocal() as db:
+        return await create_data_records(db, transformed_records)
+
+
+async def _aggregate_target(
+    target: Target,
+    weather_task: "asyncio.Task[Dict[str, Dict[str, Any]]]",
+    osint_task: "asyncio.Task[Tuple[Dict[str, Any], Dict[str, Any]]]",
+    timeout: float,
+) -> Tuple[Dict[str, Any], Optional[DataRecordCreate]]:
+    """
+    Collect the stage results for one target, then transform them for saving.
+
+    Args:
+        target: Target being aggregated
+        weather_task: Shared weather stage task for the target's location batch
+        osint_task: Shared OSINT + Gemini stage task for the target's brand
+        timeout: Seconds to wait for the target's stages before giving up
+
+    Returns:
+        Tuple of (per-target aggregation results, record to save or None)
+    """
+    start_time = datetime.now()
+    results = {
+        "city": target.city,
+        "brand": target.brand,
+        "timestamp": start_time.isoformat(),
+        "sources": {},
+        "success_count": 0,
+        "error_count": 0,
+        "total_records": 0
+    }
+
+    # asyncio.wait never cancels the shared tasks, so one target timing out doesn't
+    # cancel them for the others; a failed stage still raises here
+    done, _ = await asyncio.wait((weather_task, osint_task), timeout=timeout, return_when=asyncio.FIRST_EXCEPTION)
+    for task in done:
+        task.result()
+    if len(done) == 2:
+        weather_result = weather_task.result()[target.key]
+        osint_result, gemini_result = osint_task.result()
     else:
-        logger.warning("Skipping Gemini analysis - no OSINT data available")
-        results["sources"]["gemini"] = {
-            "status": "skipped",
-            "reason": "No OSINT data available"
-        }
+        logger.error(f"Target {target.key} timed out after {timeout} seconds")
+        TARGET_TIMEOUTS.inc()
+        timed_out = {"status": "timeout", "error": f"Timed out after {timeout} seconds"}
+        weather_result = weather_task.result()[target.key] if weather_task.done() else timed_out
+        if osint_task.done():
+            osint_result, gemini_result = osint_task.result()
+        else:
+            osint_result, gemini_result = timed_out, timed_out
+
+    results["sources"]["weather"] = weather_result
+    results["sources"]["osint"] = osint_result
+    results["sources"]["gemini"] = gemini_result
+
+    for name in ("weather", "osint", "gemini"):
+        status = results["sources"][name]["status"]
+        if status == "success":
+            results["success_count"] += 1
+            if name != "gemini":
+                results["total_records"] += results["sources"][name]["records"]
+        elif status not in ("skipped", "unchanged"):
+            results["error_count"] += 1
 
     end_time = datetime.now()
     results["duration_seconds"] = (end_time - start_time).total_seconds()
 
-    logger.info(f"Data aggregation completed: {results['success_count']} sources successful, "
-                f"{results['error_count']} errors, {results['total_records']} total records")
-
-    # Transform aggregated data into database record format and save to database
+    # Transform aggregated data into database record format; the run saves all records in one batch
     transformed_record = None
-    db_record_id = None
-    if results["success_count"] >= 2:  # Need at least weather and OSINT data
+    if weather_result["status"] == "success" and osint_result["status"] == "success":
         try:
-            transformed_record = transform_aggregate_to_record(results)
+            with observe_stage("transform"):
+                transformed_record = transform_aggregate_to_record(results)
             logger.info(f"Data transformed successfully for database insertion: {transformed_record.city_name}, {transformed_record.brand_name}")
+        except Exception as e:
+            logger.error(f"Error transforming data for {target.key}: {str(e)}", exc_info=True)
+
+    # Add transformed record to results for inspection; its raw payloads are already under `sources`
+    results["transformed_record"] = (
+        transformed_record.model_dump(exclude=RAW_PAYLOAD_FIELDS) if transformed_record else None
+    )
+    results["db_record_id"] = None
 
-            # Save to database
-            db = SessionLocal()
-            try:
-                db_record = create_data_record(db, transformed_record)
-                db_record_id = db_record.id
-                logger.info(f"Successfully saved record to database with ID: {db_record_id}")
-            finally:
-                db.close()
+    return results, transformed_record
 
+
+async def aggregate_all_data(
+    targets: Optional[List[Target]] = None,
+    limits: Optional[StageLimits] = None,
+    target_timeout: float = TARGET_TIMEOUT_SECONDS,
+    client: Optional[httpx.AsyncClient] = None,
+    weather_batch_size: int = WEATHER_BATCH_SIZE,
+    sources: Optional[List[OsintSource]] = None,
+    progress: Optional[RunProgress] = None,
+) -> Dict[str, Any]:
+    """
+    Aggregate weather and OSINT data for all registered targets.
+
+    Args:
+        targets: Targets to aggregate (defaults to the target registry)
+        limits: Per-stage concurrency caps (defaults to configured values)
+        target_timeout: Seconds each target may take before it is reported as timed out
+        client: HTTP client for upstream fetches (defaults to the shared pooled client)
+        weather_batch_size: Maximum locations per Open-Meteo request
+        sources: OSINT sources to query (defaults to the configured sources)
+        progress: Tracker updated as each stage's units start and finish
+
+    Returns:
+        Dict containing per-target aggregation results and run statistics
+    """
+    targets = targets if targets is not None else get_targets()
+    limits = limits or StageLimits()
+    client = client or get_http_client()
+    sources = sources if sources is not None else get_osint_sources()
+    progress = progress or RunProgress()
+
+    start_time = datetime.now()
+    logger.info(f"Starting data aggregation for {len(targets)} targets...")
+
+    # One weather task per batch of locations, shared by all targets in the batch
+    batches = _batch_by_location(targets, weather_batch_size)
+    brand_count = len({target.brand_key for target in targets})
+    progress.plan(weather=len(batches), osint=brand_count, gemini=brand_count, save=1)
+
+    batch_tasks: List[asyncio.Task] = []
+    weather_tasks: Dict[Tuple[float, float], asyncio.Task] = {}
+    for batch in batches:
+        task = asyncio.create_task(_run_weather_stage(batch, limits, client, progress))
+        batch_tasks.append(task)
+        for target in batch:
+            weather_tasks[target.location_key] = task
+
+    # One OSINT + Gemini task per unique brand, shared by all targets that need it
+    osint_tasks: Dict[Tuple[str, str], asyncio.Task] = {}
+    for target in targets:
+        if target.brand_key not in osint_tasks:
+            osint_tasks[target.brand_key] = asyncio.create_task(
+                _run_osint_stage(target, limits, client, sources, progress)
+            )
+
+    try:
+        outcomes = await asyncio.gather(*[
+            _aggregate_target(
+                target,
+                weather_tasks[target.location_key],
+                osint_tasks[target.brand_key],
+                target_timeout
+            )
+            for target in targets
+        ])
+    finally:
+        # Stage tasks only outlive their targets after a timeout
+        pending = [task for task in [*batch_tasks, *osint_tasks.values()] if not task.done()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    target_results = [result for result, _ in outcomes]
+    to_save = [(result, record) for result, record in outcomes if record is not None]
+    progress.begin("save")
+    if to_save:
+        try:
+            with observe_stage("db_write"):
+                record_ids = await _save_records([record for _, record in to_save])
+            for (result, _), record_id in zip(to_save, record_ids):
+                result["db_record_id"] = record_id
+            logger.info(f"Successfully saved {len(record_ids)} records to database")
         except Exception as e:
-            logger.error(f"Error transforming or saving data: {str(e)}", exc_info=True)
+            logger.error(f"Error saving {len(to_save)} records to database: {str(e)}", exc_info=True)
+    progress.advance("save")
 
-    # Add transformed record to results for inspection
-    results["transformed_record"] = transformed_record.dict() if transformed_record else None
-    results["db_record_id"] = db_record_id
+    end_time = datetime.now()
+    saved = sum(1 for result in target_results if result["db_record_id"] is not None)
+    results = {
+        "timestamp": start_time.isoformat(),
+        "target_count": len(targets),
+        "success_count": saved,
+        "error_count": len(targets) - saved,
+        "total_records": sum(result["total_records"] for result in target_results),
+        "duration_seconds": (end_time - start_time).total_seconds(),
+        "targets": target_results
+    }
+
+    logger.info(f"Data aggregation completed: {results['success_count']} targets saved, "
+                f"{results['error_count']} failed, {results['total_records']} total records "
+                f"in {results['duration_seconds']:.2f}s")
 
     return results
+
+
+def slim_results(results: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Copy aggregation results without the raw source payloads.
+
+    Keeps every status, count, timing and summary, but drops each source's
+    `data` (weather readings and collected posts), which is most of the size.
+
+    Args:
+        results: Results returned by aggregate_all_data
+
+    Returns:
+        Slim copy of the results
+    """
+    targets = []
+    for target in results["targets"]:
+        sources = {
+            name: {key: value for key, value in source.items() if key != "data"}
+            for name, source in target["sources"].items()
+        }
+        targets.append({**target, "sources": sources})
+    return {**results, "targets": targets}
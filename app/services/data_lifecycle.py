@@ -0,0 +1,413 @@
+"""
+Data lifecycle: time partitioning, retention and compaction of data_records.
+
+On Postgres, data_records is natively partitioned by month on
+aggregation_timestamp_utc (plus a DEFAULT partition for anything outside the
+premade range). Retention then retires whole partitions, which is a cheap
+metadata operation that leaves no dead tuples to vacuum. On other backends
+(SQLite) the table stays unpartitioned and retention deletes old rows in
+batches through the timestamp index instead.
+
+Retention either drops old records or archives them (a detached partition
+renamed to archived_*, or the *_archive tables elsewhere). Compaction keeps
+old records and their summaries but deletes their raw payloads. Rollups are
+never touched, so long-term aggregates outlive both.
+"""
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import MetaData, PrimaryKeyConstraint, Table, delete, insert, inspect, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import SQLAlchemyError
+from app.config import (
+    DATA_PARTITIONING,
+    DATA_PARTITION_PREMAKE_MONTHS,
+    DATA_RETENTION_DAYS,
+    DATA_RETENTION_MODE,
+    DATA_COMPACT_AFTER_DAYS,
+)
+from app.database import engine
+from app.models.data_record import DataRecord
+from app.models.data_record_payload import DataRecordPayload
+from app.services.latest_cache import latest_record_cache
+
+logger = logging.getLogger(__name__)
+
+RECORDS_TABLE = DataRecord.__tablename__
+PAYLOADS_TABLE = DataRecordPayload.__tablename__
+DEFAULT_PARTITION = f"{RECORDS_TABLE}_default"
+_PARTITION_RE = re.compile(rf"^{RECORDS_TABLE}_p(\d{{4}})(\d{{2}})$")
+
+
+def month_start(value: datetime) -> datetime:
+    """Get midnight of the first day of a timestamp's month."""
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    """Shift a month start by a number of months."""
+    month = value.month - 1 + months
+    return value.replace(year=value.year + month // 12, month=month % 12 + 1)
+
+
+def partition_name(month: datetime) -> str:
+    """Name of the partition holding a month's records."""
+    return f"{RECORDS_TABLE}_p{month:%Y%m}"
+
+
+def _partitioned_table() -> Table:
+    """
+    Copy of the data_records table definition for native partitioning.
+
+    Postgres requires the partition key in every unique constraint, so the
+    copy's primary key is (id, aggregation_timestamp_utc). The ORM keeps
+    mapping id alone, which the sequence keeps unique.
+    """
+    table = DataRecord.__table__.to_metadata(MetaData())
+    table.c.id.primary_key = False
+    table.append_constraint(PrimaryKeyConstraint(table.c.id, table.c.aggregation_timestamp_utc))
+    table.c.id.autoincrement = True
+    table.dialect_options["postgresql"]["partition_by"] = "RANGE (aggregation_timestamp_utc)"
+    # Indexes are created on the real table definition by init_db
+    table.indexes.clear()
+    return table
+
+
+def is_partitioned(conn: Connection) -> bool:
+    """Whether data_records is a natively partitioned table."""
+    if conn.dialect.name != "postgresql":
+        return False
+    relkind = conn.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"), {"name": RECORDS_TABLE}
+    ).scalar()
+    return relkind == "p"
+
+
+def create_partitioned_table(conn: Connection) -> bool:
+    """
+    Create data_records as a partitioned table if it doesn't exist yet.
+
+    Only applies to Postgres with DATA_PARTITIONING enabled; elsewhere
+    create_all creates the regular table.
+
+    Returns:
+        True if the partitioned table was created
+    """
+    if conn.dialect.name != "postgresql" or not DATA_PARTITIONING:
+        return False
+    if inspect(conn).has_table(RECORDS_TABLE):
+        return False
+    _partitioned_table().create(conn)
+    ensure_partitions(conn)
+    logger.info("Created partitioned data_records table")
+    return True
+
+
+def ensure_partitions(
+    conn: Connection,
+    months_ahead: int = DATA_PARTITION_PREMAKE_MONTHS,
+    start: Optional[datetime] = None
+) -> List[str]:
+    """
+    Create monthly partitions from start's month through months_ahead months later.
+
+    Args:
+        conn: Database connection
+        months_ahead: Months to create in advance of the start month
+        start: First month to cover (defaults to the current month)
+
+    Returns:
+        Names of the partitions that were created
+    """
+    if not is_partitioned(conn):
+        return []
+
+    existing = {name for name, _ in list_partitions(conn)}
+    created = []
+    first = month_start(start or datetime.utcnow())
+    for offset in range(months_ahead + 1):
+        month = add_months(first, offset)
+        name = partition_name(month)
+        if name in existing:
+            continue
+        try:
+            # A savepoint, so one month that can't be created doesn't abort the rest (or startup)
+            with conn.begin_nested():
+                _create_partition(conn, month)
+        except SQLAlchemyError as e:
+            logger.error(f"Could not create partition {name}, its records stay in {DEFAULT_PARTITION}: {str(e)}")
+            continue
+        created.append(name)
+
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {RECORDS_TABLE} DEFAULT"))
+    if created:
+        logger.info(f"Created partitions: {', '.join(created)}")
+    return created
+
+
+def _create_partition(conn: Connection, month: datetime) -> None:
+    """
+    Create a month's partition, moving its rows out of the DEFAULT partition.
+
+    Records land in the DEFAULT partition when maintenance hasn't premade
+    their month, and Postgres refuses to create a partition whose range
+    overlaps rows in DEFAULT. So DEFAULT is detached while the month's rows
+    move into the new partition, then attached again.
+    """
+    name = partition_name(month)
+    low, high = month.isoformat(), add_months(month, 1).isoformat()
+    bounds = f"FOR VALUES FROM ('{low}') TO ('{high}')"
+    in_month = "aggregation_timestamp_utc >= :low AND aggregation_timestamp_utc < :high"
+
+    has_default = conn.execute(text("SELECT to_regclass(:name)"), {"name": DEFAULT_PARTITION}).scalar()
+    stranded = has_default and conn.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_month})"), {"low": low, "high": high}
+    ).scalar()
+    if not stranded:
+        conn.execute(text(f"CREATE TABLE {name} PARTITION OF {RECORDS_TABLE} {bounds}"))
+        return
+
+    conn.execute(text(f"ALTER TABLE {RECORDS_TABLE} DETACH PARTITION {DEFAULT_PARTITION}"))
+    conn.execute(text(f"CREATE TABLE {name} PARTITION OF {RECORDS_TABLE} {bounds}"))
+    moved = conn.execute(
+        text(f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} WHERE {in_month}"), {"low": low, "high": high}
+    ).rowcount
+    conn.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_month}"), {"low": low, "high": high})
+    conn.execute(text(f"ALTER TABLE {RECORDS_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+    logger.info(f"Moved {moved} records from {DEFAULT_PARTITION} into {name}")
+
+
+def list_partitions(conn: Connection) -> List[Tuple[str, datetime]]:
+    """
+    List the monthly partitions of data_records.
+
+    Returns:
+        (partition name, month start) pairs, oldest first; the DEFAULT
+        partition is not included
+    """
+    if not is_partitioned(conn):
+        return []
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:name)"
+    ), {"name": RECORDS_TABLE}).scalars()
+
+    partitions = []
+    for name in names:
+        match = _PARTITION_RE.match(name)
+        if match:
+            partitions.append((name, datetime(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def partition_existing_table(batch_months: int = DATA_PARTITION_PREMAKE_MONTHS) -> int:
+    """
+    Convert an existing unpartitioned data_records table on Postgres.
+
+    Renames the old table, creates the partitioned one with partitions
+    covering every month that has records, copies the rows over, and drops
+    the old table, all in one transaction. Stop refreshes while it runs.
+
+    Returns:
+        Number of records copied
+
+    Raises:
+        RuntimeError: If the database isn't Postgres
+    """
+    with engine.begin() as conn:
+        if conn.dialect.name != "postgresql":
+            raise RuntimeError("Native partitioning requires Postgres")
+        if is_partitioned(conn):
+            logger.info("data_records is already partitioned")
+            return 0
+
+        old = f"{RECORDS_TABLE}_unpartitioned"
+        conn.execute(text(f"ALTER TABLE {PAYLOADS_TABLE} DROP CONSTRAINT IF EXISTS {PAYLOADS_TABLE}_record_id_fkey"))
+        conn.execute(text(f"ALTER TABLE {RECORDS_TABLE} RENAME TO {old}"))
+        conn.execute(text(f"ALTER INDEX IF EXISTS {RECORDS_TABLE}_pkey RENAME TO {old}_pkey"))
+        conn.execute(text(f"ALTER SEQUENCE IF EXISTS {RECORDS_TABLE}_id_seq RENAME TO {old}_id_seq"))
+        for index in DataRecord.__table__.indexes:
+            conn.execute(text(f"ALTER INDEX IF EXISTS {index.name} RENAME TO {index.name}_unpartitioned"))
+
+        table = _partitioned_table()
+        table.create(conn)
+        first, last = conn.execute(
+            text(f"SELECT MIN(aggregation_timestamp_utc), MAX(aggregation_timestamp_utc) FROM {old}")
+        ).one()
+        if first is not None:
+            months = (last.year - first.year) * 12 + last.month - first.month
+            ensure_partitions(conn, months_ahead=months + batch_months, start=first)
+        else:
+            ensure_partitions(conn)
+
+        columns = ", ".join(column.name for column in table.columns)
+        copied = conn.execute(text(f"INSERT INTO {RECORDS_TABLE} ({columns}) SELECT {columns} FROM {old}")).rowcount
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{RECORDS_TABLE}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {RECORDS_TABLE}), 0) + 1, false)"
+        ))
+        conn.execute(text(f"DROP TABLE {old}"))
+        for index in DataRecord.__table__.indexes:
+            index.create(conn, checkfirst=True)
+
+    logger.info(f"Partitioned data_records: copied {copied} records")
+    return copied
+
+
+def _archive_table(name: str, source: Table) -> Table:
+    """Archive copy of a table with the same columns and primary key."""
+    table = Table(name, MetaData(), *[column._copy() for column in source.columns])
+    for column in table.columns:
+        column.autoincrement = False
+    return table
+
+
+def _retire_partition(conn: Connection, name: str, mode: str) -> None:
+    if mode == "archive":
+        conn.execute(text(
+            f"CREATE TABLE archived_{name}_payloads AS SELECT p.* FROM {PAYLOADS_TABLE} p "
+            f"JOIN {name} r ON r.id = p.record_id"
+        ))
+    conn.execute(text(f"DELETE FROM {PAYLOADS_TABLE} p USING {name} r WHERE p.record_id = r.id"))
+    if mode == "archive":
+        conn.execute(text(f"ALTER TABLE {RECORDS_TABLE} DETACH PARTITION {name}"))
+        conn.execute(text(f"ALTER TABLE {name} RENAME TO archived_{name}"))
+    else:
+        conn.execute(text(f"DROP TABLE {name}"))
+
+
+def _retire_rows(cutoff: datetime, mode: str, batch_size: int) -> int:
+    """Drop or archive records older than cutoff in batches (unpartitioned tables)."""
+    records, payloads = DataRecord.__table__, DataRecordPayload.__table__
+    if mode == "archive":
+        records_archive = _archive_table(f"{RECORDS_TABLE}_archive", records)
+        payloads_archive = _archive_table(f"{PAYLOADS_TABLE}_archive", payloads)
+        records_archive.create(engine, checkfirst=True)
+        payloads_archive.create(engine, checkfirst=True)
+
+    retired = 0
+    while True:
+        # One transaction per batch keeps locks and transaction size bounded
+        with engine.begin() as conn:
+            ids = list(conn.execute(
+                select(records.c.id).where(records.c.aggregation_timestamp_utc < cutoff).limit(batch_size)
+            ).scalars())
+            if not ids:
+                return retired
+            if mode == "archive":
+                conn.execute(insert(records_archive).from_select(
+                    list(records.c.keys()), select(records).where(records.c.id.in_(ids))
+                ))
+                conn.execute(insert(payloads_archive).from_select(
+                    list(payloads.c.keys()), select(payloads).where(payloads.c.record_id.in_(ids))
+                ))
+            conn.execute(delete(payloads).where(payloads.c.record_id.in_(ids)))
+            conn.execute(delete(records).where(records.c.id.in_(ids)))
+            retired += len(ids)
+
+
+def apply_retention(
+    retention_days: int = DATA_RETENTION_DAYS,
+    mode: str = DATA_RETENTION_MODE,
+    now: Optional[datetime] = None,
+    batch_size: int = 1000
+) -> Dict[str, Any]:
+    """
+    Drop or archive records older than the retention period.
+
+    On a partitioned table only whole monthly partitions past the cutoff
+    are retired (plus old rows that fell into the DEFAULT partition), so
+    records are kept up to a month longer than retention_days.
+
+    Args:
+        retention_days: Keep records newer than this many days (0 = keep all)
+        mode: "archive" to keep retired records in archive tables, "drop" to delete them
+        now: Reference time (UTC, defaults to now)
+        batch_size: Rows per batch for row-wise retention
+
+    Returns:
+        Dict with the cutoff, retired partitions and retired row count
+
+    Raises:
+        ValueError: If the mode is unknown
+    """
+    if mode not in ("archive", "drop"):
+        raise ValueError(f"Unknown retention mode: {mode}")
+    if retention_days <= 0:
+        return {"status": "disabled"}
+
+    cutoff = (now or datetime.utcnow()) - timedelta(days=retention_days)
+    result: Dict[str, Any] = {"status": "success", "mode": mode, "cutoff": cutoff.isoformat(), "partitions": [], "rows": 0}
+
+    with engine.begin() as conn:
+        partitioned = is_partitioned(conn)
+        if partitioned:
+            for name, month in list_partitions(conn):
+                if add_months(month, 1) <= cutoff:
+                    _retire_partition(conn, name, mode)
+                    result["partitions"].append(name)
+
+    # Unpartitioned tables, and old rows in the DEFAULT partition
+    result["rows"] = _retire_rows(cutoff if not partitioned else month_start(cutoff), mode, batch_size)
+    if result["partitions"] or result["rows"]:
+        latest_record_cache.clear()
+
+    logger.info(f"Retention ({mode}, before {cutoff:%Y-%m-%d}): {len(result['partitions'])} partitions, "
+                f"{result['rows']} rows")
+    return result
+
+
+def compact_payloads(
+    older_than_days: int = DATA_COMPACT_AFTER_DAYS,
+    now: Optional[datetime] = None,
+    batch_size: int = 1000
+) -> int:
+    """
+    Delete the raw payloads of old records, keeping the records and their summaries.
+
+    Args:
+        older_than_days: Compact records older than this many days (0 = never)
+        now: Reference time (UTC, defaults to now)
+        batch_size: Payloads deleted per transaction
+
+    Returns:
+        Number of payloads deleted
+    """
+    if older_than_days <= 0:
+        return 0
+
+    cutoff = (now or datetime.utcnow()) - timedelta(days=older_than_days)
+    records, payloads = DataRecord.__table__, DataRecordPayload.__table__
+    compacted = 0
+    while True:
+        with engine.begin() as conn:
+            ids = list(conn.execute(
+                select(payloads.c.record_id)
+                .join(records, records.c.id == payloads.c.record_id)
+                .where(records.c.aggregation_timestamp_utc < cutoff)
+                .limit(batch_size)
+            ).scalars())
+            if not ids:
+                break
+            conn.execute(delete(payloads).where(payloads.c.record_id.in_(ids)))
+            compacted += len(ids)
+
+    logger.info(f"Compacted raw payloads of {compacted} records older than {cutoff:%Y-%m-%d}")
+    return compacted
+
+
+def run_maintenance() -> Dict[str, Any]:
+    """
+    Run every lifecycle job: premake partitions, retention, then compaction.
+
+    Returns:
+        Dict with each job's results
+    """
+    with engine.begin() as conn:
+        created = ensure_partitions(conn)
+    return {
+        "partitions_created": created,
+        "retention": apply_retention(),
+        "compacted_payloads": compact_payloads()
+    }
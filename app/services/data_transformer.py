@@ -1,10 +1,10 @@
 """
 Data transformer service to convert aggregated data into database records.
 """
-import json
 from datetime import datetime
 from typing import Dict, Any
 from app.schemas.data_record import DataRecordCreate
+from app.serialization import dumps
 
 
 def transform_aggregate_to_record(aggregate: Dict[str, Any]) -> DataRecordCreate:
@@ -33,11 +33,12 @@ def transform_aggregate_to_record(aggregate: Dict[str, Any]) -> DataRecordCreate
     gemini_data = aggregate["sources"]["gemini"]
     sentiment_summary = gemini_data.get("sentiment_summary", "")
     news_summary = gemini_data.get("news_summary", "")
+    popularity_score = gemini_data.get("popularity_score")
 
-    # Convert raw responses to JSON strings
-    raw_weather = json.dumps(aggregate["sources"]["weather"], ensure_ascii=False)
-    raw_osint = json.dumps(aggregate["sources"]["osint"], ensure_ascii=False)
-    raw_gemini_response = json.dumps(gemini_data, ensure_ascii=False) if gemini_data.get("status") == "success" else None
+    # Serialize raw responses once; these bytes are stored as is
+    raw_weather = dumps(aggregate["sources"]["weather"])
+    raw_osint = dumps(aggregate["sources"]["osint"])
+    raw_gemini_response = dumps(gemini_data) if gemini_data.get("status") == "success" else None
 
     # Create and return the record
     return DataRecordCreate(
@@ -47,7 +48,7 @@ def transform_aggregate_to_record(aggregate: Dict[str, Any]) -> DataRecordCreate
         brand_name=brand_name,
         sentiment_summary=sentiment_summary,
         news_summary=news_summary,
-        popularity_score=None,
+        popularity_score=popularity_score,
         raw_weather_response=raw_weather,
         raw_osint_response=raw_osint,
         raw_gemini_response=raw_gemini_response
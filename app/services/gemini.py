@@ -1,12 +1,31 @@
 """
 Gemini AI service for text analysis using Google's Gemini 1.5 Flash model.
 """
+import asyncio
 import logging
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
 from google import genai
-from app.config import GEMINI_API_KEY
+from google.genai import types
+from app.config import GEMINI_API_KEY, GEMINI_MODEL, GEMINI_ANALYSIS_MODE, GEMINI_BASE_URL
+from app.schemas.analysis import GeminiAnalysis
+from app.services.llm_cache import llm_cache, make_cache_key
+from app.services.metrics import GEMINI_CALL_DURATION, GEMINI_CALLS, record_gemini_usage
 
 logger = logging.getLogger(__name__)
 
+# Bump a template's version whenever its wording changes so cached results are not reused
+PROMPT_TEMPLATE_VERSIONS = {
+    "sentiment": "1",
+    "trends": "1",
+    "combined": "1",
+    "chunk_summary": "1",
+    "reduce": "1",
+}
+
+# Long-lived client, shared by every prompt
+_client: Optional[genai.Client] = None
+
 
 def initialize_gemini() -> genai.Client:
     """
@@ -21,7 +40,36 @@ def initialize_gemini() -> genai.Client:
     if not GEMINI_API_KEY:
         raise ValueError("GEMINI_API_KEY is not configured")
 
-    return genai.Client(api_key=GEMINI_API_KEY)
+    http_options = types.HttpOptions(base_url=GEMINI_BASE_URL) if GEMINI_BASE_URL else None
+    return genai.Client(api_key=GEMINI_API_KEY, http_options=http_options)
+
+
+def get_gemini_client() -> genai.Client:
+    """
+    Get the shared Gemini client, creating it on first use.
+
+    Returns:
+        Shared Gemini Client instance
+
+    Raises:
+        ValueError: If API key is not configured
+    """
+    global _client
+    if _client is None:
+        _client = initialize_gemini()
+    return _client
+
+
+async def close_gemini_client() -> None:
+    """
+    Close the shared Gemini client and its connection pools.
+    """
+    global _client
+    if _client is not None:
+        await _client.aio.aclose()
+        _client.close()
+        _client = None
+        logger.info("Gemini client closed")
 
 
 def call_gemini(prompt: str) -> str:
@@ -40,9 +88,9 @@ def call_gemini(prompt: str) -> str:
     try:
         logger.info(f"Calling Gemini API with prompt length: {len(prompt)} characters")
 
-        client = initialize_gemini()
+        client = get_gemini_client()
         response = client.models.generate_content(
-            model="gemini-2.5-flash",
+            model=GEMINI_MODEL,
             contents=prompt
         )
 
@@ -57,20 +105,105 @@ def call_gemini(prompt: str) -> str:
         raise
 
 
-def analyze_sentiment(osint_snippets: str) -> str:
+async def call_gemini_async(
+    prompt: str,
+    config: Optional[types.GenerateContentConfig] = None,
+    template: str = "custom"
+) -> str:
     """
-    Analyze sentiment from brand-related OSINT text snippets.
+    Send a prompt to Gemini without blocking the event loop.
 
     Args:
-        osint_snippets: Text snippets from OSINT sources
+        prompt: Text prompt to send to Gemini
+        config: Optional generation config (e.g. structured output schema)
+        template: Prompt template name, used to label metrics
 
     Returns:
-        1-2 sentence sentiment summary from Gemini
+        Generated text response from Gemini
+
+    Raises:
+        Exception: If the API call fails
+    """
+    try:
+        logger.info(f"Calling Gemini API (async) with prompt length: {len(prompt)} characters")
+
+        client = get_gemini_client()
+        start = time.perf_counter()
+        try:
+            response = await client.aio.models.generate_content(
+                model=GEMINI_MODEL,
+                contents=prompt,
+                config=config
+            )
+        finally:
+            GEMINI_CALL_DURATION.labels(template).observe(time.perf_counter() - start)
+        GEMINI_CALLS.labels(template, "success").inc()
+        record_gemini_usage(template, response.usage_metadata)
+
+        logger.info("Gemini API call successful")
+        return response.text
+
+    except ValueError as e:
+        GEMINI_CALLS.labels(template, "error").inc()
+        logger.error(f"Configuration error: {str(e)}")
+        raise
+    except Exception as e:
+        GEMINI_CALLS.labels(template, "error").inc()
+        logger.error(f"Error calling Gemini API: {str(e)}", exc_info=True)
+        raise
+
+
+async def call_gemini_cached(
+    template: str,
+    osint_snippets: str,
+    prompt: str,
+    config: Optional[types.GenerateContentConfig] = None,
+    parse: Optional[Callable[[str], Any]] = None
+) -> Tuple[Any, bool]:
+    """
+    Call Gemini through the result cache.
+
+    A response is only cached once it is non-empty and, if a parser is
+    given, parsed successfully, so a malformed answer is retried next run
+    instead of being served from the cache.
+
+    Args:
+        template: Prompt template name (see PROMPT_TEMPLATE_VERSIONS)
+        osint_snippets: Snippets the prompt was built from (part of the cache key)
+        prompt: Full prompt text
+        config: Optional generation config
+        parse: Optional parser applied to the response text (e.g. schema validation)
+
+    Returns:
+        Tuple of (response text or parsed response, whether it was served from cache)
 
     Raises:
+        ValueError: If Gemini returns an empty response or the parser rejects it
         Exception: If the API call fails
     """
-    prompt = f"""
+    key = make_cache_key(osint_snippets, template, PROMPT_TEMPLATE_VERSIONS[template], GEMINI_MODEL)
+    cached = await llm_cache.get(key)
+    if cached is not None:
+        try:
+            result = parse(cached) if parse else cached
+        except ValueError as e:
+            logger.warning(f"Ignoring unparseable cached {template} response: {str(e)}")
+        else:
+            GEMINI_CALLS.labels(template, "cached").inc()
+            logger.info(f"Gemini cache hit for {template} prompt")
+            return result, True
+
+    response_text = await call_gemini_async(prompt, config=config, template=template)
+    if not response_text:
+        raise ValueError(f"Gemini returned an empty response for the {template} prompt")
+    result = parse(response_text) if parse else response_text
+    await llm_cache.set(key, response_text, model=GEMINI_MODEL, template=template)
+    return result, False
+
+
+def build_sentiment_prompt(osint_snippets: str) -> str:
+    """Build the sentiment analysis prompt for the given snippets."""
+    return f"""
     Analyze the following brand-related text snippets and
     provide a concise 1 or 2 sentence summary of the
     overall public sentiment.
@@ -81,8 +214,76 @@ def analyze_sentiment(osint_snippets: str) -> str:
     {osint_snippets}
     """
 
+
+def build_trends_prompt(osint_snippets: str) -> str:
+    """Build the trend analysis prompt for the given snippets."""
+    return f"""
+    Summarize the major news or emerging trends about this brand 
+    in 1 or 2 sentences based strictly on the text below. Keep 
+    the tone neutral and avoid adding assumptions.
+
+    Text:
+    {osint_snippets}"""
+
+
+def build_combined_prompt(osint_snippets: str) -> str:
+    """Build the combined sentiment, trend and popularity prompt for the given snippets."""
+    return f"""
+    Analyze the following brand-related text snippets and return:
+    - sentiment_summary: a concise 1 or 2 sentence summary of the
+      overall public sentiment. Be direct and avoid exaggeration.
+    - news_summary: the major news or emerging trends about this brand
+      in 1 or 2 sentences. Keep the tone neutral.
+    - popularity_score: a number from 0 to 100 estimating how much public
+      interest and engagement the brand has in these snippets.
+    Base every answer strictly on the text provided and avoid adding assumptions.
+    Text:
+
+    {osint_snippets}
+    """
+
+
+def build_chunk_summary_prompt(osint_snippets: str) -> str:
+    """Build the map-step prompt that condenses one chunk of posts."""
+    return f"""
+    Condense the following brand-related posts into at most 5 short
+    bullet points covering: the public sentiment expressed, any news or
+    emerging trends, and how much attention the brand is getting.
+    Keep the tone neutral and base every point strictly on the text.
+    Text:
+
+    {osint_snippets}
+    """
+
+
+def build_reduce_prompt(partial_summaries: str) -> str:
+    """Build the reduce-step prompt that merges partial summaries."""
+    return f"""
+    The following are bullet-point summaries of separate batches of
+    brand-related posts. Merge them into at most 8 bullet points covering
+    public sentiment, news or emerging trends, and brand attention.
+    Combine duplicates, keep the tone neutral and add nothing new.
+    Summaries:
+
+    {partial_summaries}
+    """
+
+
+def analyze_sentiment(osint_snippets: str) -> str:
+    """
+    Analyze sentiment from brand-related OSINT text snippets.
+
+    Args:
+        osint_snippets: Text snippets from OSINT sources
+
+    Returns:
+        1-2 sentence sentiment summary from Gemini
+
+    Raises:
+        Exception: If the API call fails
+    """
     logger.info("Analyzing sentiment with Gemini")
-    return call_gemini(prompt)
+    return call_gemini(build_sentiment_prompt(osint_snippets))
 
 
 def analyze_trends(osint_snippets: str) -> str:
@@ -98,13 +299,96 @@ def analyze_trends(osint_snippets: str) -> str:
     Raises:
         Exception: If the API call fails
     """
-    prompt = f"""
-    Summarize the major news or emerging trends about this brand 
-    in 1 or 2 sentences based strictly on the text below. Keep 
-    the tone neutral and avoid adding assumptions.
+    logger.info("Analyzing trends with Gemini")
+    return call_gemini(build_trends_prompt(osint_snippets))
 
-    Text:
-    {osint_snippets}"""
 
-    logger.info("Analyzing trends with Gemini")
-    return call_gemini(prompt)
\ No newline at end of file
+async def _analyze_sentiment_cached(osint_snippets: str) -> Tuple[str, bool]:
+    logger.info("Analyzing sentiment with Gemini (async)")
+    return await call_gemini_cached("sentiment", osint_snippets, build_sentiment_prompt(osint_snippets))
+
+
+async def _analyze_trends_cached(osint_snippets: str) -> Tuple[str, bool]:
+    logger.info("Analyzing trends with Gemini (async)")
+    return await call_gemini_cached("trends", osint_snippets, build_trends_prompt(osint_snippets))
+
+
+async def _analyze_combined_cached(osint_snippets: str) -> Tuple[GeminiAnalysis, bool]:
+    logger.info("Analyzing sentiment, trends and popularity with Gemini (combined)")
+    config = types.GenerateContentConfig(
+        response_mime_type="application/json",
+        response_schema=GeminiAnalysis
+    )
+    return await call_gemini_cached(
+        "combined", osint_snippets, build_combined_prompt(osint_snippets),
+        config=config, parse=GeminiAnalysis.model_validate_json
+    )
+
+
+async def summarize_chunk_async(osint_snippets: str) -> str:
+    """
+    Condense one chunk of posts into bullet points (map step).
+
+    Args:
+        osint_snippets: Formatted posts of one chunk
+
+    Returns:
+        Bullet-point summary from Gemini
+    """
+    summary, _ = await call_gemini_cached(
+        "chunk_summary", osint_snippets, build_chunk_summary_prompt(osint_snippets)
+    )
+    return summary
+
+
+async def reduce_summaries_async(partial_summaries: str) -> str:
+    """
+    Merge several partial summaries into one (reduce step).
+
+    Args:
+        partial_summaries: Partial summaries joined into one text
+
+    Returns:
+        Merged bullet-point summary from Gemini
+    """
+    summary, _ = await call_gemini_cached(
+        "reduce", partial_summaries, build_reduce_prompt(partial_summaries)
+    )
+    return summary
+
+
+async def analyze_osint_async(osint_snippets: str, mode: str = GEMINI_ANALYSIS_MODE) -> Dict[str, Any]:
+    """
+    Analyze OSINT snippets in the configured analysis mode.
+
+    Args:
+        osint_snippets: Text snippets from OSINT sources
+        mode: "combined" for one structured call, "separate" for concurrent
+            sentiment and trend calls (no popularity score)
+
+    Returns:
+        Dict with mode, sentiment_summary, news_summary, popularity_score and
+        cached (True when every result was served from the cache)
+
+    Raises:
+        ValueError: If the mode is unknown
+        Exception: If an API call fails
+    """
+    if mode == "combined":
+        analysis, cached = await _analyze_combined_cached(osint_snippets)
+        return {"mode": mode, **analysis.model_dump(), "cached": cached}
+
+    if mode == "separate":
+        (sentiment_summary, sentiment_cached), (news_summary, news_cached) = await asyncio.gather(
+            _analyze_sentiment_cached(osint_snippets),
+            _analyze_trends_cached(osint_snippets)
+        )
+        return {
+            "mode": mode,
+            "sentiment_summary": sentiment_summary,
+            "news_summary": news_summary,
+            "popularity_score": None,
+            "cached": sentiment_cached and news_cached
+        }
+
+    raise ValueError(f"Unknown Gemini analysis mode: {mode}")
@@ -0,0 +1,159 @@
+"""
+Shared, pooled HTTP client used by all upstream fetchers.
+
+One application-scoped httpx.AsyncClient is created in the FastAPI lifespan
+and reused by every service, so connections (and TLS sessions) are kept alive
+across calls and runs instead of being re-established per request. httpx keeps
+a separate keep-alive pool per origin (scheme, host, port), and with HTTP/2
+concurrent requests to the same host are multiplexed over one connection.
+Requests go through a per-host rate limiter that retries throttled and failed
+calls (see app.services.rate_limit).
+"""
+import logging
+from typing import Any, Dict, Optional
+import httpx
+from app.services.metrics import meter_response
+from app.services.rate_limit import RateLimitedTransport
+from app.config import (
+    HTTP_TIMEOUT_SECONDS,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    HTTP2_ENABLED,
+    RATE_LIMIT_ENABLED,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionStats:
+    """Counts requests and newly opened connections to measure pool reuse."""
+
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+
+    @property
+    def reused(self) -> int:
+        """Requests served over an already-open connection."""
+        return max(self.requests - self.new_connections, 0)
+
+    async def trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        """httpcore trace callback, invoked for every connection-level event."""
+        if event_name == "connection.connect_tcp.complete":
+            self.new_connections += 1
+
+    async def on_request(self, request: httpx.Request) -> None:
+        """httpx request hook that attaches the trace callback."""
+        self.requests += 1
+        request.extensions["trace"] = self.trace
+
+    def reset(self) -> None:
+        self.requests = 0
+        self.new_connections = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reused_connections": self.reused,
+            "reuse_ratio": round(self.reused / self.requests, 4) if self.requests else 0.0
+        }
+
+
+connection_stats = ConnectionStats()
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def create_http_client(
+    max_connections: int = HTTP_MAX_CONNECTIONS,
+    max_keepalive_connections: int = HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    http2: bool = HTTP2_ENABLED,
+    timeout: float = HTTP_TIMEOUT_SECONDS,
+    rate_limit: bool = RATE_LIMIT_ENABLED,
+    **kwargs: Any
+) -> httpx.AsyncClient:
+    """
+    Create a pooled HTTP client that reports to the shared connection stats,
+    counts response bytes per host and, optionally, rate limits and retries
+    requests per host.
+
+    Args:
+        max_connections: Maximum open connections across all hosts
+        max_keepalive_connections: Maximum idle connections kept alive
+        keepalive_expiry: Seconds an idle connection is kept alive
+        http2: Whether to negotiate HTTP/2
+        timeout: Default request timeout in seconds
+        rate_limit: Whether to wrap the transport in RateLimitedTransport
+        **kwargs: Extra arguments passed to httpx.AsyncClient (a `transport`
+            replaces the pooled one and is still rate limited)
+
+    Returns:
+        Configured httpx.AsyncClient
+    """
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry
+    )
+    transport = kwargs.pop("transport", None) or httpx.AsyncHTTPTransport(limits=limits, http2=http2)
+    if rate_limit:
+        transport = RateLimitedTransport(transport)
+    return httpx.AsyncClient(
+        transport=transport,
+        timeout=timeout,
+        event_hooks={"request": [connection_stats.on_request], "response": [meter_response]},
+        **kwargs
+    )
+
+
+def init_http_client() -> httpx.AsyncClient:
+    """
+    Create the application-scoped HTTP client if it doesn't exist yet.
+
+    Returns:
+        The shared httpx.AsyncClient
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_http_client()
+        logger.info(f"Shared HTTP client created (http2={HTTP2_ENABLED}, "
+                    f"max_connections={HTTP_MAX_CONNECTIONS}, "
+                    f"max_keepalive={HTTP_MAX_KEEPALIVE_CONNECTIONS}, "
+                    f"rate_limit={RATE_LIMIT_ENABLED})")
+    return _client
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Dependency function to get the shared HTTP client.
+
+    Created lazily so scripts and the scheduler work outside the app lifespan.
+
+    Returns:
+        The shared httpx.AsyncClient
+    """
+    return init_http_client()
+
+
+async def close_http_client() -> None:
+    """
+    Close the shared HTTP client and release pooled connections.
+    """
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        logger.info(f"Shared HTTP client closed: {connection_stats.as_dict()}")
+
+
+def get_connection_stats() -> Dict[str, Any]:
+    """
+    Get connection reuse counters for the shared client.
+
+    Returns:
+        Dict with request, new connection and reuse counts
+    """
+    return connection_stats.as_dict()
@@ -0,0 +1,381 @@
+"""
+Background refresh jobs with single-flight deduplication across workers.
+
+POST /data/refresh submits a job and returns right away; the aggregation
+runs as a background task and clients poll the job for per-stage progress.
+Triggers for a target set that already has a job in flight (n8n retries,
+several users clicking at once) join that job instead of starting a
+duplicate run against Reddit and Gemini.
+
+Jobs are rows in the refresh_jobs table, so every uvicorn worker and replica
+sees them: an in-flight job holds a unique active_key for its target set,
+which makes a second worker join it instead of starting its own. The worker
+running a job saves its progress on a heartbeat; a job whose heartbeat stops
+(its worker died) is marked failed, so the next trigger starts a new run.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import socket
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import httpx
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from app.config import (
+    REFRESH_JOB_HISTORY_SIZE,
+    REFRESH_JOB_HEARTBEAT_SECONDS,
+    REFRESH_JOB_STALE_SECONDS,
+    REFRESH_JOB_POLL_SECONDS,
+)
+from app.database import AsyncSessionLocal
+from app.models.refresh_job import RefreshJobRecord
+from app.schemas.target import Target
+from app.serialization import dumps, loads
+from app.services.aggregator import aggregate_all_data, slim_results
+from app.services.progress import RunProgress
+from app.services.targets import get_targets
+
+logger = logging.getLogger(__name__)
+
+# Identifies a target set regardless of order
+JobKey = Tuple[str, ...]
+
+IN_FLIGHT = ("queued", "running")
+
+
+def active_key(key: JobKey) -> str:
+    """Fixed-length form of a target set, held by its in-flight job."""
+    return hashlib.sha1("\n".join(key).encode("utf-8")).hexdigest()
+
+
+class RefreshJob:
+    """One background aggregation run and its progress."""
+
+    def __init__(self, key: JobKey, targets: Optional[List[Target]] = None):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.targets = targets or []
+        self.status = "queued"
+        self.worker: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.progress = RunProgress()
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        # Triggers coalesced into this job, including the one that created it
+        self.triggers = 1
+        self.task: Optional[asyncio.Task] = None
+        # Progress snapshot of a job running on another worker
+        self._stages: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_row(cls, row: RefreshJobRecord) -> "RefreshJob":
+        """Build a read-only view of a job from its database row."""
+        job = cls(tuple(loads(row.target_keys)))
+        job.id = row.id
+        job.apply_row(row)
+        return job
+
+    def apply_row(self, row: RefreshJobRecord) -> None:
+        """Refresh a job view from its database row."""
+        self.status = row.status
+        self.worker = row.worker
+        self.triggers = row.triggers
+        self.created_at = row.created_at
+        self.started_at = row.started_at
+        self.finished_at = row.finished_at
+        self.result = row.result
+        self.error = row.error
+        self._stages = loads(row.stages) if row.stages else None
+
+    @property
+    def in_flight(self) -> bool:
+        return self.status in IN_FLIGHT
+
+    def to_dict(self, include_result: bool = True, slim: bool = False) -> Dict[str, Any]:
+        """
+        Get the job's status, progress and (once finished) result.
+
+        Args:
+            include_result: Include the aggregation result of a finished job
+            slim: Leave the raw source payloads out of the result
+        """
+        duration = None
+        if self.started_at is not None:
+            duration = ((self.finished_at or datetime.utcnow()) - self.started_at).total_seconds()
+        job = {
+            "job_id": self.id,
+            "status": self.status,
+            "targets": list(self.key),
+            "triggers": self.triggers,
+            "worker": self.worker,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "duration_seconds": duration,
+            "stages": self._stages if self.task is None and self._stages is not None else self.progress.to_dict()
+        }
+        if self.error is not None:
+            job["error"] = self.error
+        if include_result and self.result is not None:
+            job["result"] = slim_results(self.result) if slim else self.result
+        return job
+
+
+class RefreshJobManager:
+    """Runs refresh jobs in the background, one in flight per target set across all workers."""
+
+    def __init__(
+        self,
+        history_size: int = REFRESH_JOB_HISTORY_SIZE,
+        worker_id: Optional[str] = None,
+        heartbeat_seconds: float = REFRESH_JOB_HEARTBEAT_SECONDS,
+        stale_seconds: float = REFRESH_JOB_STALE_SECONDS,
+        poll_seconds: float = REFRESH_JOB_POLL_SECONDS,
+    ):
+        self.history_size = history_size
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stale_seconds = stale_seconds
+        self.poll_seconds = poll_seconds
+        # Jobs this worker runs; other workers' jobs are read from the database
+        self._jobs: "OrderedDict[str, RefreshJob]" = OrderedDict()
+        self._in_flight: Dict[JobKey, RefreshJob] = {}
+
+    async def submit(
+        self,
+        targets: Optional[List[Target]] = None,
+        client: Optional[httpx.AsyncClient] = None
+    ) -> Tuple[RefreshJob, bool]:
+        """
+        Start a refresh job, or join the one already in flight for the same targets.
+
+        Must be called from the event loop that runs the jobs.
+
+        Args:
+            targets: Targets to aggregate (defaults to the target registry)
+            client: HTTP client for upstream fetches (defaults to the shared pooled client)
+
+        Returns:
+            Tuple of (job, whether a new job was created)
+        """
+        targets = targets if targets is not None else get_targets()
+        key = tuple(sorted({target.key for target in targets}))
+
+        job = self._in_flight.get(key)
+        if job is not None:
+            job.triggers += 1
+            await self._add_trigger(job.id)
+            logger.info(f"Refresh job {job.id} already in flight for {len(key)} targets - joining it")
+            return job, False
+
+        job = RefreshJob(key, targets)
+        job.worker = self.worker_id
+        # The insert fails if another worker holds the target set; join its job then.
+        # A second attempt covers a job that finished in between.
+        for _ in range(2):
+            remote = await self._join_remote(key)
+            if remote is not None:
+                logger.info(f"Refresh job {remote.id} in flight on {remote.worker} for {len(key)} targets - joining it")
+                return remote, False
+            if await self._insert(job):
+                break
+        else:
+            raise RuntimeError(f"Could not start or join a refresh job for {len(key)} targets")
+
+        self._jobs[job.id] = job
+        self._in_flight[key] = job
+        job.task = asyncio.create_task(self._run(job, client))
+        await self._prune()
+        logger.info(f"Started refresh job {job.id} for {len(key)} targets")
+        return job, True
+
+    async def _insert(self, job: RefreshJob) -> bool:
+        async with AsyncSessionLocal() as db:
+            try:
+                await db.execute(insert(RefreshJobRecord).values(
+                    id=job.id,
+                    target_keys=dumps(list(job.key)).decode("utf-8"),
+                    active_key=active_key(job.key),
+                    status=job.status,
+                    worker=job.worker,
+                    triggers=job.triggers,
+                    created_at=job.created_at,
+                    heartbeat_at=job.created_at
+                ))
+                await db.commit()
+                return True
+            except IntegrityError:
+                await db.rollback()
+                return False
+
+    async def _join_remote(self, key: JobKey) -> Optional[RefreshJob]:
+        """Add a trigger to another worker's in-flight job for the key, if there is a live one."""
+        async with AsyncSessionLocal() as db:
+            row = await db.scalar(select(RefreshJobRecord).where(RefreshJobRecord.active_key == active_key(key)))
+            if row is None:
+                return None
+            if await self._expire_if_stale(db, row):
+                return None
+            await db.execute(
+                update(RefreshJobRecord)
+                .where(RefreshJobRecord.id == row.id)
+                .values(triggers=RefreshJobRecord.triggers + 1)
+            )
+            await db.commit()
+            await db.refresh(row)
+            return RefreshJob.from_row(row)
+
+    async def _expire_if_stale(self, db, row: RefreshJobRecord) -> bool:
+        """Mark an in-flight job failed if its worker stopped sending heartbeats."""
+        if row.status not in IN_FLIGHT:
+            return False
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_seconds)
+        if row.heartbeat_at >= cutoff:
+            return False
+        result = await db.execute(
+            update(RefreshJobRecord)
+            .where(RefreshJobRecord.id == row.id, RefreshJobRecord.heartbeat_at < cutoff)
+            .values(
+                status="failed",
+                active_key=None,
+                finished_at=datetime.utcnow(),
+                error=f"Worker {row.worker} stopped responding"
+            )
+        )
+        await db.commit()
+        if result.rowcount:
+            logger.warning(f"Refresh job {row.id} on {row.worker} missed its heartbeats - marked failed")
+        await db.refresh(row)
+        return True
+
+    async def _add_trigger(self, job_id: str) -> None:
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(RefreshJobRecord)
+                    .where(RefreshJobRecord.id == job_id)
+                    .values(triggers=RefreshJobRecord.triggers + 1)
+                )
+                await db.commit()
+        except SQLAlchemyError as e:
+            logger.warning(f"Could not record trigger of refresh job {job_id}: {str(e)}")
+
+    async def _save(self, job: RefreshJob, **values: Any) -> None:
+        """Write a job's progress and heartbeat (plus any other columns) to its row."""
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(RefreshJobRecord)
+                    .where(RefreshJobRecord.id == job.id)
+                    .values(
+                        status=job.status,
+                        heartbeat_at=datetime.utcnow(),
+                        stages=dumps(job.progress.to_dict()).decode("utf-8"),
+                        **values
+                    )
+                )
+                await db.commit()
+        except SQLAlchemyError as e:
+            # The run itself doesn't depend on the row; other workers just see older progress
+            logger.warning(f"Could not save refresh job {job.id}: {str(e)}")
+
+    async def _heartbeat(self, job: RefreshJob) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            await self._save(job)
+
+    async def _run(self, job: RefreshJob, client: Optional[httpx.AsyncClient]) -> None:
+        job.status = "running"
+        job.started_at = datetime.utcnow()
+        await self._save(job, started_at=job.started_at)
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            job.result = await aggregate_all_data(targets=job.targets, client=client, progress=job.progress)
+            job.status = "succeeded"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            raise
+        except Exception as e:
+            logger.error(f"Refresh job {job.id} failed: {str(e)}", exc_info=True)
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+            job.finished_at = datetime.utcnow()
+            self._in_flight.pop(job.key, None)
+            await self._save(job, active_key=None, finished_at=job.finished_at, result=job.result, error=job.error)
+
+    async def get(self, job_id: str) -> Optional[RefreshJob]:
+        """
+        Look up a job by ID, whichever worker runs it.
+
+        Args:
+            job_id: Job ID returned by submit
+
+        Returns:
+            RefreshJob, or None if it is unknown or was pruned
+        """
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        async with AsyncSessionLocal() as db:
+            row = await db.get(RefreshJobRecord, job_id)
+            if row is None:
+                return None
+            await self._expire_if_stale(db, row)
+            return RefreshJob.from_row(row)
+
+    async def wait(self, job: RefreshJob) -> RefreshJob:
+        """
+        Wait for a job to finish, without cancelling it if the waiter is cancelled.
+
+        Jobs running on another worker are polled from the database.
+        """
+        if job.task is not None:
+            await asyncio.wait([job.task])
+            return job
+        while job.in_flight:
+            await asyncio.sleep(self.poll_seconds)
+            async with AsyncSessionLocal() as db:
+                row = await db.get(RefreshJobRecord, job.id)
+                if row is None:
+                    job.status, job.error = "failed", "Job was removed"
+                    break
+                await self._expire_if_stale(db, row)
+                job.apply_row(row)
+        return job
+
+    async def _prune(self) -> None:
+        # Forget the oldest finished jobs beyond the history size, here and in the database
+        finished = [job_id for job_id, job in self._jobs.items() if not job.in_flight]
+        for job_id in finished[:max(len(self._jobs) - self.history_size, 0)]:
+            del self._jobs[job_id]
+        try:
+            async with AsyncSessionLocal() as db:
+                keep = select(RefreshJobRecord.id).order_by(RefreshJobRecord.created_at.desc()).limit(self.history_size)
+                await db.execute(
+                    delete(RefreshJobRecord).where(
+                        RefreshJobRecord.finished_at.is_not(None),
+                        RefreshJobRecord.id.not_in(keep.scalar_subquery())
+                    )
+                )
+                await db.commit()
+        except SQLAlchemyError as e:
+            logger.warning(f"Could not prune refresh jobs: {str(e)}")
+
+    async def shutdown(self) -> None:
+        """Cancel every job still in flight and wait for them to stop."""
+        tasks = [job.task for job in self._in_flight.values() if job.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+refresh_jobs = RefreshJobManager()
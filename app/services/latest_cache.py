@@ -0,0 +1,109 @@
+"""
+In-process cache of the latest data record per (city, brand) filter.
+
+Dashboards poll /data/latest constantly, so the answer is kept in memory and
+served without touching the database. Inserting a record invalidates every
+filter it could change. Entries also expire after a short TTL, which bounds
+how long a record inserted by another worker can stay invisible.
+"""
+import time
+from typing import Any, Dict, Optional, Tuple
+from app.config import LATEST_CACHE_ENABLED, LATEST_CACHE_TTL_SECONDS
+
+# (city, brand); None means "any"
+CacheKey = Tuple[Optional[str], Optional[str]]
+
+
+class LatestRecordCache:
+    """Latest record per (city, brand) filter, invalidated on insert."""
+
+    def __init__(self, enabled: bool = LATEST_CACHE_ENABLED, ttl_seconds: float = LATEST_CACHE_TTL_SECONDS):
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[CacheKey, Tuple[Any, float]] = {}
+        # Bumped on every invalidation so a read that raced an insert isn't cached
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, city: Optional[str], brand: Optional[str]) -> Optional[Any]:
+        """
+        Look up the cached latest record for a filter.
+
+        Args:
+            city: City filter, or None for any city
+            brand: Brand filter, or None for any brand
+
+        Returns:
+            Cached record, or None on a miss
+        """
+        if not self.enabled:
+            return None
+        entry = self._entries.get((city, brand))
+        if entry is not None and entry[1] > time.monotonic():
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        return None
+
+    def set(self, city: Optional[str], brand: Optional[str], record: Any, generation: int) -> None:
+        """
+        Cache the latest record for a filter.
+
+        Args:
+            city: City filter, or None for any city
+            brand: Brand filter, or None for any brand
+            record: Record to cache
+            generation: Value of `generation` read before the record was loaded
+        """
+        if not self.enabled or generation != self.generation:
+            return
+        self._entries[(city, brand)] = (record, time.monotonic() + self.ttl_seconds)
+
+    def invalidate(self, city: str, brand: str) -> None:
+        """
+        Drop every filter a new record for (city, brand) could change.
+
+        Args:
+            city: City of the inserted record
+            brand: Brand of the inserted record
+        """
+        self.generation += 1
+        for key in ((city, brand), (city, None), (None, brand), (None, None)):
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every entry and reset counters."""
+        self.generation += 1
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache hit and miss counters.
+
+        Returns:
+            Dict with hits, misses, hit ratio and size
+        """
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+latest_record_cache = LatestRecordCache()
+
+
+def get_latest_cache_stats() -> Dict[str, Any]:
+    """
+    Get hit and miss counters for the latest-record cache.
+
+    Returns:
+        Dict of cache counters
+    """
+    return latest_record_cache.stats()
@@ -0,0 +1,226 @@
+"""
+Content-addressed cache for Gemini results.
+
+Entries are keyed on a hash of the normalized OSINT snippets, the prompt
+template name and version, and the model name, so unchanged Reddit results
+never pay for the same summary twice. Lookups go through an in-process LRU
+first and fall back to the llm_cache_entries table, which survives restarts
+and is shared between workers. Both tiers expire entries after a TTL and
+evict the oldest entries once they exceed their size limit.
+"""
+import hashlib
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+from app.config import (
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_PERSIST,
+    LLM_CACHE_TTL_SECONDS,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_DB_MAX_ENTRIES,
+)
+from sqlalchemy import delete, func, select
+from app.database import AsyncSessionLocal
+from app.models.llm_cache import LLMCacheEntry
+
+logger = logging.getLogger(__name__)
+
+# Prune expired / excess database rows once every N writes
+DB_PRUNE_EVERY = 100
+
+
+def normalize_snippets(snippets: str) -> str:
+    """Collapse whitespace so formatting-only changes don't miss the cache."""
+    return " ".join(snippets.split())
+
+
+def make_cache_key(snippets: str, template: str, template_version: str, model: str) -> str:
+    """
+    Build the content-addressed cache key for a prompt.
+
+    Args:
+        snippets: OSINT text the prompt is built from
+        template: Prompt template name
+        template_version: Prompt template version, bumped whenever the wording changes
+        model: Gemini model name
+
+    Returns:
+        sha256 hex digest
+    """
+    digest = hashlib.sha256()
+    for part in (model, template, template_version, normalize_snippets(snippets)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class LLMCache:
+    """Two-tier (memory LRU + database) cache of Gemini response texts."""
+
+    def __init__(
+        self,
+        enabled: bool = LLM_CACHE_ENABLED,
+        persist: bool = LLM_CACHE_PERSIST,
+        ttl_seconds: int = LLM_CACHE_TTL_SECONDS,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        db_max_entries: int = LLM_CACHE_DB_MAX_ENTRIES,
+    ):
+        self.enabled = enabled
+        self.persist = persist
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.max_entries = max_entries
+        self.db_max_entries = db_max_entries
+        self._entries: "OrderedDict[str, Tuple[str, datetime]]" = OrderedDict()
+        self._db_writes = 0
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response.
+
+        Args:
+            key: Cache key from make_cache_key
+
+        Returns:
+            Cached response text, or None on a miss
+        """
+        if not self.enabled:
+            return None
+
+        now = datetime.utcnow()
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return value
+            del self._entries[key]
+
+        if self.persist:
+            try:
+                row = await self._db_get(key, now)
+            except Exception as e:
+                logger.warning(f"LLM cache database lookup failed: {str(e)}")
+                row = None
+            if row is not None:
+                value, expires_at = row
+                self._remember(key, value, expires_at)
+                self.db_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: str, model: str, template: str) -> None:
+        """
+        Store a response in both tiers.
+
+        Args:
+            key: Cache key from make_cache_key
+            value: Gemini response text
+            model: Gemini model name
+            template: Prompt template name
+        """
+        if not self.enabled:
+            return
+
+        now = datetime.utcnow()
+        expires_at = now + self.ttl
+        self._remember(key, value, expires_at)
+
+        if self.persist:
+            try:
+                await self._db_set(key, value, model, template, now, expires_at)
+            except Exception as e:
+                logger.warning(f"LLM cache database write failed: {str(e)}")
+
+    def clear(self) -> None:
+        """Drop the in-memory tier and reset counters."""
+        self._entries.clear()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache hit and miss counters.
+
+        Returns:
+            Dict with per-tier hits, misses, hit ratio and memory size
+        """
+        hits = self.memory_hits + self.db_hits
+        lookups = hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "memory_entries": len(self._entries),
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0
+        }
+
+    def _remember(self, key: str, value: str, expires_at: datetime) -> None:
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _db_get(self, key: str, now: datetime) -> Optional[Tuple[str, datetime]]:
+        async with AsyncSessionLocal() as db:
+            entry = await db.get(LLMCacheEntry, key)
+            if entry is None or entry.expires_at <= now:
+                return None
+            return entry.response_text, entry.expires_at
+
+    async def _db_set(
+        self,
+        key: str,
+        value: str,
+        model: str,
+        template: str,
+        now: datetime,
+        expires_at: datetime
+    ) -> None:
+        async with AsyncSessionLocal() as db:
+            await db.merge(LLMCacheEntry(
+                cache_key=key,
+                model=model,
+                template=template,
+                response_text=value,
+                created_at=now,
+                expires_at=expires_at
+            ))
+            await db.commit()
+
+            self._db_writes += 1
+            if self._db_writes % DB_PRUNE_EVERY == 0:
+                await self._db_prune(db, now)
+
+    async def _db_prune(self, db, now: datetime) -> None:
+        """Delete expired rows, then the oldest rows beyond db_max_entries."""
+        expired = (await db.execute(delete(LLMCacheEntry).where(LLMCacheEntry.expires_at <= now))).rowcount
+        excess = await db.scalar(select(func.count()).select_from(LLMCacheEntry)) - self.db_max_entries
+        if excess > 0:
+            oldest = select(LLMCacheEntry.cache_key).order_by(
+                LLMCacheEntry.created_at.asc()
+            ).limit(excess).scalar_subquery()
+            await db.execute(delete(LLMCacheEntry).where(LLMCacheEntry.cache_key.in_(oldest)))
+        await db.commit()
+        logger.info(f"Pruned LLM cache table: {expired} expired, {max(excess, 0)} over size limit")
+
+
+llm_cache = LLMCache()
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """
+    Get hit and miss counters for the Gemini result cache.
+
+    Returns:
+        Dict of cache counters
+    """
+    return llm_cache.stats()
@@ -0,0 +1,181 @@
+"""
+Prometheus metrics for aggregation runs, upstream traffic and caches.
+
+Stage latencies are histograms labelled by stage (weather_fetch,
+osint_fetch, prompt_build, gemini, transform, db_write), each Gemini call is
+timed per prompt template with its token counts, and bytes read from
+upstream APIs are counted per host. Cache hit and miss counters are read
+from the caches' own stats at scrape time. Served by GET /metrics.
+
+Metrics live in process memory, so each uvicorn worker reports its own.
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+import httpx
+from prometheus_client import Counter, Histogram, REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from app.services.latest_cache import get_latest_cache_stats
+from app.services.llm_cache import get_cache_stats
+from app.services.weather_cache import get_weather_cache_stats
+
+# Seconds; runs range from cached lookups to minutes-long OSINT collection
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 90, 120, 300)
+
+STAGE_DURATION = Histogram(
+    "aggregator_stage_duration_seconds",
+    "Time spent in each aggregation stage",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_RESULTS = Counter(
+    "aggregator_stage_results_total",
+    "Aggregation stage outcomes (success, error, timeout, or cancelled when its target timed out)",
+    ["stage", "status"],
+)
+TARGET_TIMEOUTS = Counter(
+    "aggregator_target_timeouts_total",
+    "Targets whose stages did not finish within the target timeout",
+)
+OSINT_SOURCE_DURATION = Histogram(
+    "osint_source_duration_seconds",
+    "Time spent collecting posts from each OSINT source",
+    ["source"],
+    buckets=LATENCY_BUCKETS,
+)
+OSINT_SOURCE_RESULTS = Counter(
+    "osint_source_results_total",
+    "OSINT source outcomes (success, error or timeout)",
+    ["source", "status"],
+)
+OSINT_POSTS = Counter(
+    "osint_posts_total",
+    "New posts collected from each OSINT source",
+    ["source"],
+)
+GEMINI_CALL_DURATION = Histogram(
+    "gemini_call_duration_seconds",
+    "Latency of Gemini API calls",
+    ["template"],
+    buckets=LATENCY_BUCKETS,
+)
+GEMINI_CALLS = Counter(
+    "gemini_calls_total",
+    "Gemini prompts by outcome (success, error, or cached when served from the result cache)",
+    ["template", "status"],
+)
+GEMINI_TOKENS = Counter(
+    "gemini_tokens_total",
+    "Prompt and response tokens reported by Gemini",
+    ["template", "kind"],
+)
+UPSTREAM_BYTES = Counter(
+    "upstream_response_bytes_total",
+    "Response bytes read from upstream APIs, as received on the wire",
+    ["host"],
+)
+UPSTREAM_RETRIES = Counter(
+    "upstream_retries_total",
+    "Upstream requests retried, by host and reason (status code or transport error)",
+    ["host", "reason"],
+)
+UPSTREAM_THROTTLE_SECONDS = Counter(
+    "upstream_throttle_seconds_total",
+    "Time requests waited for the per-host rate limiter",
+    ["host"],
+)
+CIRCUIT_BREAKER_OPENS = Counter(
+    "upstream_circuit_breaker_opens_total",
+    "Times an upstream host's circuit breaker opened",
+    ["host"],
+)
+
+
+@contextmanager
+def observe_stage(stage: str) -> Iterator[None]:
+    """
+    Time a stage and count its outcome; timeouts, cancellations and errors are re-raised.
+
+    Args:
+        stage: Stage label
+    """
+    start = time.perf_counter()
+    status = "success"
+    try:
+        yield
+    except asyncio.TimeoutError:
+        status = "timeout"
+        raise
+    except asyncio.CancelledError:
+        status = "cancelled"
+        raise
+    except Exception:
+        status = "error"
+        raise
+    finally:
+        STAGE_DURATION.labels(stage).observe(time.perf_counter() - start)
+        STAGE_RESULTS.labels(stage, status).inc()
+
+
+def record_gemini_usage(template: str, usage: Optional[Any]) -> None:
+    """
+    Count the tokens of one Gemini response.
+
+    Args:
+        template: Prompt template name
+        usage: Response usage_metadata (may be None)
+    """
+    if usage is None:
+        return
+    if usage.prompt_token_count:
+        GEMINI_TOKENS.labels(template, "prompt").inc(usage.prompt_token_count)
+    if usage.candidates_token_count:
+        GEMINI_TOKENS.labels(template, "response").inc(usage.candidates_token_count)
+
+
+class _MeteredStream(httpx.AsyncByteStream):
+    """Response body stream that counts bytes as they are read."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, host: str):
+        self._stream = stream
+        self._host = host
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            UPSTREAM_BYTES.labels(self._host).inc(len(chunk))
+            yield chunk
+
+    async def aclose(self) -> None:
+        await self._stream.aclose()
+
+
+async def meter_response(response: httpx.Response) -> None:
+    """httpx response hook that counts the body's bytes once it is read."""
+    response.stream = _MeteredStream(response.stream, response.request.url.host)
+
+
+class CacheStatsCollector:
+    """Exports the hit and miss counters the caches already keep, read at scrape time."""
+
+    def collect(self):
+        llm = get_cache_stats()
+        caches = {
+            "llm": (llm["memory_hits"] + llm["db_hits"], llm["misses"], llm["hit_ratio"]),
+        }
+        for name, stats in (("weather", get_weather_cache_stats()), ("latest_record", get_latest_cache_stats())):
+            caches[name] = (stats["hits"], stats["misses"], stats["hit_ratio"])
+
+        hits = CounterMetricFamily("cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Cache misses", labels=["cache"])
+        ratio = GaugeMetricFamily("cache_hit_ratio", "Cache hits over lookups since start", labels=["cache"])
+        for name, (hit_count, miss_count, hit_ratio) in caches.items():
+            hits.add_metric([name], hit_count)
+            misses.add_metric([name], miss_count)
+            ratio.add_metric([name], hit_ratio)
+        yield hits
+        yield misses
+        yield ratio
+
+
+REGISTRY.register(CacheStatsCollector())
@@ -3,57 +3,127 @@ Minimal OSINT data fetching service using Reddit Search API.
 Only fetches recent post titles + selftext as required by the assignment.
 """
 
+import asyncio
 import httpx
 import logging
-from typing import List, Dict, Any
-from app.config import REDDIT_SEARCH_QUERY, REDDIT_SEARCH_LIMIT, REDDIT_SEARCH_SORT
+import time
+from typing import AsyncIterator, Callable, Dict, Any, Optional
+from app.config import (
+    REDDIT_SEARCH_LIMIT,
+    REDDIT_SEARCH_SORT,
+    REDDIT_PAGE_SIZE,
+    REDDIT_MAX_POST_AGE_HOURS,
+    REDDIT_COLLECT_TIMEOUT_SECONDS,
+    REDDIT_SEARCH_URL,
+)
+from app.services.http_client import get_http_client
 
 logger = logging.getLogger(__name__)
 
-REDDIT_SEARCH_URL = "https://www.reddit.com/r/all/search.json"
-BRAND_NAME = "Gymshark"  # Hardcoded brand name
 
-
-async def fetch_osint_data() -> Dict[str, Any]:
+async def iter_reddit_posts(
+    query: str,
+    client: Optional[httpx.AsyncClient] = None,
+    max_posts: int = REDDIT_SEARCH_LIMIT,
+    page_size: int = REDDIT_PAGE_SIZE,
+    sort: str = REDDIT_SEARCH_SORT,
+    max_age_hours: float = REDDIT_MAX_POST_AGE_HOURS,
+    timeout: float = REDDIT_COLLECT_TIMEOUT_SECONDS,
+    since: Optional[float] = None,
+    on_truncated: Optional[Callable[[], None]] = None,
+) -> AsyncIterator[Dict[str, Any]]:
     """
-    Fetch minimal OSINT data from Reddit search API.
+    Stream Reddit search results page by page, following the `after` cursor.
+
+    Posts are yielded as soon as their page arrives, so consumers can start
+    work before the last page is loaded and never need the whole result set
+    in memory.
+
+    Args:
+        query: Search query
+        client: HTTP client to use (defaults to the shared pooled client)
+        max_posts: Stop after this many posts
+        page_size: Posts requested per page (Reddit caps this at 100)
+        sort: Reddit sort order
+        max_age_hours: Stop at the first post older than this (0 = no cutoff;
+            only meaningful with sort="new")
+        timeout: Stop requesting new pages after this many seconds
+        since: Stop at the first post created before this Unix timestamp
+            (the ingestion watermark; only meaningful with sort="new")
+        on_truncated: Called when the stream ends before running out of results
+            or reaching the cutoff (post cap, time limit or a failed page), so
+            older posts may be left unread
 
-    Returns:
-        A dict containing brand_name and posts list with text snippets for LLM processing.
+    Yields:
+        Post dicts with id, created_utc, title and text
+
+    Raises:
+        httpx.HTTPError: If the first page fails; later page failures end the
+            stream with the posts collected so far
     """
-    logger.info(f"Fetching Reddit OSINT data for query: {REDDIT_SEARCH_QUERY}")
-
-    params = {
-        "q": REDDIT_SEARCH_QUERY,
-        "limit": REDDIT_SEARCH_LIMIT,
-        "sort": REDDIT_SEARCH_SORT,
-        "restrict_sr": False,
-    }
-
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        response = await client.get(REDDIT_SEARCH_URL, params=params)
-        response.raise_for_status()
-        data = response.json()
-
-    posts_raw = data.get("data", {}).get("children", [])
-
-    # Minimal mapping of required info
-    posts = []
-    for item in posts_raw:
-        if item.get("kind") != "t3":  # skip non-posts
-            continue
-
-        info = item.get("data", {})
-
-        # Minimal required fields for the assignment
-        posts.append({
-            "title": info.get("title"),
-            "text": info.get("selftext") or "",
-        })
-
-    logger.info(f"Fetched {len(posts)} Reddit posts for {BRAND_NAME}")
-
-    return {
-        "brand_name": BRAND_NAME,
-        "posts": posts
-    }
+    client = client or get_http_client()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    oldest_allowed = time.time() - max_age_hours * 3600 if max_age_hours > 0 else None
+    if since is not None and sort == "new":
+        oldest_allowed = max(oldest_allowed or since, since)
+
+    def truncated() -> None:
+        if on_truncated is not None:
+            on_truncated()
+
+    after = None
+    pages = 0
+    yielded = 0
+    while yielded < max_posts:
+        if pages and loop.time() >= deadline:
+            logger.warning(f"Reddit collection for '{query}' hit its {timeout}s time limit after {pages} pages")
+            truncated()
+            return
+
+        params = {
+            "q": query,
+            "limit": min(page_size, max_posts - yielded),
+            "sort": sort,
+            "restrict_sr": False,
+        }
+        if after:
+            params["after"] = after
+
+        try:
+            response = await client.get(REDDIT_SEARCH_URL, params=params)
+            response.raise_for_status()
+            data = response.json()
+        except httpx.HTTPError as e:
+            if not pages:
+                raise
+            logger.warning(f"Reddit page {pages + 1} for '{query}' failed, keeping {yielded} posts: {str(e)}")
+            truncated()
+            return
+        pages += 1
+
+        listing = data.get("data", {})
+        for item in listing.get("children", []):
+            if item.get("kind") != "t3":  # skip non-posts
+                continue
+
+            info = item.get("data", {})
+            if oldest_allowed is not None and info.get("created_utc", oldest_allowed) < oldest_allowed:
+                logger.info(f"Reddit collection for '{query}' reached its age cutoff / watermark")
+                return
+
+            # Minimal required fields, plus what's needed to deduplicate across runs
+            yield {
+                "id": info.get("name") or info.get("id"),
+                "created_utc": info.get("created_utc"),
+                "title": info.get("title"),
+                "text": info.get("selftext") or "",
+            }
+            yielded += 1
+            if yielded >= max_posts:
+                truncated()
+                return
+
+        after = listing.get("after")
+        if not after:
+            return
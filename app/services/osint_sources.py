@@ -0,0 +1,303 @@
+"""
+Pluggable OSINT sources: Reddit search, RSS/Atom news feeds and Google Trends.
+
+Every source streams post dicts (id, created_utc, title, text) for a target's
+brand. collect_from_sources() runs the enabled sources concurrently, each
+under its own timeout and all of them under one overall deadline. A slow
+source never holds up the others: whatever it produced in time is kept, and
+its entry in the report is marked "timeout".
+"""
+import asyncio
+import calendar
+import html
+import logging
+import re
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+from urllib.parse import quote_plus
+import feedparser
+import httpx
+from pytrends.request import TrendReq
+from app.config import (
+    OSINT_SOURCES,
+    OSINT_DEADLINE_SECONDS,
+    OSINT_REDDIT_TIMEOUT_SECONDS,
+    OSINT_RSS_TIMEOUT_SECONDS,
+    OSINT_TRENDS_TIMEOUT_SECONDS,
+    RSS_FEED_URLS,
+    RSS_MAX_ITEMS,
+    TRENDS_TIMEFRAME,
+    TRENDS_GEO,
+)
+from app.schemas.target import Target
+from app.services.osint import iter_reddit_posts
+from app.services.osint_state import IncrementalState
+
+logger = logging.getLogger(__name__)
+
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+class OsintSource(ABC):
+    """Base class for OSINT sources."""
+
+    name = ""
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+
+    @abstractmethod
+    def stream(
+        self,
+        target: Target,
+        client: httpx.AsyncClient,
+        since: Optional[float] = None,
+        on_truncated: Optional[Callable[[], None]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream posts about a target's brand.
+
+        Args:
+            target: Target whose brand to search for
+            client: Shared HTTP client
+            since: Ingestion watermark; posts created before it may be skipped
+            on_truncated: Called if the source stops before reaching the watermark
+                (e.g. at its post cap), so the watermark must not advance past
+                the posts it never read
+
+        Returns:
+            Async iterator of post dicts with id, created_utc, title and text
+        """
+
+
+class RedditSource(OsintSource):
+    """Reddit search results, newest first."""
+
+    name = "reddit"
+
+    def __init__(self, timeout: float = OSINT_REDDIT_TIMEOUT_SECONDS):
+        super().__init__(timeout)
+
+    def stream(self, target, client, since=None, on_truncated=None):
+        return iter_reddit_posts(target.search_query, client=client, since=since, on_truncated=on_truncated)
+
+
+def _strip_html(text: str) -> str:
+    return " ".join(html.unescape(_TAG_RE.sub(" ", text)).split())
+
+
+def _entry_timestamp(entry: Any) -> Optional[float]:
+    published = entry.get("published_parsed") or entry.get("updated_parsed")
+    return float(calendar.timegm(published)) if published else None
+
+
+class RssSource(OsintSource):
+    """News items from RSS/Atom feeds (Google News search by default)."""
+
+    name = "rss"
+
+    def __init__(
+        self,
+        timeout: float = OSINT_RSS_TIMEOUT_SECONDS,
+        feed_urls: Optional[List[str]] = None,
+        max_items: int = RSS_MAX_ITEMS,
+    ):
+        super().__init__(timeout)
+        self.feed_urls = feed_urls if feed_urls is not None else [
+            url.strip() for url in RSS_FEED_URLS.split(",") if url.strip()
+        ]
+        self.max_items = max_items
+
+    async def stream(self, target, client, since=None, on_truncated=None):
+        query = target.search_query
+        for url in self.feed_urls:
+            searched = "{query}" in url
+            try:
+                response = await client.get(url.replace("{query}", quote_plus(query)))
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                # One broken feed shouldn't hide the others
+                logger.warning(f"RSS feed {url} failed: {str(e)}")
+                continue
+
+            # feedparser is CPU-bound; keep it off the event loop
+            feed = await asyncio.to_thread(feedparser.parse, response.content)
+            for entry in feed.entries[:self.max_items]:
+                title = _strip_html(entry.get("title", ""))
+                text = _strip_html(entry.get("summary", ""))
+                if not searched and query.lower() not in f"{title} {text}".lower():
+                    continue
+                created_utc = _entry_timestamp(entry)
+                if since is not None and created_utc is not None and created_utc < since:
+                    continue
+                yield {
+                    "id": entry.get("id") or entry.get("link") or title,
+                    "created_utc": created_utc,
+                    "title": title,
+                    "text": text,
+                }
+
+
+class TrendsSource(OsintSource):
+    """Google Trends search interest, summarized as one post per data point."""
+
+    name = "trends"
+
+    def __init__(
+        self,
+        timeout: float = OSINT_TRENDS_TIMEOUT_SECONDS,
+        timeframe: str = TRENDS_TIMEFRAME,
+        geo: str = TRENDS_GEO,
+    ):
+        super().__init__(timeout)
+        self.timeframe = timeframe
+        self.geo = geo
+
+    def _fetch(self, query: str) -> Optional[Dict[str, Any]]:
+        # pytrends is synchronous (requests); its own timeout bounds the worker thread
+        pytrends = TrendReq(hl="en-US", tz=0, timeout=(5, self.timeout), retries=0)
+        pytrends.build_payload([query], timeframe=self.timeframe, geo=self.geo)
+        interest = pytrends.interest_over_time()
+        if interest.empty or query not in interest:
+            return None
+
+        values = interest[query]
+        rising: List[str] = []
+        try:
+            related = pytrends.related_queries().get(query) or {}
+            if related.get("rising") is not None:
+                rising = list(related["rising"]["query"][:5])
+        except Exception as e:
+            logger.info(f"Google Trends related queries unavailable for '{query}': {str(e)}")
+
+        text = (
+            f"Search interest over {self.timeframe}: latest {int(values.iloc[-1])}/100, "
+            f"average {values.mean():.0f}/100, peak {int(values.max())}/100."
+        )
+        if rising:
+            text += f" Rising related searches: {', '.join(rising)}."
+        latest = values.index[-1].timestamp()
+        return {
+            # A new data point is new information; the same one is not
+            "id": f"{self.timeframe}|{self.geo}|{int(latest)}",
+            "created_utc": latest,
+            "title": f"Google Trends interest in '{query}'",
+            "text": text,
+        }
+
+    async def stream(self, target, client, since=None, on_truncated=None):
+        post = await asyncio.to_thread(self._fetch, target.search_query)
+        if post is not None:
+            yield post
+
+
+SOURCE_TYPES = {
+    RedditSource.name: RedditSource,
+    RssSource.name: RssSource,
+    TrendsSource.name: TrendsSource,
+}
+
+
+def get_osint_sources(names: str = OSINT_SOURCES) -> List[OsintSource]:
+    """
+    Build the configured OSINT sources.
+
+    Args:
+        names: Comma-separated source names (see SOURCE_TYPES)
+
+    Returns:
+        List of source instances
+
+    Raises:
+        ValueError: If a source name is unknown
+    """
+    sources = []
+    for name in (name.strip() for name in names.split(",")):
+        if not name:
+            continue
+        if name not in SOURCE_TYPES:
+            raise ValueError(f"Unknown OSINT source: {name}")
+        sources.append(SOURCE_TYPES[name]())
+    return sources
+
+
+async def collect_from_sources(
+    target: Target,
+    sources: List[OsintSource],
+    client: httpx.AsyncClient,
+    on_post: Callable[[Dict[str, Any]], None],
+    states: Optional[Dict[str, IncrementalState]] = None,
+    deadline: float = OSINT_DEADLINE_SECONDS,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Run OSINT sources concurrently and hand every new post to on_post as it arrives.
+
+    Args:
+        target: Target whose brand to search for
+        sources: Sources to run
+        client: Shared HTTP client
+        on_post: Called with each post (tagged with its source) as it arrives
+        states: Incremental ingestion state per source name; sources with a
+            state only pass on posts that weren't ingested before
+        deadline: Seconds after which every source still running is cancelled
+
+    Returns:
+        Dict of source name to its status, post count and duration; "truncated"
+        is set for sources that stopped before reaching their watermark
+    """
+    states = states or {}
+    loop = asyncio.get_running_loop()
+    report: Dict[str, Dict[str, Any]] = {
+        source.name: {"status": "running", "posts": 0} for source in sources
+    }
+
+    async def consume(source: OsintSource) -> None:
+        state = states.get(source.name)
+        since = state.watermark if state is not None else None
+        def on_truncated() -> None:
+            report[source.name]["truncated"] = True
+
+        async for post in source.stream(target, client, since=since, on_truncated=on_truncated):
+            if state is None or state.is_new(post):
+                report[source.name]["posts"] += 1
+                on_post({**post, "source": source.name})
+
+    async def run(source: OsintSource) -> None:
+        entry = report[source.name]
+        start = loop.time()
+        try:
+            await asyncio.wait_for(consume(source), timeout=source.timeout)
+            entry["status"] = "success"
+        except asyncio.TimeoutError:
+            logger.warning(f"OSINT source {source.name} timed out for {target.brand} "
+                           f"after {source.timeout} seconds with {entry['posts']} posts")
+            entry["status"] = "timeout"
+            entry["error"] = f"Timed out after {source.timeout} seconds"
+        except Exception as e:
+            logger.error(f"OSINT source {source.name} failed for {target.brand}: {str(e)}", exc_info=True)
+            entry["status"] = "error"
+            entry["error"] = str(e)
+        finally:
+            entry["duration_seconds"] = round(loop.time() - start, 3)
+            if source.name in states:
+                entry["watermark"] = states[source.name].watermark
+
+    tasks = [asyncio.create_task(run(source)) for source in sources]
+    if not tasks:
+        return report
+
+    try:
+        await asyncio.wait(tasks, timeout=deadline)
+    finally:
+        # Also reached when the caller is cancelled, so no source outlives the collection
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    for name, entry in report.items():
+        if entry["status"] == "running":
+            logger.warning(f"OSINT source {name} missed the {deadline}s deadline for {target.brand}")
+            entry["status"] = "timeout"
+            entry["error"] = f"Missed the overall deadline of {deadline} seconds"
+    return report
@@ -0,0 +1,195 @@
+"""
+Incremental OSINT ingestion state: per (brand, source) watermarks and seen-post index.
+
+Each run only keeps posts that are newer than the last ingested post and
+whose IDs haven't been seen before. With sort="new" the collector stops
+paging as soon as it reaches the watermark, so runs with nothing new cost a
+single page request and skip Gemini entirely.
+"""
+import hashlib
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Set
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from app.config import OSINT_SEEN_RETENTION_DAYS
+from app.database import AsyncSessionLocal
+from app.models.osint_state import OsintWatermark, SeenPost
+
+logger = logging.getLogger(__name__)
+
+# Dialect inserts that support ON CONFLICT DO NOTHING
+_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+# Rows per multi-row insert, well under SQLite's bound-parameter limit
+SEEN_INSERT_BATCH_SIZE = 500
+
+# Length of SeenPost.post_id and OsintWatermark.last_post_id
+POST_ID_MAX_LENGTH = 100
+
+
+def stored_post_id(post_id: str) -> str:
+    """
+    Map a source's post ID to the form kept in the state tables.
+
+    IDs that fit are stored as is; longer ones (RSS guids and links often
+    are) are replaced by a fixed-length hash, which still deduplicates.
+
+    Args:
+        post_id: Post ID as reported by the source
+
+    Returns:
+        ID of at most POST_ID_MAX_LENGTH characters
+    """
+    if len(post_id) <= POST_ID_MAX_LENGTH:
+        return post_id
+    return "sha1:" + hashlib.sha1(post_id.encode("utf-8")).hexdigest()
+
+
+class IncrementalState:
+    """Watermark and seen-post IDs for one (brand, source) pair during a run."""
+
+    def __init__(
+        self,
+        brand: str,
+        source: str,
+        watermark: Optional[float] = None,
+        watermark_post_id: Optional[str] = None,
+        seen_ids: Optional[Set[str]] = None,
+    ):
+        self.brand = brand
+        self.source = source
+        self.watermark = watermark
+        self.watermark_post_id = watermark_post_id
+        self.seen_ids = seen_ids or set()
+        self._new_posts: Dict[str, Optional[float]] = {}
+
+    @property
+    def has_history(self) -> bool:
+        """Whether anything was ingested for this pair before."""
+        return self.watermark is not None
+
+    @property
+    def new_post_count(self) -> int:
+        return len(self._new_posts)
+
+    def is_new(self, post: Dict[str, Any]) -> bool:
+        """
+        Check a post against the seen index and remember it if it is new.
+
+        Args:
+            post: Post dict with id and created_utc
+
+        Returns:
+            True if the post hasn't been ingested before
+        """
+        post_id = post.get("id")
+        if not post_id:
+            return True
+        post_id = stored_post_id(str(post_id))
+        if post_id in self.seen_ids or post_id in self._new_posts:
+            return False
+        self._new_posts[post_id] = post.get("created_utc")
+        return True
+
+    async def commit(self, advance_watermark: bool = True) -> None:
+        """
+        Persist the new posts and advance the watermark.
+
+        Args:
+            advance_watermark: False when collection ended early (e.g. timed out),
+                so older posts that were never reached are picked up next run
+        """
+        if not self._new_posts:
+            return
+        await self._db_commit(advance_watermark)
+        logger.info(f"Ingested {len(self._new_posts)} new {self.source} posts for {self.brand}, "
+                    f"watermark {self.watermark}")
+
+    async def _db_commit(self, advance_watermark: bool) -> None:
+        now = datetime.utcnow()
+        newest_id, newest_created = max(
+            ((post_id, created) for post_id, created in self._new_posts.items() if created is not None),
+            key=lambda item: item[1],
+            default=(None, None)
+        )
+
+        async with AsyncSessionLocal() as db:
+            # Another run (e.g. a scheduled shard and a manual refresh) may have stored
+            # the same posts already; skip those rows instead of failing the whole commit
+            rows = [
+                {
+                    "brand_name": self.brand,
+                    "source": self.source,
+                    "post_id": post_id,
+                    "created_utc": created,
+                    "seen_at": now
+                }
+                for post_id, created in self._new_posts.items()
+            ]
+            dialect_name = db.get_bind().dialect.name
+            if dialect_name not in _INSERTS:
+                raise RuntimeError(
+                    f"Seen posts need INSERT ... ON CONFLICT; unsupported database: {dialect_name}"
+                )
+            for start in range(0, len(rows), SEEN_INSERT_BATCH_SIZE):
+                batch = rows[start:start + SEEN_INSERT_BATCH_SIZE]
+                await db.execute(_INSERTS[dialect_name](SeenPost).values(batch).on_conflict_do_nothing())
+
+            if advance_watermark and newest_created is not None and (
+                self.watermark is None or newest_created > self.watermark
+            ):
+                watermark = await db.scalar(select(OsintWatermark).filter_by(brand_name=self.brand, source=self.source))
+                if watermark is None:
+                    watermark = OsintWatermark(brand_name=self.brand, source=self.source)
+                    db.add(watermark)
+                watermark.last_created_utc = newest_created
+                watermark.last_post_id = newest_id
+                watermark.updated_at = now
+                self.watermark, self.watermark_post_id = newest_created, newest_id
+
+            # Posts older than the retention window can no longer reappear in "new" results
+            cutoff = time.time() - OSINT_SEEN_RETENTION_DAYS * 86400
+            await db.execute(delete(SeenPost).where(
+                SeenPost.brand_name == self.brand,
+                SeenPost.source == self.source,
+                SeenPost.created_utc < cutoff
+            ))
+
+            await db.commit()
+
+        self.seen_ids.update(self._new_posts)
+        self._new_posts.clear()
+
+
+async def load_incremental_state(brand: str, source: str) -> IncrementalState:
+    """
+    Load the watermark and recent seen-post IDs for a (brand, source) pair.
+
+    Args:
+        brand: Brand name
+        source: OSINT source name (e.g. "reddit")
+
+    Returns:
+        IncrementalState for the run
+    """
+    cutoff = time.time() - OSINT_SEEN_RETENTION_DAYS * 86400
+    async with AsyncSessionLocal() as db:
+        watermark = await db.scalar(select(OsintWatermark).filter_by(brand_name=brand, source=source))
+        seen_ids = set((await db.scalars(select(SeenPost.post_id).where(
+            SeenPost.brand_name == brand,
+            SeenPost.source == source,
+            SeenPost.created_utc >= cutoff
+        ))).all())
+
+    return IncrementalState(
+        brand,
+        source,
+        watermark=watermark.last_created_utc if watermark else None,
+        watermark_post_id=watermark.last_post_id if watermark else None,
+        seen_ids=seen_ids
+    )
@@ -0,0 +1,90 @@
+"""
+Per-stage progress tracking for aggregation runs.
+
+A run plans how many units each stage has (weather batches, brands to
+collect and analyze, the final save) and the stages report each unit as it
+starts and finishes. Refresh jobs expose the snapshot so clients can follow
+a run while it is in flight.
+"""
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+STAGES = ("weather", "osint", "gemini", "save")
+
+
+class StageProgress:
+    """Unit counts and timings of one stage."""
+
+    def __init__(self):
+        self.total = 0
+        self.completed = 0
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self._started: Optional[float] = None
+        self._duration: Optional[float] = None
+
+    @property
+    def status(self) -> str:
+        if self.finished_at is not None:
+            return "done"
+        if self.started_at is not None:
+            return "running"
+        return "pending"
+
+    def to_dict(self) -> Dict[str, Any]:
+        duration = self._duration
+        if duration is None and self._started is not None:
+            duration = time.monotonic() - self._started
+        return {
+            "status": self.status,
+            "total": self.total,
+            "completed": self.completed,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "duration_seconds": round(duration, 3) if duration is not None else None
+        }
+
+
+class RunProgress:
+    """Progress of every stage of one aggregation run."""
+
+    def __init__(self):
+        self.stages: Dict[str, StageProgress] = {name: StageProgress() for name in STAGES}
+
+    def plan(self, **totals: int) -> None:
+        """
+        Set the number of units per stage, e.g. plan(weather=2, osint=3).
+
+        Stages planned with zero units are finished straight away.
+        """
+        for name, total in totals.items():
+            stage = self.stages[name]
+            stage.total = total
+            if total == 0:
+                self.begin(name)
+                self._finish(stage)
+
+    def begin(self, name: str) -> None:
+        """Mark a unit of a stage as started; the stage's clock starts with its first unit."""
+        stage = self.stages[name]
+        if stage.started_at is None:
+            stage.started_at = datetime.utcnow()
+            stage._started = time.monotonic()
+
+    def advance(self, name: str) -> None:
+        """Mark a unit of a stage as finished; the stage is done when all units are."""
+        stage = self.stages[name]
+        self.begin(name)
+        stage.completed += 1
+        if stage.completed >= stage.total:
+            self._finish(stage)
+
+    def _finish(self, stage: StageProgress) -> None:
+        if stage.finished_at is None:
+            stage.finished_at = datetime.utcnow()
+            stage._duration = time.monotonic() - stage._started
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Snapshot of every stage."""
+        return {name: stage.to_dict() for name, stage in self.stages.items()}
@@ -0,0 +1,23 @@
+"""
+Token-budgeted prompt building for OSINT posts.
+"""
+from typing import Any, Dict
+
+# Rough average for English text; Gemini bills ~4 characters per token
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a text."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def format_post(index: int, post: Dict[str, Any]) -> str:
+    """Format one post the way Gemini prompts expect it."""
+    return f"Post {index}:\nTitle: {post.get('title', '')}\nText: {post.get('text', '')}"
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut a text down to roughly max_tokens."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    return text if len(text) <= max_chars else text[:max_chars]
@@ -0,0 +1,327 @@
+"""
+Adaptive per-host rate limiting, retries and circuit breaking for upstream APIs.
+
+The shared HTTP client sends every request through RateLimitedTransport.
+Each upstream host gets a token bucket, so requests are spread at a
+sustainable rate instead of bursting until the host answers 429. The rate
+adapts to what the host reports:
+
+- Reddit's x-ratelimit-remaining / x-ratelimit-reset headers set the rate to
+  the remaining budget spread over the rest of the window, and pause the
+  host when the budget is used up.
+- Retry-After (seconds or an HTTP date) pauses the host until then.
+- A 429 without those headers halves the rate; successes raise it back
+  towards the configured rate.
+
+429s, 502/503/504s and connection errors are retried with jittered
+exponential backoff (never sooner than Retry-After). A host that keeps
+failing trips its circuit breaker: requests fail fast with CircuitOpenError
+until a cooldown has passed, then one trial request decides whether it closes.
+"""
+import asyncio
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+import httpx
+from app.config import (
+    RATE_LIMIT_DEFAULT_RPS,
+    RATE_LIMIT_BURST,
+    RATE_LIMIT_HOSTS,
+    HTTP_MAX_RETRIES,
+    HTTP_BACKOFF_BASE_SECONDS,
+    HTTP_BACKOFF_MAX_SECONDS,
+    CIRCUIT_BREAKER_FAILURES,
+    CIRCUIT_BREAKER_RESET_SECONDS,
+)
+from app.services.metrics import CIRCUIT_BREAKER_OPENS, UPSTREAM_RETRIES, UPSTREAM_THROTTLE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+MIN_RATE = 0.05  # requests per second; a host is never throttled to a full stop by rate alone
+
+
+class CircuitOpenError(httpx.TransportError):
+    """Raised instead of sending a request to a host whose circuit breaker is open."""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header.
+
+    Args:
+        value: Header value, in delay-seconds or HTTP-date form
+
+    Returns:
+        Seconds to wait, or None if absent or invalid
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_host_rates(value: str) -> Dict[str, float]:
+    """Parse "host=rps,host=rps" into a dict."""
+    rates = {}
+    for item in value.split(","):
+        host, _, rate = item.strip().partition("=")
+        if host and rate:
+            rates[host] = float(rate)
+    return rates
+
+
+class HostLimiter:
+    """Token bucket, learned rate and circuit breaker of one upstream host."""
+
+    def __init__(
+        self,
+        host: str,
+        rate: float = RATE_LIMIT_DEFAULT_RPS,
+        burst: int = RATE_LIMIT_BURST,
+        failure_threshold: int = CIRCUIT_BREAKER_FAILURES,
+        reset_seconds: float = CIRCUIT_BREAKER_RESET_SECONDS,
+    ):
+        self.host = host
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+        # Circuit breaker
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def circuit(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.reset_seconds:
+            return "open"
+        return "half-open"
+
+    async def acquire(self) -> float:
+        """
+        Wait for a token (and for any pause the host asked for).
+
+        Tokens are reserved under the lock and waited for outside it, so
+        concurrent callers queue up at the bucket's rate instead of
+        all waking at once.
+
+        Returns:
+            Seconds waited
+        """
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._tokens + (now - self._updated) * self.rate, self.burst)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            wait = max(wait, self._paused_until - now)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def check_circuit(self) -> bool:
+        """
+        Let a request through unless the circuit is open.
+
+        Returns:
+            True if the request is the half-open trial; the caller must call
+            end_trial once it is done with it, however it ends
+
+        Raises:
+            CircuitOpenError: If the host is failing and its cooldown hasn't passed,
+                or a half-open trial request is already in flight
+        """
+        state = self.circuit
+        if state == "open" or (state == "half-open" and self._trial_in_flight):
+            raise CircuitOpenError(f"Circuit breaker open for {self.host} after {self.failures} failures")
+        if state == "half-open":
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def end_trial(self) -> None:
+        """Release the half-open trial slot, so a cancelled trial doesn't block the host."""
+        self._trial_in_flight = False
+
+    def pause(self, seconds: float) -> None:
+        """Hold every request to the host for the given time."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def observe(self, response: httpx.Response) -> Optional[float]:
+        """
+        Learn from a response's status and rate-limit headers.
+
+        Returns:
+            Seconds the host asked to wait (Retry-After or an exhausted budget), if any
+        """
+        headers = response.headers
+        wait = parse_retry_after(headers.get("retry-after"))
+
+        remaining, reset = headers.get("x-ratelimit-remaining"), headers.get("x-ratelimit-reset")
+        if remaining is not None and reset is not None:
+            try:
+                remaining_requests, reset_seconds = float(remaining), float(reset)
+            except ValueError:
+                remaining_requests = reset_seconds = None
+            if reset_seconds is not None and reset_seconds > 0:
+                if remaining_requests < 1:
+                    wait = max(wait or 0.0, reset_seconds)
+                else:
+                    # Spread what is left of the budget over the rest of the window
+                    self.rate = max(remaining_requests / reset_seconds, MIN_RATE)
+        elif response.status_code == 429:
+            self.rate = max(self.rate / 2, MIN_RATE)
+        elif response.status_code < 400 and self.rate < self.max_rate:
+            self.rate = min(self.rate + self.max_rate * 0.05, self.max_rate)
+
+        if wait:
+            self.pause(wait)
+        return wait
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._trial_in_flight = False
+        if self._opened_at is not None:
+            logger.info(f"Circuit breaker for {self.host} closed")
+            self._opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        half_open = self._trial_in_flight
+        self._trial_in_flight = False
+        if half_open or (self._opened_at is None and self.failures >= self.failure_threshold):
+            logger.warning(f"Circuit breaker for {self.host} opened after {self.failures} failures")
+            CIRCUIT_BREAKER_OPENS.labels(self.host).inc()
+            self._opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate_per_second": round(self.rate, 3),
+            "max_rate_per_second": self.max_rate,
+            "paused_seconds": round(max(self._paused_until - time.monotonic(), 0.0), 3),
+            "circuit": self.circuit,
+            "consecutive_failures": self.failures
+        }
+
+
+class RateLimiterRegistry:
+    """One HostLimiter per upstream host, created on first use."""
+
+    def __init__(self, host_rates: Optional[Dict[str, float]] = None, default_rate: float = RATE_LIMIT_DEFAULT_RPS):
+        self.host_rates = host_rates if host_rates is not None else parse_host_rates(RATE_LIMIT_HOSTS)
+        self.default_rate = default_rate
+        self._limiters: Dict[str, HostLimiter] = {}
+
+    def get(self, host: str) -> HostLimiter:
+        limiter = self._limiters.get(host)
+        if limiter is None:
+            limiter = self._limiters[host] = HostLimiter(host, rate=self.host_rates.get(host, self.default_rate))
+        return limiter
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {host: limiter.stats() for host, limiter in self._limiters.items()}
+
+
+rate_limiters = RateLimiterRegistry()
+
+
+def backoff_delay(attempt: int, base: float = HTTP_BACKOFF_BASE_SECONDS, cap: float = HTTP_BACKOFF_MAX_SECONDS) -> float:
+    """Full-jitter exponential backoff: a random delay up to base * 2^attempt, capped."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """Transport wrapper that rate limits, retries and circuit-breaks requests per host."""
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        limiters: Optional[RateLimiterRegistry] = None,
+        max_retries: int = HTTP_MAX_RETRIES,
+        max_wait_seconds: float = HTTP_BACKOFF_MAX_SECONDS,
+    ):
+        self._transport = transport
+        self.limiters = limiters or rate_limiters
+        self.max_retries = max_retries
+        self.max_wait_seconds = max_wait_seconds
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        limiter = self.limiters.get(request.url.host)
+        # The circuit is checked once per request, so its own retries aren't refused
+        trial = limiter.check_circuit()
+        try:
+            return await self._send(request, limiter, trial)
+        finally:
+            if trial:
+                limiter.end_trial()
+
+    async def _send(self, request: httpx.Request, limiter: HostLimiter, trial: bool) -> httpx.Response:
+        host = request.url.host
+        idempotent = request.method in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            waited = await limiter.acquire()
+            if waited:
+                UPSTREAM_THROTTLE_SECONDS.labels(host).inc(waited)
+
+            try:
+                response = await self._transport.handle_async_request(request)
+            except httpx.TransportError as e:
+                limiter.record_failure()
+                # A connection that never opened never sent the request, so any method can retry
+                retryable = idempotent or isinstance(e, httpx.ConnectError)
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                delay, reason = backoff_delay(attempt), type(e).__name__
+            else:
+                asked = limiter.observe(response)
+                # A throttled trial shows the host isn't ready yet, so it re-opens the circuit
+                if response.status_code >= 500 or (trial and response.status_code == 429):
+                    limiter.record_failure()
+                elif response.status_code != 429:
+                    limiter.record_success()
+                    return response
+
+                # The host didn't process a 429, so any method can retry; 5xx only if idempotent
+                retryable = response.status_code in RETRY_STATUSES and (idempotent or response.status_code == 429)
+                delay = max(backoff_delay(attempt), asked or 0.0)
+                if not retryable or attempt >= self.max_retries or delay > self.max_wait_seconds:
+                    return response
+                await response.aclose()
+                reason = str(response.status_code)
+
+            UPSTREAM_RETRIES.labels(host, reason).inc()
+            logger.warning(f"Retrying {request.method} {host}{request.url.path} in {delay:.2f}s "
+                           f"(attempt {attempt + 1}/{self.max_retries}, {reason})")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def get_rate_limit_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Get the learned rate, pause and circuit state of every upstream host.
+
+    Returns:
+        Dict of host to limiter stats
+    """
+    return rate_limiters.stats()
@@ -0,0 +1,338 @@
+"""
+Multi-worker-safe scheduling of aggregation runs.
+
+Every uvicorn worker and replica runs a SchedulerNode. Nodes compete for a
+lease row in the database; only the holder (the leader) plans runs, and it
+renews the lease on every heartbeat, so another node takes over within one
+lease period if it dies. Plain UPDATE / INSERT statements on the lease row
+work the same on Postgres and SQLite, unlike advisory locks.
+
+A run is planned as shards of targets (targets of the same brand stay
+together so their OSINT and Gemini work is still shared) due at staggered,
+jittered times across the interval, instead of every target firing at once.
+Any node can claim a due shard; a claim is a conditional UPDATE, so each
+shard runs on exactly one node, and claims abandoned by a crashed node are
+picked up again after a timeout, up to a maximum number of attempts; a shard
+that keeps crashing or timing out its worker is then marked failed.
+"""
+import json
+import logging
+import os
+import random
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from app.config import (
+    SCHEDULER_INTERVAL_HOURS,
+    SCHEDULER_SHARD_SIZE,
+    SCHEDULER_JITTER_SECONDS,
+    SCHEDULER_LEASE_SECONDS,
+    SCHEDULER_SHARD_TIMEOUT_SECONDS,
+    SCHEDULER_SHARD_MAX_ATTEMPTS,
+)
+from app.database import AsyncSessionLocal
+from app.models.scheduler import SchedulerLease, ScheduledShard
+from app.schemas.target import Target
+from app.services.jobs import refresh_jobs
+from app.services.targets import get_targets
+
+logger = logging.getLogger(__name__)
+
+
+def make_node_id() -> str:
+    """Identify this process: host, pid and a random suffix in case pids are reused."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def plan_shards(targets: List[Target], shard_size: int = SCHEDULER_SHARD_SIZE) -> List[List[Target]]:
+    """
+    Split targets into shards of about shard_size, keeping each brand's targets together.
+
+    Args:
+        targets: Targets to split
+        shard_size: Target count a shard is filled up to (a brand with more targets gets its own shard)
+
+    Returns:
+        List of shards, each a list of targets
+    """
+    by_brand: Dict[Tuple[str, str], List[Target]] = {}
+    for target in targets:
+        by_brand.setdefault(target.brand_key, []).append(target)
+
+    shards: List[List[Target]] = []
+    current: List[Target] = []
+    for group in by_brand.values():
+        if current and len(current) + len(group) > shard_size:
+            shards.append(current)
+            current = []
+        current.extend(group)
+    if current:
+        shards.append(current)
+    return shards
+
+
+def shard_offsets(shard_count: int, interval: float, jitter: float) -> List[float]:
+    """
+    Spread shard start times evenly across the interval, each with random jitter.
+
+    Args:
+        shard_count: Number of shards
+        interval: Seconds between runs
+        jitter: Maximum random delay added to each slot (capped at the slot length)
+
+    Returns:
+        Seconds after the run start at which each shard is due
+    """
+    if shard_count == 0:
+        return []
+    slot = interval / shard_count
+    return [index * slot + random.uniform(0, min(jitter, slot)) for index in range(shard_count)]
+
+
+class SchedulerNode:
+    """One process's part in the shared schedule: leader election, run planning and shard work."""
+
+    def __init__(
+        self,
+        schedule: str = "aggregation",
+        node_id: Optional[str] = None,
+        interval_seconds: float = SCHEDULER_INTERVAL_HOURS * 3600,
+        shard_size: int = SCHEDULER_SHARD_SIZE,
+        jitter_seconds: float = SCHEDULER_JITTER_SECONDS,
+        lease_seconds: float = SCHEDULER_LEASE_SECONDS,
+        shard_timeout_seconds: float = SCHEDULER_SHARD_TIMEOUT_SECONDS,
+        shard_max_attempts: int = SCHEDULER_SHARD_MAX_ATTEMPTS,
+    ):
+        self.schedule = schedule
+        self.node_id = node_id or make_node_id()
+        self.interval_seconds = interval_seconds
+        self.shard_size = shard_size
+        self.jitter_seconds = jitter_seconds
+        self.lease_seconds = lease_seconds
+        self.shard_timeout_seconds = shard_timeout_seconds
+        self.shard_max_attempts = shard_max_attempts
+        self.is_leader = False
+
+    async def acquire_lease(self, now: Optional[datetime] = None) -> bool:
+        """
+        Take or renew the leadership lease.
+
+        Returns:
+            True if this node holds the lease
+        """
+        now = now or datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.lease_seconds)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(SchedulerLease)
+                .where(
+                    SchedulerLease.name == self.schedule,
+                    or_(SchedulerLease.holder == self.node_id, SchedulerLease.expires_at < now)
+                )
+                .values(holder=self.node_id, expires_at=expires_at)
+            )
+            held = result.rowcount == 1
+            if not held:
+                # No lease row yet: the first insert wins, the others hit the primary key
+                exists = await db.scalar(select(SchedulerLease.name).where(SchedulerLease.name == self.schedule))
+                if exists is None:
+                    try:
+                        await db.execute(insert(SchedulerLease).values(
+                            name=self.schedule, holder=self.node_id, acquired_at=now, expires_at=expires_at
+                        ))
+                        held = True
+                    except IntegrityError:
+                        await db.rollback()
+                        return self._set_leader(False)
+            await db.commit()
+        return self._set_leader(held)
+
+    def _set_leader(self, held: bool) -> bool:
+        if held != self.is_leader:
+            logger.info(f"Scheduler node {self.node_id} {'became' if held else 'is no longer'} "
+                        f"leader of {self.schedule}")
+        self.is_leader = held
+        return held
+
+    async def release_lease(self) -> None:
+        """Give up the lease on shutdown so another node takes over without waiting for it to expire."""
+        if not self.is_leader:
+            return
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                delete(SchedulerLease).where(
+                    SchedulerLease.name == self.schedule, SchedulerLease.holder == self.node_id
+                )
+            )
+            await db.commit()
+        self._set_leader(False)
+
+    async def plan_run(self, now: Optional[datetime] = None, targets: Optional[List[Target]] = None) -> int:
+        """
+        As leader, plan the next run's shards once the previous run's interval has passed.
+
+        Args:
+            now: Current time (UTC, defaults to now)
+            targets: Targets to schedule (defaults to the target registry)
+
+        Returns:
+            Number of shards planned (0 if no run was due)
+        """
+        if not self.is_leader:
+            return 0
+        now = now or datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            last_run = await db.scalar(
+                select(func.max(ScheduledShard.run_started_at)).where(ScheduledShard.schedule == self.schedule)
+            )
+            if last_run is not None and last_run + timedelta(seconds=self.interval_seconds) > now:
+                return 0
+
+            shards = plan_shards(targets if targets is not None else get_targets(), self.shard_size)
+            offsets = shard_offsets(len(shards), self.interval_seconds, self.jitter_seconds)
+            if shards:
+                await db.execute(insert(ScheduledShard), [
+                    {
+                        "schedule": self.schedule,
+                        "run_started_at": now,
+                        "shard_index": index,
+                        "target_keys": json.dumps([target.key for target in shard]),
+                        "due_at": now + timedelta(seconds=offset),
+                        "status": "pending",
+                        "attempts": 0
+                    }
+                    for index, (shard, offset) in enumerate(zip(shards, offsets))
+                ])
+            if last_run is not None:
+                # Keep the previous run for inspection; forget finished shards before it
+                await db.execute(delete(ScheduledShard).where(
+                    ScheduledShard.schedule == self.schedule,
+                    ScheduledShard.run_started_at < last_run,
+                    ScheduledShard.status.in_(("done", "failed"))
+                ))
+            await db.commit()
+
+        logger.info(f"Planned {len(shards)} shards for the {self.schedule} run starting {now.isoformat()}")
+        return len(shards)
+
+    async def heartbeat(self, now: Optional[datetime] = None) -> bool:
+        """
+        Renew (or try to take) the lease, and plan a run if leading and one is due.
+
+        Returns:
+            True if this node is the leader
+        """
+        if await self.acquire_lease(now):
+            await self.plan_run(now)
+        return self.is_leader
+
+    async def claim_shard(self, now: Optional[datetime] = None) -> Optional[ScheduledShard]:
+        """
+        Claim the earliest due shard that is unclaimed or was abandoned.
+
+        Abandoned shards that already used up their attempts are marked failed
+        instead of being claimed again.
+
+        Returns:
+            The claimed shard, or None if no shard is due
+        """
+        now = now or datetime.utcnow()
+        abandoned = and_(
+            ScheduledShard.status == "claimed",
+            ScheduledShard.claimed_at < now - timedelta(seconds=self.shard_timeout_seconds)
+        )
+        claimable = and_(
+            ScheduledShard.schedule == self.schedule,
+            ScheduledShard.attempts < self.shard_max_attempts,
+            or_(
+                and_(ScheduledShard.status == "pending", ScheduledShard.due_at <= now),
+                abandoned
+            )
+        )
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(ScheduledShard)
+                .where(
+                    ScheduledShard.schedule == self.schedule,
+                    ScheduledShard.attempts >= self.shard_max_attempts,
+                    abandoned
+                )
+                .values(
+                    status="failed",
+                    finished_at=now,
+                    error=f"Abandoned after {self.shard_max_attempts} attempts"
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            if result.rowcount:
+                logger.error(f"Gave up on {result.rowcount} shards of {self.schedule} "
+                             f"after {self.shard_max_attempts} attempts")
+
+            candidates = (await db.scalars(
+                select(ScheduledShard.id).where(claimable).order_by(ScheduledShard.due_at).limit(5)
+            )).all()
+            for shard_id in candidates:
+                # Conditional update: if another node claimed it first, no row matches
+                result = await db.execute(
+                    update(ScheduledShard)
+                    .where(ScheduledShard.id == shard_id, claimable)
+                    .values(
+                        status="claimed",
+                        claimed_by=self.node_id,
+                        claimed_at=now,
+                        attempts=ScheduledShard.attempts + 1
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+                if result.rowcount == 1:
+                    return await db.get(ScheduledShard, shard_id)
+        return None
+
+    async def finish_shard(self, shard: ScheduledShard, status: str, error: Optional[str] = None) -> None:
+        """Record a claimed shard's outcome ("done" or "failed")."""
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(ScheduledShard)
+                .where(ScheduledShard.id == shard.id, ScheduledShard.claimed_by == self.node_id)
+                .values(status=status, finished_at=datetime.utcnow(), error=error)
+            )
+            await db.commit()
+
+    async def run_shard(self, shard: ScheduledShard) -> str:
+        """
+        Aggregate a claimed shard's targets as a refresh job and record the outcome.
+
+        Returns:
+            Final shard status
+        """
+        keys = set(json.loads(shard.target_keys))
+        targets = [target for target in get_targets() if target.key in keys]
+        if not targets:
+            await self.finish_shard(shard, "failed", "None of the shard's targets are registered anymore")
+            return "failed"
+
+        logger.info(f"Node {self.node_id} running shard {shard.shard_index} of {self.schedule} "
+                    f"({len(targets)} targets)")
+        job, _ = await refresh_jobs.submit(targets=targets)
+        await refresh_jobs.wait(job)
+        status = "done" if job.status == "succeeded" else "failed"
+        await self.finish_shard(shard, status, job.error)
+        return status
+
+    async def run_due_shards(self, now: Optional[datetime] = None) -> int:
+        """
+        Claim and run due shards one after another until none is left.
+
+        Returns:
+            Number of shards run
+        """
+        count = 0
+        while (shard := await self.claim_shard(now)) is not None:
+            await self.run_shard(shard)
+            count += 1
+        return count
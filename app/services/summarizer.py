@@ -0,0 +1,216 @@
+"""
+Hierarchical map-reduce summarization for large post volumes.
+
+Posts that fit one chunk's token budget are sent to Gemini as-is. Larger
+volumes are split into chunks that are condensed in parallel (map), and the
+partial summaries are merged in groups until they fit the budget again
+(reduce). The final sentiment / trend analysis then runs on that condensed
+text, so prompt size, latency and cost stay bounded however many posts a
+brand has.
+
+Posts can be fed in as they are collected: each chunk is sent to the map
+step as soon as it fills up, while later pages are still loading.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import (
+    LLM_CHUNK_TOKENS,
+    LLM_MAX_CHUNKS,
+    LLM_MAP_CONCURRENCY,
+    LLM_REDUCE_FANIN,
+)
+from app.services.prompt_builder import estimate_tokens, format_post, truncate_to_tokens
+from app.services.gemini import summarize_chunk_async, reduce_summaries_async
+
+logger = logging.getLogger(__name__)
+
+
+def join_summaries(summaries: List[str]) -> str:
+    """Join partial summaries into one prompt input."""
+    return "\n\n".join(
+        f"Summary {i + 1}:\n{summary.strip()}" for i, summary in enumerate(summaries)
+    )
+
+
+async def _limited(coro, *semaphores: Optional[asyncio.Semaphore]):
+    """Await a coroutine while holding every given semaphore."""
+    for semaphore in semaphores:
+        if semaphore is not None:
+            await semaphore.acquire()
+    try:
+        return await coro
+    finally:
+        for semaphore in semaphores:
+            if semaphore is not None:
+                semaphore.release()
+
+
+async def reduce_summaries(
+    summaries: List[str],
+    max_tokens: int = LLM_CHUNK_TOKENS,
+    fan_in: int = LLM_REDUCE_FANIN,
+    concurrency: int = LLM_MAP_CONCURRENCY,
+    semaphore: Optional[asyncio.Semaphore] = None,
+) -> Tuple[str, int]:
+    """
+    Merge partial summaries in groups until they fit the token budget.
+
+    Args:
+        summaries: Partial summaries from the map step
+        max_tokens: Token budget for the final text
+        fan_in: Number of summaries merged per reduce call
+        concurrency: Maximum parallel Gemini calls
+        semaphore: Optional run-wide cap on concurrent Gemini calls
+
+    Returns:
+        Tuple of (condensed text, number of reduce rounds)
+    """
+    rounds = 0
+    fan_in = max(fan_in, 2)
+    local = asyncio.Semaphore(concurrency)
+    text = join_summaries(summaries)
+    while len(summaries) > 1 and estimate_tokens(text) > max_tokens:
+        groups = [summaries[i:i + fan_in] for i in range(0, len(summaries), fan_in)]
+        summaries = await asyncio.gather(*[
+            _limited(reduce_summaries_async(join_summaries(group)), local, semaphore)
+            for group in groups
+        ])
+        rounds += 1
+        text = join_summaries(summaries)
+    return text, rounds
+
+
+class StreamingPromptBuilder:
+    """
+    Incrementally packs posts into token-budgeted chunks and maps them.
+
+    Feed posts with add() as they arrive, then await finish() for the text
+    to analyze. Nothing is sent to Gemini while all posts still fit one
+    prompt; once they don't, every full chunk is summarized immediately.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = LLM_CHUNK_TOKENS,
+        max_chunks: int = LLM_MAX_CHUNKS,
+        fan_in: int = LLM_REDUCE_FANIN,
+        concurrency: int = LLM_MAP_CONCURRENCY,
+        semaphore: Optional[asyncio.Semaphore] = None,
+    ):
+        self.max_tokens = max_tokens
+        self.max_chunks = max_chunks
+        self.fan_in = fan_in
+        self.concurrency = concurrency
+        self.semaphore = semaphore
+        self._local = asyncio.Semaphore(concurrency)
+        self._current: List[str] = []
+        self._current_tokens = 0
+        self._map_tasks: List[asyncio.Task] = []
+        self.posts = 0
+        self.estimated_tokens = 0
+        self.dropped_posts = 0
+
+    def add(self, post: Dict[str, Any]) -> None:
+        """
+        Add one post, sending the current chunk to the map step if it is full.
+
+        Args:
+            post: Post dict with title and text
+        """
+        self.posts += 1
+        text = truncate_to_tokens(format_post(self.posts, post), self.max_tokens)
+        tokens = estimate_tokens(text)
+        self.estimated_tokens += tokens
+
+        if self._current and self._current_tokens + tokens > self.max_tokens:
+            self._flush()
+        if len(self._map_tasks) >= self.max_chunks:
+            self.dropped_posts += 1
+            return
+        self._current.append(text)
+        self._current_tokens += tokens
+
+    def _flush(self) -> None:
+        if not self._current:
+            return
+        chunk = "\n\n".join(self._current)
+        self._current, self._current_tokens = [], 0
+        self._map_tasks.append(asyncio.create_task(
+            _limited(summarize_chunk_async(chunk), self._local, self.semaphore)
+        ))
+
+    def cancel(self) -> None:
+        """Cancel any in-flight map calls."""
+        for task in self._map_tasks:
+            task.cancel()
+
+    async def finish(self) -> Tuple[str, Dict[str, Any]]:
+        """
+        Build the final analysis input.
+
+        Returns:
+            Tuple of (analysis input text, stats about how it was built)
+
+        Raises:
+            Exception: If a map or reduce call fails
+        """
+        stats = {
+            "posts": self.posts,
+            "estimated_tokens": self.estimated_tokens,
+            "input_tokens": self.estimated_tokens,
+            "chunks": 1,
+            "reduce_rounds": 0
+        }
+
+        # Everything fit one prompt: send the posts as-is
+        if not self._map_tasks:
+            return "\n\n".join(self._current), stats
+
+        self._flush()
+        if self.dropped_posts:
+            logger.warning(f"Dropped {self.dropped_posts} posts over the LLM_MAX_CHUNKS limit")
+        logger.info(f"Summarizing {self.posts} posts (~{self.estimated_tokens} tokens) in {len(self._map_tasks)} chunks")
+
+        try:
+            summaries = await asyncio.gather(*self._map_tasks)
+        except Exception:
+            self.cancel()
+            raise
+        text, rounds = await reduce_summaries(
+            list(summaries), self.max_tokens, self.fan_in, self.concurrency, self.semaphore
+        )
+
+        stats["chunks"] = len(self._map_tasks)
+        stats["reduce_rounds"] = rounds
+        stats["dropped_posts"] = self.dropped_posts
+        stats["input_tokens"] = estimate_tokens(text)
+        return text, stats
+
+
+async def prepare_analysis_input(
+    posts: List[Dict[str, Any]],
+    max_tokens: int = LLM_CHUNK_TOKENS,
+    max_chunks: int = LLM_MAX_CHUNKS,
+    fan_in: int = LLM_REDUCE_FANIN,
+    concurrency: int = LLM_MAP_CONCURRENCY,
+    semaphore: Optional[asyncio.Semaphore] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Build the text sent to the final Gemini analysis, within a token budget.
+
+    Args:
+        posts: OSINT posts (title + text)
+        max_tokens: Token budget per prompt
+        max_chunks: Maximum chunks summarized per run; later posts are dropped
+        fan_in: Number of summaries merged per reduce call
+        concurrency: Maximum parallel Gemini calls for map and reduce steps
+        semaphore: Optional run-wide cap on concurrent Gemini calls
+
+    Returns:
+        Tuple of (analysis input text, stats about how it was built)
+    """
+    builder = StreamingPromptBuilder(max_tokens, max_chunks, fan_in, concurrency, semaphore)
+    for post in posts:
+        builder.add(post)
+    return await builder.finish()
@@ -0,0 +1,91 @@
+"""
+Target registry: the (city, brand) pairs tracked on every aggregation run.
+"""
+import json
+import logging
+from pathlib import Path
+from typing import List
+from app.config import (
+    TARGETS_FILE,
+    TARGET_CITY,
+    TARGET_LATITUDE,
+    TARGET_LONGITUDE,
+    TARGET_BRAND,
+    REDDIT_SEARCH_QUERY,
+)
+from app.schemas.target import Target
+
+logger = logging.getLogger(__name__)
+
+_targets: List[Target] = []
+
+
+def get_default_target() -> Target:
+    """Build the single target described by the TARGET_* settings."""
+    return Target(
+        city=TARGET_CITY,
+        latitude=float(TARGET_LATITUDE),
+        longitude=float(TARGET_LONGITUDE),
+        brand=TARGET_BRAND,
+        query=REDDIT_SEARCH_QUERY,
+    )
+
+
+def load_targets(path: str = TARGETS_FILE) -> List[Target]:
+    """
+    Load targets from a JSON file.
+
+    Args:
+        path: Path to a JSON list of target objects. Falls back to the
+            default target when empty.
+
+    Returns:
+        List of unique targets, in file order
+
+    Raises:
+        ValueError: If the file does not contain a non-empty list
+    """
+    if not path:
+        return [get_default_target()]
+
+    raw = json.loads(Path(path).read_text(encoding="utf-8"))
+    if not isinstance(raw, list) or not raw:
+        raise ValueError(f"Targets file {path} must contain a non-empty JSON list")
+
+    targets: List[Target] = []
+    seen = set()
+    for item in raw:
+        target = Target(**item)
+        if target.key in seen:
+            logger.warning(f"Skipping duplicate target: {target.key}")
+            continue
+        seen.add(target.key)
+        targets.append(target)
+
+    logger.info(f"Loaded {len(targets)} targets from {path}")
+    return targets
+
+
+def get_targets() -> List[Target]:
+    """
+    Get the registered targets, loading them on first use.
+
+    Returns:
+        List of registered targets
+    """
+    global _targets
+    if not _targets:
+        _targets = load_targets()
+    return list(_targets)
+
+
+def register_targets(targets: List[Target]) -> None:
+    """
+    Replace the registered targets.
+
+    Args:
+        targets: Targets to track on subsequent runs
+    """
+    global _targets
+    _targets = list(targets)
+    logger.info(f"Registered {len(_targets)} targets")
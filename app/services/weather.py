@@ -3,14 +3,18 @@ Weather data fetching service using Open-Meteo API.
 Open-Meteo is a free weather API that doesn't require an API key.
 """
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import httpx
 from datetime import datetime
-from app.config import TARGET_CITY, TARGET_LATITUDE, TARGET_LONGITUDE
+from app.config import OPEN_METEO_API_URL
+from app.schemas.target import Target
+from app.services.targets import get_default_target
+from app.services.http_client import get_http_client
+from app.services.weather_cache import weather_cache, make_weather_cache_key
 
 logger = logging.getLogger(__name__)
 
-OPEN_METEO_API_URL = "https://api.open-meteo.com/v1/forecast"
+CURRENT_VARIABLES = "temperature_2m,weather_code"
 
 # WMO Weather interpretation codes
 WEATHER_CODE_MAP = {
@@ -46,44 +50,107 @@ def get_weather_description(code: int) -> str:
     return WEATHER_CODE_MAP.get(code, f"Unknown ({code})")
 
 
-async def fetch_weather_data() -> List[Dict[str, Any]]:
+def build_weather_record(
+    target: Target,
+    current: Dict[str, Any],
+    cache_info: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
     """
-    Fetch current weather data from Open-Meteo API for Tel Aviv Yafo.
+    Build the weather record for a target from an Open-Meteo `current` block.
+
+    Args:
+        target: Target the weather belongs to
+        current: The `current` object of an Open-Meteo response
+        cache_info: Whether (and from where) the block was served from cache
 
     Returns:
-        List containing a single weather data record with temperature info
+        Weather record dict
+    """
+    weather_code = current.get("weather_code")
+    return {
+        "source": "open-meteo",
+        "city": target.city,
+        "timestamp": datetime.now().isoformat(),
+        "temperature_c": current.get("temperature_2m"),
+        "weather_description": get_weather_description(weather_code) if weather_code is not None else "Unknown",
+        "cache": cache_info or {"hit": False, "tier": None, "age_seconds": 0.0}
+    }
+
+
+async def fetch_weather_batch(
+    targets: List[Target],
+    client: Optional[httpx.AsyncClient] = None
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Fetch current weather for many targets in a single Open-Meteo request.
+
+    Open-Meteo accepts comma-separated coordinate lists and returns one entry
+    per coordinate pair, in order. Targets sharing a location are requested once,
+    and locations still fresh in the weather cache are not requested at all.
+
+    Args:
+        targets: Targets to fetch weather for
+        client: HTTP client to use (defaults to the shared pooled client)
+
+    Returns:
+        Dict mapping each target key to its list of weather records
 
     Raises:
-        Exception: If the API request fails
+        Exception: If the API request fails or returns the wrong number of entries
     """
-    logger.info(f"Fetching weather data for {TARGET_CITY}")
+    client = client or get_http_client()
+
+    keys: Dict[Tuple[float, float], str] = {}
+    for target in targets:
+        if target.location_key not in keys:
+            keys[target.location_key] = make_weather_cache_key(target.latitude, target.longitude, CURRENT_VARIABLES)
+
+    # Serve what we can from cache, fetch the rest in one request
+    cached = await weather_cache.get_many(list(set(keys.values())))
+    locations = [location for location, key in keys.items() if key not in cached]
+
+    logger.info(f"Fetching weather data for {len(locations)} locations "
+                f"({len(keys) - len(locations)} cached, {len(targets)} targets)")
 
     try:
-        params = {
-            "latitude": TARGET_LATITUDE,
-            "longitude": TARGET_LONGITUDE,
-            "current": "temperature_2m,weather_code",
-            "timezone": "auto"
-        }
-
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        current_by_location: Dict[Tuple[float, float], Dict[str, Any]] = {}
+        if locations:
+            params = {
+                "latitude": ",".join(str(latitude) for latitude, _ in locations),
+                "longitude": ",".join(str(longitude) for _, longitude in locations),
+                "current": CURRENT_VARIABLES,
+                "timezone": "auto",
+                "timeformat": "unixtime"
+            }
+
+            fetched_at = datetime.utcnow()
             response = await client.get(OPEN_METEO_API_URL, params=params)
             response.raise_for_status()
             data = response.json()
 
-        current = data.get("current", {})
-        weather_code = current.get("weather_code")
+            # A single location comes back as an object, several as a list
+            entries = data if isinstance(data, list) else [data]
+            if len(entries) != len(locations):
+                raise ValueError(f"Open-Meteo returned {len(entries)} entries for {len(locations)} locations")
 
-        weather_record = {
-            "source": "open-meteo",
-            "city": TARGET_CITY,
-            "timestamp": datetime.now().isoformat(),
-            "temperature_c": current.get("temperature_2m"),
-            "weather_description": get_weather_description(weather_code) if weather_code is not None else "Unknown"
-        }
+            for location, entry in zip(locations, entries):
+                current_by_location[location] = entry.get("current", {})
+            await weather_cache.set_many(
+                {keys[location]: current for location, current in current_by_location.items()},
+                fetched_at
+            )
 
-        logger.info(f"Weather data fetched successfully: {weather_record['temperature_c']}°C in {TARGET_CITY}")
-        return [weather_record]
+        now = datetime.utcnow()
+        records = {}
+        for target in targets:
+            hit = cached.get(keys[target.location_key])
+            if hit is not None:
+                weather_record = build_weather_record(target, hit.current, hit.cache_info(now))
+            else:
+                weather_record = build_weather_record(target, current_by_location[target.location_key])
+            logger.info(f"Weather data fetched successfully: {weather_record['temperature_c']}°C in {target.city}")
+            records[target.key] = [weather_record]
+        return records
 
     except httpx.HTTPError as e:
         logger.error(f"HTTP error fetching weather data: {str(e)}", exc_info=True)
@@ -91,3 +158,25 @@ async def fetch_weather_data() -> List[Dict[str, Any]]:
     except Exception as e:
         logger.error(f"Error fetching weather data: {str(e)}", exc_info=True)
         raise
+
+
+async def fetch_weather_data(
+    target: Optional[Target] = None,
+    client: Optional[httpx.AsyncClient] = None
+) -> List[Dict[str, Any]]:
+    """
+    Fetch current weather data from Open-Meteo API for a target city.
+
+    Args:
+        target: Target whose location to query (defaults to the configured target)
+        client: HTTP client to use (defaults to the shared pooled client)
+
+    Returns:
+        List containing a single weather data record with temperature info
+
+    Raises:
+        Exception: If the API request fails
+    """
+    target = target or get_default_target()
+    records = await fetch_weather_batch([target], client=client)
+    return records[target.key]
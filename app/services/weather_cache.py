@@ -0,0 +1,220 @@
+"""
+TTL cache for Open-Meteo `current` weather blocks.
+
+Open-Meteo only refreshes `current` values once per model interval (~15
+minutes), so entries are keyed on the rounded coordinates plus the requested
+variables and expire when the upstream publishes its next update
+(`current.time + current.interval`). An in-memory tier serves repeat lookups
+within a process; the optional shared tier (the weather_cache_entries table)
+lets several workers reuse one fetch.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import delete, select
+from app.config import (
+    WEATHER_CACHE_ENABLED,
+    WEATHER_CACHE_SHARED,
+    WEATHER_CACHE_DEFAULT_TTL_SECONDS,
+    WEATHER_CACHE_MIN_TTL_SECONDS,
+    WEATHER_CACHE_COORD_PRECISION,
+)
+from app.database import AsyncSessionLocal
+from app.models.weather_cache import WeatherCacheEntry
+from app.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+
+def make_weather_cache_key(latitude: float, longitude: float, variables: str) -> str:
+    """
+    Build the cache key for a location and set of `current` variables.
+
+    Args:
+        latitude: Location latitude
+        longitude: Location longitude
+        variables: Comma-separated Open-Meteo `current` variables
+
+    Returns:
+        Cache key string
+    """
+    precision = WEATHER_CACHE_COORD_PRECISION
+    return f"{round(latitude, precision)},{round(longitude, precision)}|{variables}"
+
+
+def upstream_expiry(current: Dict[str, Any], fetched_at: datetime) -> datetime:
+    """
+    Compute when a `current` block will be replaced upstream.
+
+    Args:
+        current: Open-Meteo `current` block, requested with timeformat=unixtime
+        fetched_at: When the block was fetched (UTC)
+
+    Returns:
+        Expiry time (UTC), never earlier than the minimum TTL
+    """
+    observed = current.get("time")
+    interval = current.get("interval")
+    if isinstance(observed, (int, float)) and isinstance(interval, (int, float)):
+        expires_at = datetime.utcfromtimestamp(observed + interval)
+    else:
+        expires_at = fetched_at + timedelta(seconds=WEATHER_CACHE_DEFAULT_TTL_SECONDS)
+    return max(expires_at, fetched_at + timedelta(seconds=WEATHER_CACHE_MIN_TTL_SECONDS))
+
+
+class CachedWeather:
+    """A cached `current` block and where it was served from."""
+
+    def __init__(self, current: Dict[str, Any], fetched_at: datetime, expires_at: datetime, tier: str):
+        self.current = current
+        self.fetched_at = fetched_at
+        self.expires_at = expires_at
+        self.tier = tier
+
+    def cache_info(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Cache metadata recorded on the weather record."""
+        now = now or datetime.utcnow()
+        return {
+            "hit": True,
+            "tier": self.tier,
+            "age_seconds": round((now - self.fetched_at).total_seconds(), 3),
+            "expires_at": self.expires_at.isoformat()
+        }
+
+
+class WeatherCache:
+    """Two-tier (memory + optional shared database) weather cache."""
+
+    def __init__(self, enabled: bool = WEATHER_CACHE_ENABLED, shared: bool = WEATHER_CACHE_SHARED):
+        self.enabled = enabled
+        self.shared = shared
+        self._entries: Dict[str, Tuple[Dict[str, Any], datetime, datetime]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get_many(self, keys: List[str]) -> Dict[str, CachedWeather]:
+        """
+        Look up several locations at once.
+
+        Args:
+            keys: Cache keys from make_weather_cache_key
+
+        Returns:
+            Dict of the keys that were found and still fresh
+        """
+        if not self.enabled:
+            return {}
+
+        now = datetime.utcnow()
+        found: Dict[str, CachedWeather] = {}
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            current, fetched_at, expires_at = entry
+            if expires_at > now:
+                found[key] = CachedWeather(current, fetched_at, expires_at, "memory")
+            else:
+                del self._entries[key]
+
+        missing = [key for key in keys if key not in found]
+        if missing and self.shared:
+            try:
+                rows = await self._db_get_many(missing, now)
+            except Exception as e:
+                logger.warning(f"Weather cache database lookup failed: {str(e)}")
+                rows = {}
+            for key, (current, fetched_at, expires_at) in rows.items():
+                self._entries[key] = (current, fetched_at, expires_at)
+                found[key] = CachedWeather(current, fetched_at, expires_at, "shared")
+
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    async def set_many(self, entries: Dict[str, Dict[str, Any]], fetched_at: datetime) -> None:
+        """
+        Store freshly fetched `current` blocks.
+
+        Args:
+            entries: Dict of cache key to `current` block
+            fetched_at: When the blocks were fetched (UTC)
+        """
+        if not self.enabled or not entries:
+            return
+
+        rows = {}
+        for key, current in entries.items():
+            expires_at = upstream_expiry(current, fetched_at)
+            self._entries[key] = (current, fetched_at, expires_at)
+            rows[key] = (current, fetched_at, expires_at)
+
+        if self.shared:
+            try:
+                await self._db_set_many(rows)
+            except Exception as e:
+                logger.warning(f"Weather cache database write failed: {str(e)}")
+
+    def clear(self) -> None:
+        """Drop the in-memory tier and reset counters."""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache hit and miss counters.
+
+        Returns:
+            Dict with hits, misses, hit ratio and memory size
+        """
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "shared": self.shared,
+            "memory_entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+    async def _db_get_many(
+        self,
+        keys: List[str],
+        now: datetime
+    ) -> Dict[str, Tuple[Dict[str, Any], datetime, datetime]]:
+        async with AsyncSessionLocal() as db:
+            rows = (await db.scalars(select(WeatherCacheEntry).where(
+                WeatherCacheEntry.cache_key.in_(keys),
+                WeatherCacheEntry.expires_at > now
+            ))).all()
+            return {
+                row.cache_key: (loads(row.current), row.fetched_at, row.expires_at)
+                for row in rows
+            }
+
+    async def _db_set_many(self, rows: Dict[str, Tuple[Dict[str, Any], datetime, datetime]]) -> None:
+        async with AsyncSessionLocal() as db:
+            for key, (current, fetched_at, expires_at) in rows.items():
+                await db.merge(WeatherCacheEntry(
+                    cache_key=key,
+                    current=dumps(current).decode("utf-8"),
+                    fetched_at=fetched_at,
+                    expires_at=expires_at
+                ))
+            # Expired rows are never served again
+            await db.execute(delete(WeatherCacheEntry).where(WeatherCacheEntry.expires_at <= fetched_at))
+            await db.commit()
+
+
+weather_cache = WeatherCache()
+
+
+def get_weather_cache_stats() -> Dict[str, Any]:
+    """
+    Get hit and miss counters for the weather cache.
+
+    Returns:
+        Dict of cache counters
+    """
+    return weather_cache.stats()
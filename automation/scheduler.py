@@ -1,39 +1,89 @@
 """
 Scheduler module for running periodic tasks.
+
+Safe to start in every worker and replica: each process runs a SchedulerNode.
+The node holding the database lease plans each aggregation run as staggered
+target shards and runs the daily maintenance; every node claims and runs due
+shards.
 """
+import asyncio
 import logging
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 from datetime import datetime
-from app.services.aggregator import aggregate_all_data
+from app.config import SCHEDULER_INTERVAL_HOURS, SCHEDULER_LEASE_SECONDS, SCHEDULER_TICK_SECONDS
+from app.services.data_lifecycle import run_maintenance
+from app.services.scheduling import SchedulerNode
 
 logger = logging.getLogger(__name__)
 
 # Global scheduler instance
 scheduler = AsyncIOScheduler()
 
+# This process's part in the shared schedule
+node = SchedulerNode()
+
+
+async def run_leader_heartbeat_job():
+    """
+    Job that renews the leadership lease and, on the leader, plans the next run when it is due.
+    """
+    try:
+        await node.heartbeat()
+    except Exception as e:
+        node.is_leader = False
+        logger.error(f"Error during scheduler heartbeat: {str(e)}", exc_info=True)
+
 
 async def run_data_aggregation_job():
     """
-    Job that runs every 8 hours to aggregate weather and OSINT data.
+    Job that claims and runs due target shards of the aggregation run.
     """
     try:
-        logger.info(f"Starting scheduled data aggregation at {datetime.now()}")
-        result = await aggregate_all_data()
-        logger.info(f"Scheduled data aggregation completed successfully: {result}")
+        count = await node.run_due_shards()
+        if count:
+            logger.info(f"Scheduled data aggregation ran {count} shards on {node.node_id}")
     except Exception as e:
         logger.error(f"Error during scheduled data aggregation: {str(e)}", exc_info=True)
 
 
+async def run_data_maintenance_job():
+    """
+    Job that runs daily on the leader to premake partitions, apply retention and compact raw payloads.
+    """
+    if not node.is_leader:
+        return
+    try:
+        logger.info(f"Starting scheduled data maintenance at {datetime.now()}")
+        # Maintenance uses the sync engine, so keep it off the event loop
+        result = await asyncio.to_thread(run_maintenance)
+        logger.info(f"Scheduled data maintenance completed successfully: {result}")
+    except Exception as e:
+        logger.error(f"Error during scheduled data maintenance: {str(e)}", exc_info=True)
+
+
 def start_scheduler():
     """
     Initialize and start the scheduler with all periodic jobs.
     """
     if not scheduler.running:
-        # Add job that runs every 8 hours
+        # Renew the lease well within its lifetime
+        scheduler.add_job(
+            run_leader_heartbeat_job,
+            trigger=IntervalTrigger(seconds=SCHEDULER_LEASE_SECONDS / 3),
+            id='leader_heartbeat_job',
+            name='Scheduler leader election',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+            next_run_time=datetime.now(),
+        )
+
+        # Poll for due shards; the leader spreads them across the aggregation interval
         scheduler.add_job(
             run_data_aggregation_job,
-            trigger=IntervalTrigger(hours=8),
+            trigger=IntervalTrigger(seconds=SCHEDULER_TICK_SECONDS),
             id='data_aggregation_job',
             name='Aggregate weather and OSINT data',
             replace_existing=True,
@@ -41,18 +91,31 @@ def start_scheduler():
             coalesce=True,    # If multiple runs are missed, only run once
         )
 
+        # Add daily maintenance job at 03:30 UTC
+        scheduler.add_job(
+            run_data_maintenance_job,
+            trigger=CronTrigger(hour=3, minute=30, timezone="UTC"),
+            id='data_maintenance_job',
+            name='Partition, retention and compaction maintenance',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+
         scheduler.start()
-        logger.info("Scheduler started successfully - job will run every 8 hours")
+        logger.info(f"Scheduler started successfully as node {node.node_id} - "
+                    f"runs every {SCHEDULER_INTERVAL_HOURS:g} hours")
     else:
         logger.warning("Scheduler is already running")
 
 
-def stop_scheduler():
+async def stop_scheduler():
     """
-    Gracefully shutdown the scheduler.
+    Gracefully shutdown the scheduler and hand over leadership.
     """
     if scheduler.running:
         scheduler.shutdown(wait=True)
+        await node.release_lease()
         logger.info("Scheduler stopped successfully")
     else:
         logger.warning("Scheduler is not running")
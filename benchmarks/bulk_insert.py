@@ -0,0 +1,87 @@
+"""
+Benchmark: per-row vs bulk persistence of data records.
+
+Inserts the same synthetic records through create_data_record (one add /
+commit / refresh per row) and create_data_records (one batched transaction)
+and prints rows per second for each.
+
+Usage:
+    python -m benchmarks.bulk_insert --records 500 --repeat 3
+
+Runs against DATABASE_URL when it is set, otherwise against a throwaway
+SQLite database.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{Path(tempfile.mkdtemp()) / 'bench.db'}")
+
+from app.crud.data_record import create_data_record, create_data_records  # noqa: E402
+from app.database import AsyncSessionLocal, close_db, init_db  # noqa: E402
+from app.schemas.data_record import DataRecordCreate  # noqa: E402
+
+
+def make_records(count: int, posts_per_record: int = 25):
+    """Build synthetic records with realistically sized raw payloads."""
+    raw_osint = json.dumps({
+        "status": "success",
+        "data": {"posts": [{"title": f"Post {i}", "text": "lorem ipsum " * 40} for i in range(posts_per_record)]}
+    })
+    return [
+        DataRecordCreate(
+            aggregation_timestamp_utc=datetime.utcnow(),
+            city_name=f"Benchmark City {i % 50}",
+            current_temperature_c=20.0,
+            brand_name=f"Benchmark Brand {i % 10}",
+            sentiment_summary="Mostly positive.",
+            news_summary="New product launch.",
+            popularity_score=55.0,
+            raw_weather_response=json.dumps({"status": "success", "data": [{"temperature_c": 20.0}]}),
+            raw_osint_response=raw_osint,
+            raw_gemini_response=json.dumps({"status": "success"})
+        )
+        for i in range(count)
+    ]
+
+
+async def per_row(records) -> None:
+    async with AsyncSessionLocal() as db:
+        for record in records:
+            await create_data_record(db, record)
+
+
+async def bulk(records) -> None:
+    async with AsyncSessionLocal() as db:
+        await create_data_records(db, records)
+
+
+async def main(count: int, repeat: int) -> None:
+    init_db()
+    records = make_records(count)
+    results = {}
+    for name, insert in (("per_row", per_row), ("bulk", bulk)):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            await insert(records)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        results[name] = best
+        print(f"{name:8s} {count} records: best {best:.3f}s ({count / best:,.0f} rows/s)")
+
+    print(f"speedup: {results['per_row'] / results['bulk']:.1f}x")
+    await close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=500, help="Records per run")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per method (best is reported)")
+    args = parser.parse_args()
+    asyncio.run(main(args.records, args.repeat))
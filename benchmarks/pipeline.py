@@ -0,0 +1,283 @@
+"""
+Benchmark: end-to-end aggregation and API reads against local stub APIs.
+
+Starts stand-ins for Open-Meteo, Reddit search and Gemini (benchmarks.stubs)
+with configurable latency, then runs aggregate_all_data for a growing number
+of targets and reports throughput and p50/p95/p99 target latency. With the
+records it wrote in place, it then measures the read endpoints in process.
+Results are saved as JSON; pass an earlier file as --baseline to flag
+regressions.
+
+Usage:
+    python -m benchmarks.pipeline --targets 1,10,100,1000 --repeat 3
+    python -m benchmarks.pipeline --gemini-latency 1500 --baseline benchmarks/results/<earlier>.json
+
+Runs against DATABASE_URL when it is set, otherwise against a throwaway
+SQLite database. Weather and LLM caches and incremental ingestion are off
+unless --warm, so every run does the full work.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from benchmarks.stubs import Latency, StubServer
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Linearly interpolated percentile (pct in 0-100) of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def latency_summary(seconds: List[float]) -> Dict[str, Any]:
+    """Count, mean and p50/p95/p99/max of latencies, in milliseconds."""
+    ms = [value * 1000 for value in seconds]
+    summary = {"count": len(ms), "mean_ms": sum(ms) / len(ms) if ms else None}
+    for pct in (50, 95, 99):
+        summary[f"p{pct}_ms"] = percentile(ms, pct)
+    summary["max_ms"] = max(ms) if ms else None
+    return {key: round(value, 3) if isinstance(value, float) else value for key, value in summary.items()}
+
+
+def make_targets(count: int, targets_per_brand: int):
+    """Targets at distinct locations, with each brand shared by targets_per_brand cities."""
+    from app.schemas.target import Target
+
+    return [
+        Target(
+            city=f"Bench City {i}",
+            latitude=round(-60 + (i * 0.37) % 120, 4),
+            longitude=round(-170 + (i * 0.53) % 340, 4),
+            brand=f"Bench Brand {i // max(targets_per_brand, 1)}"
+        )
+        for i in range(count)
+    ]
+
+
+async def bench_aggregation(counts: List[int], repeat: int, targets_per_brand: int, stubs: StubServer):
+    from app.services.aggregator import aggregate_all_data
+
+    scenarios = []
+    for count in counts:
+        targets = make_targets(count, targets_per_brand)
+        wall_times: List[float] = []
+        target_latencies: List[float] = []
+        saved = 0
+        requests_before = stubs.requests
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = await aggregate_all_data(targets=targets)
+            wall_times.append(time.perf_counter() - start)
+            target_latencies.extend(target["duration_seconds"] for target in result["targets"])
+            saved += result["success_count"]
+
+        requests = {name: total - requests_before[name] for name, total in stubs.requests.items()}
+        scenario = {
+            "name": f"aggregate_{count}",
+            "targets": count,
+            "brands": len({target.brand for target in targets}),
+            "runs": repeat,
+            "saved_ratio": round(saved / (count * repeat), 4),
+            "wall_seconds": latency_summary(wall_times),
+            "throughput_targets_per_second": round(count * repeat / sum(wall_times), 3),
+            "target_latency": latency_summary(target_latencies),
+            "upstream_requests_per_run": {name: total / repeat for name, total in requests.items()}
+        }
+        scenarios.append(scenario)
+        latency = scenario["target_latency"]
+        print(f"aggregate {count:5d} targets: {scenario['throughput_targets_per_second']:9.2f} targets/s  "
+              f"p50 {latency['p50_ms']:9.1f}ms  p95 {latency['p95_ms']:9.1f}ms  p99 {latency['p99_ms']:9.1f}ms  "
+              f"saved {scenario['saved_ratio']:.0%}")
+    return scenarios
+
+
+async def bench_api(requests: int, concurrency: int):
+    import httpx
+    from app.main import app
+    from app.services.latest_cache import latest_record_cache
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        latest = (await client.get("/api/v1/data/latest")).json()
+        endpoints = {
+            "latest": ("/api/v1/data/latest", {}),
+            "latest_filtered": ("/api/v1/data/latest", {"city": latest["city_name"], "brand": latest["brand_name"]}),
+            "history_page": ("/api/v1/data/history", {"limit": 100}),
+            "history_ndjson": ("/api/v1/data/history", {"limit": 1000, "format": "ndjson"}),
+            "rollups": ("/api/v1/data/rollups", {"period": "day"}),
+            "raw": (f"/api/v1/data/{latest['id']}/raw", {}),
+        }
+
+        scenarios = []
+        semaphore = asyncio.Semaphore(concurrency)
+        for name, (path, params) in endpoints.items():
+            latest_record_cache.clear()
+            latencies: List[float] = []
+            errors = 0
+
+            async def one():
+                nonlocal errors
+                async with semaphore:
+                    start = time.perf_counter()
+                    response = await client.get(path, params=params)
+                    latencies.append(time.perf_counter() - start)
+                    errors += response.status_code >= 400
+
+            start = time.perf_counter()
+            await asyncio.gather(*[one() for _ in range(requests)])
+            elapsed = time.perf_counter() - start
+            scenario = {
+                "name": f"api_{name}",
+                "path": path,
+                "requests": requests,
+                "concurrency": concurrency,
+                "errors": errors,
+                "throughput_requests_per_second": round(requests / elapsed, 3),
+                "latency": latency_summary(latencies)
+            }
+            scenarios.append(scenario)
+            print(f"api {name:16s}: {scenario['throughput_requests_per_second']:9.1f} req/s  "
+                  f"p50 {scenario['latency']['p50_ms']:7.2f}ms  p95 {scenario['latency']['p95_ms']:7.2f}ms  "
+                  f"p99 {scenario['latency']['p99_ms']:7.2f}ms")
+    return scenarios
+
+
+def compare(results: Dict[str, Any], baseline_path: str, tolerance: float) -> List[str]:
+    """Print p95 and throughput changes against an earlier results file and list regressions."""
+    baseline = {scenario["name"]: scenario for scenario in json.loads(Path(baseline_path).read_text())["scenarios"]}
+    regressions = []
+    print(f"\ncompared with {baseline_path}:")
+    for scenario in results["scenarios"]:
+        before = baseline.get(scenario["name"])
+        if before is None:
+            continue
+        latency_key = "target_latency" if "target_latency" in scenario else "latency"
+        throughput_key = next(key for key in scenario if key.startswith("throughput"))
+        p95_change = scenario[latency_key]["p95_ms"] / before[latency_key]["p95_ms"] - 1
+        throughput_change = scenario[throughput_key] / before[throughput_key] - 1
+        regressed = p95_change > tolerance or throughput_change < -tolerance
+        if regressed:
+            regressions.append(scenario["name"])
+        print(f"  {scenario['name']:22s} p95 {p95_change:+7.1%}  throughput {throughput_change:+7.1%}"
+              f"{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args: argparse.Namespace, stubs: StubServer) -> Dict[str, Any]:
+    from app import config
+    from app.database import close_db, engine, init_db
+    from app.services.http_client import close_http_client
+
+    init_db()
+    try:
+        scenarios = await bench_aggregation(args.targets, args.repeat, args.targets_per_brand, stubs)
+        if args.api_requests:
+            scenarios += await bench_api(args.api_requests, args.api_concurrency)
+    finally:
+        await close_http_client()
+        await close_db()
+
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "database": engine.dialect.name,
+        "settings": {
+            "warm": args.warm,
+            "targets_per_brand": args.targets_per_brand,
+            "posts_per_query": args.posts,
+            "latency": {name: latency.as_dict() for name, latency in stubs.latencies.items()},
+            "weather_concurrency": config.WEATHER_CONCURRENCY,
+            "osint_concurrency": config.OSINT_CONCURRENCY,
+            "llm_concurrency": config.LLM_CONCURRENCY,
+            "weather_batch_size": config.WEATHER_BATCH_SIZE,
+            "target_timeout_seconds": config.TARGET_TIMEOUT_SECONDS,
+        },
+        "scenarios": scenarios
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--targets", default="1,10,100,1000",
+                        type=lambda value: [int(count) for count in value.split(",")],
+                        help="Comma-separated target counts")
+    parser.add_argument("--repeat", type=int, default=3, help="Aggregation runs per target count")
+    parser.add_argument("--targets-per-brand", type=int, default=5, help="Cities sharing each brand")
+    parser.add_argument("--posts", type=int, default=25, help="Reddit posts per brand search")
+    parser.add_argument("--weather-latency", type=float, default=50, help="Open-Meteo stub latency (ms)")
+    parser.add_argument("--reddit-latency", type=float, default=150, help="Reddit stub latency per page (ms)")
+    parser.add_argument("--gemini-latency", type=float, default=400, help="Gemini stub latency (ms)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Latency jitter as a fraction of the mean")
+    parser.add_argument("--api-requests", type=int, default=500, help="Requests per read endpoint (0 = skip)")
+    parser.add_argument("--api-concurrency", type=int, default=10, help="Concurrent read requests")
+    parser.add_argument("--warm", action="store_true", help="Keep caches and incremental ingestion on")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/pipeline-<timestamp>.json)")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Relative change counted as a regression")
+    args = parser.parse_args()
+
+    latencies = {
+        name: Latency(mean, mean * args.jitter)
+        for name, mean in (
+            ("weather", args.weather_latency), ("reddit", args.reddit_latency), ("gemini", args.gemini_latency)
+        )
+    }
+    stubs = StubServer(latencies, posts_per_query=args.posts).start()
+
+    # Settings are read at import time, so set them before importing the app
+    os.environ.update(stubs.environment())
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{Path(tempfile.mkdtemp()) / 'bench.db'}")
+    os.environ["OSINT_SOURCES"] = "reddit"
+    if not args.warm:
+        os.environ["WEATHER_CACHE_ENABLED"] = "false"
+        os.environ["LLM_CACHE_ENABLED"] = "false"
+        os.environ["OSINT_INCREMENTAL"] = "false"
+    logging.basicConfig(level=logging.WARNING)
+
+    try:
+        results = asyncio.run(run(args, stubs))
+    finally:
+        stubs.stop()
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"pipeline-{datetime.utcnow():%Y%m%dT%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\nresults saved to {output}")
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        if regressions:
+            print(f"regressions: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+Local stand-ins for Open-Meteo, Reddit search and Gemini.
+
+One small ASGI app serves all three APIs with realistic payloads and a
+configurable latency per API, so benchmarks exercise the real HTTP clients,
+parsers and pipeline without touching the network or spending API quota.
+Point the service at it with OPEN_METEO_API_URL, REDDIT_SEARCH_URL and
+GEMINI_BASE_URL (see StubServer.environment).
+"""
+import asyncio
+import json
+import random
+import socket
+import threading
+import time
+from typing import Dict, Optional
+import uvicorn
+from fastapi import FastAPI, Request
+
+LOREM = (
+    "Picked up the new collection last week and the fit is great, though sizing runs small. "
+    "Shipping took longer than expected but support sorted it out quickly. "
+)
+
+
+class Latency:
+    """Response delay of one stub API: a mean with uniform jitter, in milliseconds."""
+
+    def __init__(self, mean_ms: float = 0.0, jitter_ms: float = 0.0):
+        self.mean_ms = mean_ms
+        self.jitter_ms = jitter_ms
+
+    async def wait(self) -> None:
+        delay = self.mean_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+    def as_dict(self) -> Dict[str, float]:
+        return {"mean_ms": self.mean_ms, "jitter_ms": self.jitter_ms}
+
+
+def create_stub_app(latencies: Dict[str, Latency], posts_per_query: int = 25) -> FastAPI:
+    """
+    Build the stub API app.
+
+    Args:
+        latencies: Latency per API ("weather", "reddit", "gemini")
+        posts_per_query: Posts a Reddit search returns in total, across pages
+
+    Returns:
+        FastAPI app serving the three stub APIs
+    """
+    app = FastAPI()
+    app.state.requests = {"weather": 0, "reddit": 0, "gemini": 0}
+
+    @app.get("/v1/forecast")
+    async def forecast(latitude: str, longitude: str):
+        app.state.requests["weather"] += 1
+        await latencies["weather"].wait()
+        now = int(time.time())
+        entries = [
+            {
+                "latitude": float(lat),
+                "longitude": float(lon),
+                "utc_offset_seconds": 0,
+                "timezone": "GMT",
+                "current_units": {"time": "unixtime", "interval": "seconds", "temperature_2m": "°C", "weather_code": "wmo code"},
+                "current": {
+                    "time": now - now % 900,
+                    "interval": 900,
+                    "temperature_2m": round(15 + 10 * random.random(), 1),
+                    "weather_code": random.choice([0, 1, 2, 3, 61])
+                }
+            }
+            for lat, lon in zip(latitude.split(","), longitude.split(","))
+        ]
+        # Open-Meteo answers a single location with an object, several with a list
+        return entries[0] if len(entries) == 1 else entries
+
+    @app.get("/r/all/search.json")
+    async def reddit_search(q: str, limit: int = 25, after: Optional[str] = None):
+        app.state.requests["reddit"] += 1
+        await latencies["reddit"].wait()
+        start = int(after.rsplit("_", 1)[1]) if after else 0
+        count = max(min(limit, posts_per_query - start), 0)
+        now = time.time()
+        children = [
+            {
+                "kind": "t3",
+                "data": {
+                    # Unique per request so incremental runs keep seeing new posts
+                    "name": f"t3_{q}_{now:.6f}_{i}".replace(" ", "-"),
+                    "created_utc": now - i * 60,
+                    "title": f"{q} post {i}",
+                    "selftext": LOREM * (1 + i % 4),
+                    "subreddit": "all",
+                    "score": random.randint(0, 500)
+                }
+            }
+            for i in range(start, start + count)
+        ]
+        next_after = f"t3_page_{start + count}" if start + count < posts_per_query else None
+        return {"kind": "Listing", "data": {"after": next_after, "children": children}}
+
+    @app.post("/v1beta/models/{model}:generateContent")
+    async def generate_content(model: str, request: Request):
+        app.state.requests["gemini"] += 1
+        body = await request.json()
+        await latencies["gemini"].wait()
+        prompt = "".join(
+            part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", [])
+        )
+        config = body.get("generationConfig") or {}
+        if config.get("responseMimeType") == "application/json":
+            text = json.dumps({
+                "sentiment_summary": "Mostly positive, with complaints about sizing.",
+                "news_summary": "A new collection launched this week.",
+                "popularity_score": round(100 * random.random(), 1)
+            })
+        else:
+            text = "- Mostly positive sentiment\n- New collection launched\n- Steady attention"
+        return {
+            "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}],
+            "usageMetadata": {
+                "promptTokenCount": len(prompt) // 4,
+                "candidatesTokenCount": len(text) // 4,
+                "totalTokenCount": (len(prompt) + len(text)) // 4
+            },
+            "modelVersion": model
+        }
+
+    return app
+
+
+class StubServer:
+    """Runs the stub app with uvicorn in a background thread on a free local port."""
+
+    def __init__(self, latencies: Dict[str, Latency], posts_per_query: int = 25):
+        self.latencies = latencies
+        self.app = create_stub_app(latencies, posts_per_query)
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        config = uvicorn.Config(self.app, host="127.0.0.1", port=self.port, log_level="warning", access_log=False)
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def requests(self) -> Dict[str, int]:
+        """Requests served so far per API."""
+        return dict(self.app.state.requests)
+
+    def environment(self) -> Dict[str, str]:
+        """Settings that point the service at the stubs."""
+        return {
+            "OPEN_METEO_API_URL": f"{self.base_url}/v1/forecast",
+            "REDDIT_SEARCH_URL": f"{self.base_url}/r/all/search.json",
+            "GEMINI_BASE_URL": self.base_url,
+            "GEMINI_API_KEY": "benchmark",
+            # The stubs don't rate limit; keep the limiter in the path without throttling it
+            "RATE_LIMIT_HOSTS": "127.0.0.1=100000",
+        }
+
+    def start(self) -> "StubServer":
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Stub server did not start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=10)
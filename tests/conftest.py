@@ -0,0 +1,67 @@
+"""
+Shared pytest configuration and fixtures.
+
+App modules are imported inside the fixtures, so DATABASE_URL below is set
+before the database engine is created.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+import httpx
+import pytest
+import pytest_asyncio
+
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Use a throwaway SQLite database unless one is configured explicitly
+os.environ.setdefault(
+    "DATABASE_URL",
+    f"sqlite:///{Path(tempfile.mkdtemp()) / 'osint_weather_test.db'}"
+)
+
+
+@pytest.fixture
+def make_record():
+    """Factory for DataRecordCreate; keyword arguments override any field."""
+    from datetime import datetime
+    from app.schemas.data_record import DataRecordCreate
+
+    def make(city="Tel Aviv Yafo", brand="Gymshark", timestamp=None, **fields):
+        values = {
+            "aggregation_timestamp_utc": timestamp or datetime.utcnow(),
+            "city_name": city,
+            "current_temperature_c": 21.5,
+            "brand_name": brand,
+            "sentiment_summary": "positive",
+            "news_summary": "new drop",
+            "popularity_score": 70.0,
+            "raw_weather_response": "{}",
+            "raw_osint_response": "{}",
+        }
+        return DataRecordCreate(**{**values, **fields})
+
+    return make
+
+
+@pytest.fixture
+def save_record():
+    """Insert one record through the async CRUD layer and return its ID."""
+    from app.crud.data_record import create_data_record
+    from app.database import AsyncSessionLocal
+
+    async def save(record):
+        async with AsyncSessionLocal() as db:
+            return (await create_data_record(db, record)).id
+
+    return save
+
+
+@pytest_asyncio.fixture
+async def api():
+    """HTTP client for the app, served in process."""
+    from app.main import app
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
@@ -0,0 +1,266 @@
+"""
+Tests for the API endpoints.
+"""
+import asyncio
+import json
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import inspect, text
+
+from app.backfill_rollups import backfill_rollups
+from app.database import engine, init_db
+from app.services import jobs
+from app.services.latest_cache import latest_record_cache
+
+init_db()
+
+
+@pytest.mark.asyncio
+async def test_latest_returns_newest_record_without_raw_fields(api, make_record, save_record):
+    record_id = await save_record(make_record())
+
+    response = await api.get("/api/v1/data/latest")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["id"] == record_id
+    assert body["brand_name"] == "Gymshark"
+    assert "raw_osint_response" not in body
+
+
+@pytest.mark.asyncio
+async def test_latest_filters_by_city_and_brand(api, make_record, save_record):
+    haifa_id = await save_record(make_record(city="Haifa", brand="Allbirds"))
+    await save_record(make_record(city="Haifa", brand="Gymshark"))
+
+    response = await api.get("/api/v1/data/latest", params={"city": "Haifa", "brand": "Allbirds"})
+    assert response.json()["id"] == haifa_id
+
+    response = await api.get("/api/v1/data/latest", params={"city": "Atlantis"})
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_latest_is_served_from_cache_until_an_insert(api, make_record, save_record):
+    latest_record_cache.clear()
+    first_id = await save_record(make_record(city="Eilat"))
+
+    await api.get("/api/v1/data/latest", params={"city": "Eilat"})
+    response = await api.get("/api/v1/data/latest", params={"city": "Eilat"})
+    assert response.json()["id"] == first_id
+    assert latest_record_cache.hits == 1
+
+    # Inserting a record for the same target invalidates the cached answer
+    second_id = await save_record(make_record(city="Eilat"))
+    response = await api.get("/api/v1/data/latest", params={"city": "Eilat"})
+    assert response.json()["id"] == second_id
+
+
+def test_composite_index_exists():
+    index_names = {index["name"] for index in inspect(engine).get_indexes("data_records")}
+    assert "ix_data_records_city_brand_timestamp" in index_names
+
+
+@pytest.mark.asyncio
+async def test_latest_supports_conditional_requests(api, make_record, save_record):
+    await save_record(make_record(city="Nazareth"))
+    params = {"city": "Nazareth"}
+
+    response = await api.get("/api/v1/data/latest", params=params)
+    etag = response.headers["etag"]
+    last_modified = response.headers["last-modified"]
+    assert response.headers["cache-control"].startswith("public, max-age=")
+
+    response = await api.get("/api/v1/data/latest", params=params, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    response = await api.get("/api/v1/data/latest", params=params, headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+    # A newer record changes the ETag, so the old one no longer matches
+    await save_record(make_record(city="Nazareth"))
+    response = await api.get("/api/v1/data/latest", params=params, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_raw_payload_is_stored_compressed_and_served_on_demand(api, make_record, save_record):
+    raw_osint = {"status": "success", "data": {"posts": [{"title": "t", "text": "x" * 5000}]}}
+    record = make_record(city="Acre").model_copy(update={"raw_osint_response": json.dumps(raw_osint)})
+    record_id = await save_record(record)
+
+    # Latest / list queries never touch the raw payloads
+    assert "raw_osint_response" not in {column["name"] for column in inspect(engine).get_columns("data_records")}
+    with engine.connect() as conn:
+        stored = conn.execute(
+            text("SELECT raw_osint_response FROM data_record_payloads WHERE record_id = :id"), {"id": record_id}
+        ).scalar_one()
+    assert len(stored) < 1000
+
+    response = await api.get(f"/api/v1/data/{record_id}/raw")
+    assert response.status_code == 200
+    assert response.json()["raw_osint_response"] == raw_osint
+    assert "immutable" in response.headers["cache-control"]
+
+    response = await api.get("/api/v1/data/999999999/raw")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_history_pages_with_keyset_cursor(api, make_record, save_record):
+    base = datetime(2024, 3, 1, 12, 0, 0)
+    ids = [await save_record(make_record(city="Jaffa", timestamp=base + timedelta(hours=i))) for i in range(5)]
+    # Same timestamp as the newest record: the id breaks the tie
+    ids.append(await save_record(make_record(city="Jaffa", timestamp=base + timedelta(hours=4))))
+
+    seen, cursor = [], None
+    while True:
+        params = {"city": "Jaffa", "limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = (await api.get("/api/v1/data/history", params=params)).json()
+        seen += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == [ids[5], ids[4], ids[3], ids[2], ids[1], ids[0]]
+
+    params = {"city": "Jaffa", "start": (base + timedelta(hours=1)).isoformat(),
+              "end": (base + timedelta(hours=3)).isoformat(), "order": "asc"}
+    page = (await api.get("/api/v1/data/history", params=params)).json()
+    assert [item["id"] for item in page["items"]] == [ids[1], ids[2]]
+
+    response = await api.get("/api/v1/data/history", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_history_streams_ndjson(api, make_record, save_record):
+    base = datetime(2024, 4, 1)
+    ids = [await save_record(make_record(city="Ramla", timestamp=base + timedelta(days=i))) for i in range(3)]
+
+    response = await api.get("/api/v1/data/history", params={"city": "Ramla", "format": "ndjson", "order": "asc"})
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = response.text.strip().split("\n")
+    assert [json.loads(line)["id"] for line in lines] == ids
+
+
+@pytest.mark.asyncio
+async def test_rollups_are_updated_on_insert(api, make_record, save_record):
+    monday = datetime(2024, 5, 6, 9, 0, 0)
+    await save_record(make_record(city="Rollup City", timestamp=monday).model_copy(update={"current_temperature_c": 10.0}))
+    await save_record(make_record(city="Rollup City", timestamp=monday + timedelta(hours=5)).model_copy(
+        update={"current_temperature_c": 20.0, "popularity_score": None}
+    ))
+    await save_record(make_record(city="Rollup City", timestamp=monday + timedelta(days=2)).model_copy(
+        update={"current_temperature_c": 30.0, "popularity_score": 40.0}
+    ))
+
+    days = (await api.get("/api/v1/data/rollups", params={"city": "Rollup City", "period": "day"})).json()
+    assert [(day["period_start"][:10], day["record_count"]) for day in days] == [("2024-05-08", 1), ("2024-05-06", 2)]
+    assert days[1]["avg_temperature_c"] == 15.0
+    # Records without a popularity score don't drag the average down
+    assert days[1]["avg_popularity_score"] == 70.0
+
+    weeks = (await api.get("/api/v1/data/rollups", params={"city": "Rollup City", "period": "week"})).json()
+    assert len(weeks) == 1
+    assert weeks[0]["record_count"] == 3
+    assert weeks[0]["avg_temperature_c"] == 20.0
+    assert weeks[0]["avg_popularity_score"] == 55.0
+
+
+@pytest.mark.asyncio
+async def test_backfill_rebuilds_rollups_from_history(api, make_record, save_record):
+    await save_record(make_record(city="Backfill City", timestamp=datetime(2024, 6, 3)))
+    before = (await api.get("/api/v1/data/rollups", params={"city": "Backfill City"})).json()
+
+    assert backfill_rollups(batch_size=2) > 0
+
+    after = (await api.get("/api/v1/data/rollups", params={"city": "Backfill City"})).json()
+    assert after == before
+
+
+@pytest.mark.asyncio
+async def test_refresh_returns_job_and_coalesces_triggers(api, monkeypatch):
+    release = asyncio.Event()
+
+    async def fake_aggregate(targets, client, progress):
+        progress.plan(weather=1, osint=1, gemini=1, save=1)
+        progress.advance("weather")
+        await release.wait()
+        for stage in ("osint", "gemini", "save"):
+            progress.advance(stage)
+        return {"target_count": len(targets), "success_count": len(targets)}
+
+    monkeypatch.setattr(jobs, "aggregate_all_data", fake_aggregate)
+
+    response = await api.post("/api/v1/data/refresh")
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert response.headers["location"].endswith(f"/api/v1/jobs/{job_id}")
+
+    retry = await api.post("/api/v1/data/refresh")
+    assert retry.json()["job_id"] == job_id
+    assert retry.json()["deduplicated"] is True
+
+    status = (await api.get(f"/api/v1/jobs/{job_id}")).json()
+    assert status["status"] == "running"
+    assert status["stages"]["weather"]["status"] == "done"
+    assert status["stages"]["gemini"]["status"] == "pending"
+
+    release.set()
+    await jobs.refresh_jobs.wait(await jobs.refresh_jobs.get(job_id))
+    status = (await api.get(f"/api/v1/jobs/{job_id}")).json()
+    assert status["status"] == "succeeded"
+    assert status["triggers"] == 2
+    assert status["result"]["success_count"] == status["result"]["target_count"]
+
+    response = await api.get("/api/v1/jobs/unknown")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_refresh_wait_returns_results_and_slim_leaves_out_payloads(api, monkeypatch):
+    async def fake_aggregate(targets, client, progress):
+        sources = {
+            "weather": {"status": "success", "records": 1, "data": [{"city": "Haifa", "temperature_c": 19.0}]},
+            "osint": {"status": "success", "records": 1, "data": {"brand_name": "Gymshark", "posts": [{"id": "t3_1"}]}},
+            "gemini": {"status": "success", "sentiment_summary": "positive"}
+        }
+        return {
+            "timestamp": datetime.utcnow().isoformat(),
+            "target_count": 1,
+            "success_count": 1,
+            "targets": [{"city": "Haifa", "brand": "Gymshark", "sources": sources, "db_record_id": 7}]
+        }
+
+    monkeypatch.setattr(jobs, "aggregate_all_data", fake_aggregate)
+
+    full = await api.post("/api/v1/data/refresh", params={"wait": "true"})
+    assert full.status_code == 200
+    assert full.json()["targets"][0]["sources"]["osint"]["data"]["posts"] == [{"id": "t3_1"}]
+
+    slim = await api.post("/api/v1/data/refresh", params={"wait": "true", "slim": "true"})
+    target = slim.json()["targets"][0]
+    assert target["db_record_id"] == 7
+    assert target["sources"]["osint"] == {"status": "success", "records": 1}
+    assert "data" not in target["sources"]["weather"]
+    assert target["sources"]["gemini"]["sentiment_summary"] == "positive"
+    assert len(slim.content) < len(full.content)
+
+    # Without wait there are no results to slim down; the job status URL takes slim instead
+    rejected = await api.post("/api/v1/data/refresh", params={"slim": "true"})
+    assert rejected.status_code == 400
+    assert "jobs" in rejected.json()["detail"]
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_exposes_prometheus_text(api):
+    response = await api.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'cache_hit_ratio{cache="latest_record"}' in response.text
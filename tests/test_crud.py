@@ -0,0 +1,60 @@
+"""
+Tests for the CRUD operations.
+"""
+from datetime import datetime, timedelta
+import pytest
+
+from app.crud.data_record import create_data_records, get_latest_record, get_record_payload
+from app.database import AsyncSessionLocal, init_db
+from app.services.data_transformer import transform_aggregate_to_record
+from app.services.latest_cache import latest_record_cache
+
+init_db()
+
+
+@pytest.mark.asyncio
+async def test_bulk_insert_returns_ids_in_input_order(make_record):
+    records = [
+        make_record(
+            f"Bulk City {i}",
+            timestamp=datetime.utcnow() + timedelta(seconds=i),
+            raw_weather_response='{"city": "Bulk City %d"}' % i
+        )
+        for i in range(5)
+    ]
+    latest_record_cache.set("Bulk City 4", None, object(), latest_record_cache.generation)
+
+    async with AsyncSessionLocal() as db:
+        ids = await create_data_records(db, records)
+        assert len(ids) == 5
+        for record_id, record in zip(ids, records):
+            payload = await get_record_payload(db, record_id)
+            assert payload.raw_weather_response == {"city": record.city_name}
+        latest = await get_latest_record(db, city="Bulk City 4")
+        assert latest.id == ids[4]
+
+    # Inserted targets are invalidated in the latest-record cache
+    assert latest_record_cache.get("Bulk City 4", None) is None
+
+
+@pytest.mark.asyncio
+async def test_bulk_insert_of_nothing_is_a_no_op():
+    async with AsyncSessionLocal() as db:
+        assert await create_data_records(db, []) == []
+
+
+@pytest.mark.asyncio
+async def test_transformed_payloads_are_serialized_once_and_stored_as_is():
+    aggregate = {"sources": {
+        "weather": {"status": "success", "data": [{"city": "Eilat", "temperature_c": 31.0}]},
+        "osint": {"status": "success", "data": {"brand_name": "Gymshark", "posts": [{"text": "כל הכבוד"}]}},
+        "gemini": {"status": "success", "sentiment_summary": "positive", "news_summary": "", "popularity_score": 50.0}
+    }}
+    record = transform_aggregate_to_record(aggregate)
+    assert isinstance(record.raw_osint_response, bytes)
+
+    async with AsyncSessionLocal() as db:
+        [record_id] = await create_data_records(db, [record])
+        payload = await get_record_payload(db, record_id)
+    assert payload.raw_osint_response == aggregate["sources"]["osint"]
+    assert payload.raw_gemini_response["popularity_score"] == 50.0
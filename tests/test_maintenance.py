@@ -0,0 +1,93 @@
+"""
+Tests for partition, retention and compaction maintenance.
+
+SQLite has no native partitioning, so these exercise the row-wise fallback.
+Records are dated in the 1990s so the jobs never touch other tests' data.
+"""
+from datetime import datetime
+import pytest
+from sqlalchemy import select, text
+
+from app.database import engine, init_db
+from app.models.data_record import DataRecord
+from app.models.data_record_payload import DataRecordPayload
+from app.services.data_lifecycle import (
+    add_months,
+    apply_retention,
+    compact_payloads,
+    ensure_partitions,
+    partition_name,
+)
+
+init_db()
+
+NOW = datetime(2000, 1, 1)
+
+
+def _exists(column, value):
+    with engine.connect() as conn:
+        return conn.execute(select(column).where(column == value)).first() is not None
+
+
+def test_partition_helpers():
+    assert partition_name(datetime(2024, 3, 1)) == "data_records_p202403"
+    assert add_months(datetime(2024, 11, 1), 3) == datetime(2025, 2, 1)
+    # Without native partitioning there is nothing to create
+    with engine.begin() as conn:
+        assert ensure_partitions(conn) == []
+
+
+@pytest.mark.asyncio
+async def test_retention_archives_old_records(make_record, save_record):
+    old_id = await save_record(make_record("Archiveville", timestamp=datetime(1995, 5, 1)))
+    recent_id = await save_record(make_record("Archiveville", timestamp=datetime(1999, 12, 1)))
+
+    result = apply_retention(retention_days=365, mode="archive", now=NOW, batch_size=1)
+
+    assert result["rows"] >= 1
+    assert not _exists(DataRecord.id, old_id)
+    assert not _exists(DataRecordPayload.record_id, old_id)
+    assert _exists(DataRecord.id, recent_id)
+    with engine.connect() as conn:
+        archived = conn.execute(text("SELECT city_name FROM data_records_archive WHERE id = :id"), {"id": old_id})
+        assert archived.scalar() == "Archiveville"
+        payloads = conn.execute(
+            text("SELECT COUNT(*) FROM data_record_payloads_archive WHERE record_id = :id"), {"id": old_id}
+        )
+        assert payloads.scalar() == 1
+
+
+@pytest.mark.asyncio
+async def test_retention_drop_mode_deletes_without_archiving(make_record, save_record):
+    old_id = await save_record(make_record("Dropton", timestamp=datetime(1994, 2, 1)))
+
+    apply_retention(retention_days=365, mode="drop", now=NOW)
+
+    assert not _exists(DataRecord.id, old_id)
+    with engine.connect() as conn:
+        archived = conn.execute(text("SELECT COUNT(*) FROM data_records_archive WHERE id = :id"), {"id": old_id})
+        assert archived.scalar() == 0
+
+
+def test_retention_is_disabled_by_default_and_rejects_unknown_modes():
+    assert apply_retention(retention_days=0)["status"] == "disabled"
+    with pytest.raises(ValueError):
+        apply_retention(retention_days=30, mode="shred")
+
+
+@pytest.mark.asyncio
+async def test_compaction_keeps_records_but_removes_raw_payloads(api, make_record, save_record):
+    raw_weather = '{"temp": 12}'
+    old_id = await save_record(make_record("Compactia", timestamp=datetime(1996, 7, 1)))
+    recent_id = await save_record(
+        make_record("Compactia", timestamp=datetime(1999, 11, 1), raw_weather_response=raw_weather)
+    )
+
+    assert compact_payloads(older_than_days=365, now=NOW, batch_size=1) >= 1
+
+    assert _exists(DataRecord.id, old_id)
+    response = await api.get(f"/api/v1/data/{old_id}/raw")
+    assert response.status_code == 410
+    response = await api.get(f"/api/v1/data/{recent_id}/raw")
+    assert response.status_code == 200
+    assert response.json()["raw_weather_response"] == {"temp": 12}
@@ -0,0 +1,127 @@
+"""
+Tests for leader election and shard claiming of the scheduler.
+"""
+import json
+import uuid
+from datetime import datetime, timedelta
+import pytest
+
+from app.database import init_db
+from app.schemas.target import Target
+from app.services import scheduling
+from app.services.scheduling import SchedulerNode, plan_shards, shard_offsets
+
+init_db()
+
+NOW = datetime(2030, 1, 1, 12, 0)
+TARGETS = [
+    Target(city="Tel Aviv Yafo", latitude=32.0853, longitude=34.7818, brand="Gymshark"),
+    Target(city="Haifa", latitude=32.794, longitude=34.9896, brand="Gymshark"),
+    Target(city="Berlin", latitude=52.52, longitude=13.405, brand="Allbirds"),
+    Target(city="Paris", latitude=48.8566, longitude=2.3522, brand="Vinted"),
+]
+
+
+def _nodes(count, **options):
+    # A schedule name per test keeps lease rows and shards apart
+    schedule = f"test-{uuid.uuid4().hex[:8]}"
+    return [SchedulerNode(schedule=schedule, node_id=f"node-{i}", **options) for i in range(count)]
+
+
+def test_shards_keep_brands_together_and_spread_across_interval():
+    shards = plan_shards(TARGETS, shard_size=2)
+    assert [[target.city for target in shard] for shard in shards] == [
+        ["Tel Aviv Yafo", "Haifa"], ["Berlin", "Paris"]
+    ]
+
+    offsets = shard_offsets(4, interval=3600, jitter=60)
+    for index, offset in enumerate(offsets):
+        assert index * 900 <= offset <= index * 900 + 60
+
+
+@pytest.mark.asyncio
+async def test_only_one_node_leads_until_its_lease_expires():
+    first, second = _nodes(2, lease_seconds=30)
+
+    assert await first.acquire_lease(NOW)
+    assert not await second.acquire_lease(NOW + timedelta(seconds=10))
+    # Renewing pushes the expiry forward
+    assert await first.acquire_lease(NOW + timedelta(seconds=20))
+    assert not await second.acquire_lease(NOW + timedelta(seconds=45))
+
+    # The leader stopped renewing: the other node takes over
+    assert await second.acquire_lease(NOW + timedelta(seconds=60))
+    assert not await first.acquire_lease(NOW + timedelta(seconds=61))
+    assert not first.is_leader
+
+    await second.release_lease()
+    assert await first.acquire_lease(NOW + timedelta(seconds=62))
+
+
+@pytest.mark.asyncio
+async def test_leader_plans_one_run_per_interval():
+    leader, follower = _nodes(2, interval_seconds=3600, shard_size=2, jitter_seconds=0)
+    await leader.acquire_lease(NOW)
+
+    assert await follower.plan_run(NOW, targets=TARGETS) == 0
+    assert await leader.plan_run(NOW, targets=TARGETS) == 2
+    assert await leader.plan_run(NOW + timedelta(minutes=30), targets=TARGETS) == 0
+    assert await leader.plan_run(NOW + timedelta(hours=1), targets=TARGETS) == 2
+
+
+@pytest.mark.asyncio
+async def test_due_shards_are_claimed_once_and_reclaimed_when_abandoned():
+    leader, worker = _nodes(2, interval_seconds=3600, shard_size=2, jitter_seconds=0, shard_timeout_seconds=1200)
+    await leader.acquire_lease(NOW)
+    await leader.plan_run(NOW, targets=TARGETS)
+
+    # Only the first shard is due at the start of the run
+    shard = await worker.claim_shard(NOW)
+    assert shard.shard_index == 0 and shard.claimed_by == "node-1"
+    assert json.loads(shard.target_keys) == ["Tel Aviv Yafo|Gymshark", "Haifa|Gymshark"]
+    assert await leader.claim_shard(NOW) is None
+
+    # The worker died with its shard claimed: after the timeout another node picks it up
+    assert await leader.claim_shard(NOW + timedelta(minutes=5)) is None
+    reclaimed = await leader.claim_shard(NOW + timedelta(minutes=21))
+    assert reclaimed.id == shard.id and reclaimed.attempts == 2
+
+    # The second shard is due half way through the interval
+    second = await worker.claim_shard(NOW + timedelta(minutes=30))
+    assert second.shard_index == 1
+
+
+@pytest.mark.asyncio
+async def test_shard_that_keeps_being_abandoned_is_failed():
+    leader, worker = _nodes(
+        2, interval_seconds=3600, shard_size=4, jitter_seconds=0, shard_timeout_seconds=60, shard_max_attempts=2
+    )
+    await leader.acquire_lease(NOW)
+    await leader.plan_run(NOW, targets=TARGETS)
+
+    shard = await worker.claim_shard(NOW)
+    assert (await leader.claim_shard(NOW + timedelta(minutes=2))).attempts == 2
+
+    # Both claims were abandoned: the shard is given up on instead of claimed a third time
+    assert await worker.claim_shard(NOW + timedelta(minutes=4)) is None
+    async with scheduling.AsyncSessionLocal() as db:
+        failed = await db.get(scheduling.ScheduledShard, shard.id)
+    assert failed.status == "failed" and "2 attempts" in failed.error
+
+@pytest.mark.asyncio
+async def test_run_shard_aggregates_its_targets_as_a_job(monkeypatch):
+    leader, = _nodes(1, interval_seconds=3600, shard_size=2, jitter_seconds=0)
+    await leader.acquire_lease(NOW)
+    await leader.plan_run(NOW, targets=TARGETS)
+    aggregated = []
+
+    async def fake_aggregate(targets, client, progress):
+        aggregated.append([target.city for target in targets])
+        return {"target_count": len(targets)}
+
+    monkeypatch.setattr(scheduling, "get_targets", lambda: TARGETS)
+    monkeypatch.setattr("app.services.jobs.aggregate_all_data", fake_aggregate)
+
+    assert await leader.run_due_shards(NOW + timedelta(hours=1)) == 2
+    assert aggregated == [["Tel Aviv Yafo", "Haifa"], ["Berlin", "Paris"]]
+    assert await leader.claim_shard(NOW + timedelta(hours=1)) is None
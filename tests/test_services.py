@@ -0,0 +1,865 @@
+"""
+Tests for the aggregation services.
+"""
+import asyncio
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+
+from app.database import SessionLocal, init_db
+from app.models.osint_state import OsintWatermark, SeenPost
+from app.schemas.target import Target
+from app.services import aggregator, gemini, osint, osint_sources, summarizer, weather
+from app.services.http_client import create_http_client, connection_stats
+from app.services.jobs import RefreshJobManager
+from app.services.osint_state import POST_ID_MAX_LENGTH, load_incremental_state
+from app.services.metrics import meter_response
+from app.services.rate_limit import CircuitOpenError, HostLimiter, RateLimitedTransport, RateLimiterRegistry
+from app.services.llm_cache import LLMCache
+from app.services.prompt_builder import estimate_tokens
+from app.services.weather import fetch_weather_batch
+from app.services.weather_cache import WeatherCache
+
+init_db()
+
+TEL_AVIV = Target(city="Tel Aviv Yafo", latitude=32.0853, longitude=34.7818, brand="Gymshark")
+HAIFA = Target(city="Haifa", latitude=32.794, longitude=34.9896, brand="Gymshark")
+BERLIN = Target(city="Berlin", latitude=52.52, longitude=13.405, brand="Allbirds")
+
+
+@pytest.fixture
+def fake_sources(monkeypatch):
+    """Replace upstream fetchers and Gemini with in-process fakes."""
+    calls = {"weather": [], "osint": [], "gemini": 0}
+
+    async def fake_weather_batch(targets, client=None):
+        calls["weather"].append([target.city for target in targets])
+        return {
+            target.key: [{"source": "open-meteo", "city": target.city, "temperature_c": 20.0}]
+            for target in targets
+        }
+
+    class FakeSource(osint_sources.OsintSource):
+        name = "fake"
+
+        async def stream(self, target, client, since=None, on_truncated=None):
+            calls["osint"].append(target.brand)
+            if target.brand == "Allbirds":
+                await asyncio.sleep(5)
+            yield {"title": "t", "text": "x"}
+
+    async def fake_analyze(text):
+        calls["gemini"] += 1
+        return {"sentiment_summary": "positive", "news_summary": "new drop"}
+
+    monkeypatch.setattr(aggregator, "fetch_weather_batch", fake_weather_batch)
+    monkeypatch.setattr(aggregator, "get_osint_sources", lambda: [FakeSource(timeout=30)])
+    monkeypatch.setattr(aggregator, "analyze_osint_async", fake_analyze)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_aggregate_reports_per_target_results(fake_sources):
+    results = await aggregator.aggregate_all_data(targets=[TEL_AVIV, HAIFA])
+
+    assert results["target_count"] == 2
+    assert results["success_count"] == 2
+    assert [r["city"] for r in results["targets"]] == ["Tel Aviv Yafo", "Haifa"]
+    assert all(r["db_record_id"] is not None for r in results["targets"])
+    assert results["targets"][0]["sources"]["osint"]["records"] == 1
+    # Both cities track the same brand, so OSINT and Gemini run once
+    assert fake_sources["osint"] == ["Gymshark"]
+    assert fake_sources["gemini"] == 1
+
+
+@pytest.mark.asyncio
+async def test_slow_target_times_out_without_blocking_others(fake_sources):
+    results = await aggregator.aggregate_all_data(
+        targets=[TEL_AVIV, BERLIN], target_timeout=0.5
+    )
+
+    by_city = {r["city"]: r for r in results["targets"]}
+    assert by_city["Tel Aviv Yafo"]["db_record_id"] is not None
+    assert by_city["Berlin"]["sources"]["osint"]["status"] == "timeout"
+    assert by_city["Berlin"]["db_record_id"] is None
+    assert results["duration_seconds"] < 5
+
+
+@pytest.mark.asyncio
+async def test_concurrent_refreshes_share_one_job(fake_sources):
+    jobs = RefreshJobManager()
+    job, created = await jobs.submit(targets=[TEL_AVIV, HAIFA])
+    same_job, created_again = await jobs.submit(targets=[HAIFA, TEL_AVIV])
+
+    assert created and not created_again
+    assert same_job is job and job.triggers == 2
+
+    await jobs.wait(job)
+    assert job.status == "succeeded"
+    assert job.result["success_count"] == 2
+    assert fake_sources["gemini"] == 1
+    stages = job.to_dict()["stages"]
+    assert stages["weather"] == {**stages["weather"], "status": "done", "total": 1, "completed": 1}
+    assert stages["gemini"]["completed"] == 1
+    assert all(stage["duration_seconds"] is not None for stage in stages.values())
+
+    # Once finished, the next trigger starts a fresh run
+    next_job, created = await jobs.submit(targets=[TEL_AVIV, HAIFA])
+    assert created and next_job.id != job.id
+    await jobs.wait(next_job)
+
+
+@pytest.mark.asyncio
+async def test_refresh_jobs_are_shared_across_workers(fake_sources, monkeypatch):
+    # Hold the first worker's job in its weather stage until the test has seen it in flight
+    release = asyncio.Event()
+    fetch_weather_batch = aggregator.fetch_weather_batch
+
+    async def blocked_weather_batch(targets, client=None):
+        await release.wait()
+        return await fetch_weather_batch(targets, client=client)
+
+    monkeypatch.setattr(aggregator, "fetch_weather_batch", blocked_weather_batch)
+    first = RefreshJobManager(worker_id="worker-1")
+    second = RefreshJobManager(worker_id="worker-2", poll_seconds=0.05)
+    job, created = await first.submit(targets=[TEL_AVIV, HAIFA])
+    joined, created_again = await second.submit(targets=[HAIFA, TEL_AVIV])
+
+    assert created and not created_again
+    assert joined.id == job.id and joined.worker == "worker-1" and joined.triggers == 2
+    assert (await second.get(job.id)).in_flight
+
+    release.set()
+    await second.wait(joined)
+    assert joined.status == "succeeded"
+    assert joined.result["success_count"] == 2
+    assert joined.to_dict()["stages"]["gemini"]["completed"] == 1
+    assert fake_sources["gemini"] == 1
+
+
+@pytest.mark.asyncio
+async def test_job_of_a_dead_worker_is_failed_and_replaced(fake_sources):
+    dead = RefreshJobManager(worker_id="dead", heartbeat_seconds=3600)
+    job, _ = await dead.submit(targets=[TEL_AVIV])
+    job.task.cancel()
+    # Simulate the worker vanishing: its final save never happens
+    dead._save = lambda *args, **kwargs: asyncio.sleep(0)
+    await asyncio.gather(job.task, return_exceptions=True)
+
+    live = RefreshJobManager(worker_id="live", stale_seconds=0)
+    assert (await live.get(job.id)).status == "failed"
+    next_job, created = await live.submit(targets=[TEL_AVIV])
+    assert created and next_job.id != job.id
+    await live.wait(next_job)
+    assert next_job.status == "succeeded"
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_run_records_stage_metrics(fake_sources):
+    weather_runs = _sample("aggregator_stage_duration_seconds_count", stage="weather_fetch")
+    db_writes = _sample("aggregator_stage_results_total", stage="db_write", status="success")
+    fake_posts = _sample("osint_posts_total", source="fake")
+
+    await aggregator.aggregate_all_data(targets=[TEL_AVIV, HAIFA])
+
+    assert _sample("aggregator_stage_duration_seconds_count", stage="weather_fetch") == weather_runs + 1
+    assert _sample("aggregator_stage_results_total", stage="db_write", status="success") == db_writes + 1
+    assert _sample("osint_posts_total", source="fake") == fake_posts + 1
+
+
+@pytest.mark.asyncio
+async def test_metrics_count_gemini_tokens_and_upstream_bytes(monkeypatch, no_llm_cache):
+    monkeypatch.setattr(gemini, "_client", _FakeGeminiClient(delay=0))
+    prompt_tokens = _sample("gemini_tokens_total", template="combined", kind="prompt")
+
+    await gemini.analyze_osint_async("Post 1: great", mode="combined")
+
+    assert _sample("gemini_tokens_total", template="combined", kind="prompt") == prompt_tokens + 40
+    assert _sample("gemini_calls_total", template="combined", status="success") >= 1
+
+    received = _sample("upstream_response_bytes_total", host="metered.test")
+    async def body():
+        # Streamed like a real network response, rather than preloaded
+        for _ in range(3):
+            yield b"x" * 500
+
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=body()))
+    async with httpx.AsyncClient(transport=transport, event_hooks={"response": [meter_response]}) as client:
+        response = await client.get("https://metered.test/data")
+    assert len(response.content) == 1500
+    assert _sample("upstream_response_bytes_total", host="metered.test") == received + 1500
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_shared_client_reuses_connections():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    connection_stats.reset()
+    try:
+        async with create_http_client(http2=False) as client:
+            for _ in range(5):
+                response = await client.get(url)
+                assert response.status_code == 200
+    finally:
+        server.shutdown()
+
+    stats = connection_stats.as_dict()
+    assert stats["requests"] == 5
+    assert stats["new_connections"] == 1
+    assert stats["reused_connections"] == 4
+
+
+def _limited_client(handler, **limiter_kwargs):
+    limiters = RateLimiterRegistry(host_rates={}, default_rate=1000)
+    limiters._limiters["api.test"] = HostLimiter("api.test", **{"rate": 1000, **limiter_kwargs})
+    transport = RateLimitedTransport(httpx.MockTransport(handler), limiters=limiters, max_retries=3)
+    return httpx.AsyncClient(transport=transport), limiters.get("api.test")
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_transport_retries_after_429(monkeypatch):
+    monkeypatch.setattr("app.services.rate_limit.backoff_delay", lambda attempt: 0.0)
+    statuses = iter([429, 503, 200])
+
+    def handler(request):
+        status = next(statuses)
+        return httpx.Response(status, headers={"Retry-After": "0.05"} if status == 429 else {})
+
+    client, limiter = _limited_client(handler)
+    async with client:
+        start = time.perf_counter()
+        response = await client.get("https://api.test/search")
+    assert response.status_code == 200
+    assert time.perf_counter() - start >= 0.05
+    # A 429 doesn't count towards the circuit breaker, and the success resets it
+    assert limiter.failures == 0
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_learns_from_ratelimit_headers():
+    def handler(request):
+        return httpx.Response(200, headers={"x-ratelimit-remaining": "30", "x-ratelimit-reset": "60"})
+
+    client, limiter = _limited_client(handler)
+    async with client:
+        await client.get("https://api.test/search")
+    assert limiter.rate == pytest.approx(0.5)
+
+    limiter.observe(httpx.Response(200, headers={"x-ratelimit-remaining": "0", "x-ratelimit-reset": "12"}))
+    assert limiter.stats()["paused_seconds"] > 11
+
+    # Without headers, a 429 halves the rate
+    limiter.observe(httpx.Response(429))
+    assert limiter.rate == pytest.approx(0.25)
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_opens_and_recovers(monkeypatch):
+    monkeypatch.setattr("app.services.rate_limit.backoff_delay", lambda attempt: 0.0)
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) <= 4:
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(200)
+
+    client, limiter = _limited_client(handler, failure_threshold=4, reset_seconds=0.1)
+    async with client:
+        with pytest.raises(httpx.ConnectError):
+            await client.get("https://api.test/search")
+        assert limiter.circuit == "open"
+        with pytest.raises(CircuitOpenError):
+            await client.get("https://api.test/search")
+        assert len(calls) == 4
+
+        await asyncio.sleep(0.1)
+        assert limiter.circuit == "half-open"
+        response = await client.get("https://api.test/search")
+    assert response.status_code == 200
+    assert limiter.circuit == "closed"
+
+
+def _half_open(limiter):
+    limiter.failures = limiter.failure_threshold
+    limiter._opened_at = time.monotonic() - limiter.reset_seconds
+
+
+@pytest.mark.asyncio
+async def test_half_open_trial_throttled_by_429_retries_or_reopens(monkeypatch):
+    monkeypatch.setattr("app.services.rate_limit.backoff_delay", lambda attempt: 0.0)
+    statuses = iter([429, 200])
+    client, limiter = _limited_client(lambda request: httpx.Response(next(statuses)), reset_seconds=60)
+    _half_open(limiter)
+    async with client:
+        # The trial's own retry isn't refused by the circuit it holds
+        response = await client.get("https://api.test/search")
+    assert response.status_code == 200
+    assert limiter.circuit == "closed"
+
+    client, limiter = _limited_client(lambda request: httpx.Response(429), reset_seconds=60)
+    _half_open(limiter)
+    async with client:
+        response = await client.get("https://api.test/search")
+        assert response.status_code == 429
+        assert limiter.circuit == "open"
+        assert not limiter._trial_in_flight
+
+
+@pytest.mark.asyncio
+async def test_cancelled_half_open_trial_releases_the_circuit():
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def handler(request):
+        started.set()
+        await release.wait()
+        return httpx.Response(200)
+
+    client, limiter = _limited_client(handler)
+    _half_open(limiter)
+    async with client:
+        trial = asyncio.create_task(client.get("https://api.test/search"))
+        await started.wait()
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        assert limiter.circuit == "half-open"
+        assert not limiter._trial_in_flight
+
+        release.set()
+        response = await client.get("https://api.test/search")
+    assert response.status_code == 200
+    assert limiter.circuit == "closed"
+
+
+class _FakeGeminiResponse:
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = SimpleNamespace(prompt_token_count=40, candidates_token_count=len(text.split()))
+
+
+class _FakeGeminiClient:
+    """Stands in for genai.Client; each async call takes `delay` seconds."""
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.calls = 0
+        self.aio = self
+        self.models = self
+
+    async def generate_content(self, model, contents, config=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if config is not None and config.response_mime_type == "application/json":
+            return _FakeGeminiResponse(
+                '{"sentiment_summary": "Mostly positive.", '
+                '"news_summary": "New collection launched.", "popularity_score": 72}'
+            )
+        return _FakeGeminiResponse(f"summary {self.calls}")
+
+
+@pytest.fixture
+def no_llm_cache(monkeypatch):
+    monkeypatch.setattr(gemini, "llm_cache", LLMCache(enabled=False))
+
+
+@pytest.mark.asyncio
+async def test_gemini_analyses_run_concurrently_on_shared_client(monkeypatch, no_llm_cache):
+    fake_client = _FakeGeminiClient(delay=0.3)
+    created = []
+
+    def fake_initialize():
+        created.append(fake_client)
+        return fake_client
+
+    monkeypatch.setattr(gemini, "_client", None)
+    monkeypatch.setattr(gemini, "initialize_gemini", fake_initialize)
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    await gemini.analyze_osint_async("Post 1: great", mode="separate")
+    await gemini.analyze_osint_async("Post 1: great", mode="separate")
+    elapsed = loop.time() - start
+
+    assert fake_client.calls == 4
+    assert len(created) == 1
+    # Two sequential runs of two concurrent calls, not four sequential calls
+    assert elapsed < 0.3 * 3
+
+
+@pytest.mark.asyncio
+async def test_combined_analysis_returns_validated_popularity(monkeypatch, no_llm_cache):
+    fake_client = _FakeGeminiClient(delay=0)
+    monkeypatch.setattr(gemini, "_client", fake_client)
+
+    analysis = await gemini.analyze_osint_async("Post 1: great", mode="combined")
+
+    assert fake_client.calls == 1
+    assert analysis == {
+        "mode": "combined",
+        "sentiment_summary": "Mostly positive.",
+        "news_summary": "New collection launched.",
+        "popularity_score": 72.0,
+        "cached": False
+    }
+
+
+@pytest.mark.asyncio
+async def test_llm_cache_skips_network_on_repeat_snippets(monkeypatch):
+    fake_client = _FakeGeminiClient(delay=0)
+    monkeypatch.setattr(gemini, "_client", fake_client)
+    monkeypatch.setattr(gemini, "llm_cache", LLMCache(persist=True))
+
+    first = await gemini.analyze_osint_async("Post 1:  cache me", mode="combined")
+    # Whitespace-only changes map to the same key
+    second = await gemini.analyze_osint_async("Post 1: cache me ", mode="combined")
+
+    assert fake_client.calls == 1
+    assert first["cached"] is False
+    assert second["cached"] is True
+    assert gemini.llm_cache.stats()["memory_hits"] == 1
+
+    # A fresh process still hits the database tier
+    monkeypatch.setattr(gemini, "llm_cache", LLMCache(persist=True))
+    third = await gemini.analyze_osint_async("Post 1: cache me", mode="combined")
+    assert third["cached"] is True
+    assert fake_client.calls == 1
+    assert gemini.llm_cache.stats()["db_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_llm_cache_keeps_only_parseable_responses(monkeypatch):
+    fake_client = _FakeGeminiClient(delay=0)
+    answers = iter([
+        _FakeGeminiResponse('{"sentiment_summary": "Trunc'),
+        SimpleNamespace(text=None, usage_metadata=None),
+    ])
+    real_generate = fake_client.generate_content
+
+    async def flaky_generate(model, contents, config=None):
+        answer = next(answers, None)
+        return answer if answer is not None else await real_generate(model, contents, config)
+
+    monkeypatch.setattr(fake_client, "generate_content", flaky_generate)
+    monkeypatch.setattr(gemini, "_client", fake_client)
+    monkeypatch.setattr(gemini, "llm_cache", LLMCache(persist=False))
+
+    # A truncated structured response and an empty one fail without being cached
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            await gemini._analyze_combined_cached("Post 1: flaky")
+        assert gemini.llm_cache.stats()["memory_entries"] == 0
+
+    analysis, cached = await gemini._analyze_combined_cached("Post 1: flaky")
+    assert (analysis.popularity_score, cached) == (72.0, False)
+    analysis, cached = await gemini._analyze_combined_cached("Post 1: flaky")
+    assert cached is True
+
+
+def test_llm_cache_evicts_least_recently_used():
+    cache = LLMCache(persist=False, max_entries=2)
+    for key in ("a", "b"):
+        asyncio.run(cache.set(key, key.upper(), model="m", template="t"))
+    assert asyncio.run(cache.get("a")) == "A"
+    asyncio.run(cache.set("c", "C", model="m", template="t"))
+
+    assert asyncio.run(cache.get("b")) is None
+    assert asyncio.run(cache.get("a")) == "A"
+    assert cache.stats()["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_large_post_volumes_are_map_reduced(monkeypatch):
+    calls = {"map": 0, "reduce": 0}
+
+    async def fake_map(text):
+        calls["map"] += 1
+        assert estimate_tokens(text) <= 300
+        return "- " + "point " * 30
+
+    async def fake_reduce(text):
+        calls["reduce"] += 1
+        return "- merged"
+
+    monkeypatch.setattr(summarizer, "summarize_chunk_async", fake_map)
+    monkeypatch.setattr(summarizer, "reduce_summaries_async", fake_reduce)
+    posts = [{"title": f"Post title {i}", "text": "word " * 50} for i in range(100)]
+
+    text, stats = await summarizer.prepare_analysis_input(posts, max_tokens=300, fan_in=4)
+
+    assert stats["chunks"] == calls["map"] > 1
+    assert stats["reduce_rounds"] >= 1
+    assert calls["reduce"] > 0
+    assert estimate_tokens(text) <= 300
+
+    small_text, small_stats = await summarizer.prepare_analysis_input(posts[:2], max_tokens=300)
+    assert small_stats["chunks"] == 1 and "Post 2:" in small_text
+
+
+@pytest.mark.asyncio
+async def test_weather_batches_group_targets_by_location(fake_sources):
+    targets = [
+        Target(city=f"City {i}", latitude=float(i), longitude=float(i), brand="Gymshark")
+        for i in range(5)
+    ] + [HAIFA.model_copy(update={"city": "Haifa Port", "brand": "Nike"}), HAIFA]
+
+    results = await aggregator.aggregate_all_data(targets=targets, weather_batch_size=2)
+
+    # 6 unique locations in batches of 2; both Haifa targets share one batch
+    assert len(fake_sources["weather"]) == 3
+    assert ["Haifa Port", "Haifa"] in [batch[-2:] for batch in fake_sources["weather"]]
+    assert all(r["sources"]["weather"]["status"] == "success" for r in results["targets"])
+
+
+@pytest.fixture
+def fresh_weather_cache(monkeypatch):
+    cache = WeatherCache(enabled=True, shared=False)
+    monkeypatch.setattr(weather, "weather_cache", cache)
+    return cache
+
+
+@pytest.mark.asyncio
+async def test_fetch_weather_batch_maps_entries_back_to_cities(fresh_weather_cache):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        latitudes = request.url.params["latitude"].split(",")
+        return httpx.Response(200, json=[
+            {"current": {"temperature_2m": 10.0 + i, "weather_code": 0}}
+            for i in range(len(latitudes))
+        ])
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        records = await fetch_weather_batch([TEL_AVIV, HAIFA, BERLIN], client=client)
+
+    assert len(requests) == 1
+    assert requests[0].url.params["latitude"] == "32.0853,32.794,52.52"
+    assert records[HAIFA.key][0]["city"] == "Haifa"
+    assert records[HAIFA.key][0]["temperature_c"] == 11.0
+    assert records[BERLIN.key][0]["weather_description"] == "Clear sky"
+
+
+@pytest.mark.asyncio
+async def test_weather_cache_serves_until_upstream_update(monkeypatch, fresh_weather_cache):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={
+            "current": {"time": int(time.time()) - 60, "interval": 900, "temperature_2m": 21.5, "weather_code": 1}
+        })
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        first = await fetch_weather_batch([TEL_AVIV], client=client)
+        second = await fetch_weather_batch([TEL_AVIV.model_copy(update={"brand": "Nike"})], client=client)
+
+    assert len(requests) == 1
+    assert requests[0].url.params["timeformat"] == "unixtime"
+    assert first[TEL_AVIV.key][0]["cache"]["hit"] is False
+    cached = second["Tel Aviv Yafo|Nike"][0]
+    assert cached["temperature_c"] == 21.5
+    assert cached["cache"]["hit"] is True
+    assert cached["cache"]["tier"] == "memory"
+    assert cached["cache"]["age_seconds"] >= 0
+
+
+@pytest.mark.asyncio
+async def test_weather_cache_shared_tier_is_reused_across_workers():
+    current = {"time": int(time.time()), "interval": 900, "temperature_2m": 18.0}
+    key = "1.0,2.0|temperature_2m"
+    worker_a = WeatherCache(enabled=True, shared=True)
+    worker_b = WeatherCache(enabled=True, shared=True)
+
+    await worker_a.set_many({key: current}, fetched_at=datetime.utcnow())
+    found = await worker_b.get_many([key])
+
+    assert found[key].tier == "shared"
+    assert found[key].current == current
+
+
+def _reddit_page(start, count, after):
+    return {"data": {"after": after, "children": [
+        {"kind": "t3", "data": {"title": f"Post {i}", "selftext": "body", "created_utc": time.time()}}
+        for i in range(start, start + count)
+    ]}}
+
+
+@pytest.mark.asyncio
+async def test_reddit_collector_follows_after_cursor():
+    requests = []
+
+    def handler(request):
+        requests.append(dict(request.url.params))
+        after = request.url.params.get("after")
+        if after is None:
+            return httpx.Response(200, json=_reddit_page(0, 3, "t3_page2"))
+        if after == "t3_page2":
+            return httpx.Response(200, json=_reddit_page(3, 3, "t3_page3"))
+        return httpx.Response(200, json=_reddit_page(6, 3, None))
+
+    truncated = []
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        titles = [post["title"] async for post in osint.iter_reddit_posts(
+            "gymshark", client=client, max_posts=7, page_size=3, on_truncated=lambda: truncated.append(True)
+        )]
+
+    assert titles == [f"Post {i}" for i in range(7)]
+    assert [r.get("after") for r in requests] == [None, "t3_page2", "t3_page3"]
+    # The last page only asks for what's still needed
+    assert requests[-1]["limit"] == "1"
+    # Stopping at the cap leaves older posts unread
+    assert truncated == [True]
+
+
+@pytest.mark.asyncio
+async def test_streaming_builder_maps_chunks_before_collection_ends(monkeypatch):
+    mapped = []
+
+    async def fake_map(text):
+        mapped.append(text)
+        return "- point"
+
+    monkeypatch.setattr(summarizer, "summarize_chunk_async", fake_map)
+    builder = summarizer.StreamingPromptBuilder(max_tokens=100)
+
+    for i in range(6):
+        builder.add({"title": f"Post title {i}", "text": "word " * 40})
+        await asyncio.sleep(0)
+
+    # Earlier chunks are already being summarized while posts keep arriving
+    assert len(mapped) >= 4
+    text, stats = await builder.finish()
+    assert stats["chunks"] == len(mapped) == 6
+    assert text.startswith("Summary 1:")
+
+
+@pytest.mark.asyncio
+async def test_incremental_run_skips_already_ingested_posts(monkeypatch, fresh_weather_cache):
+    brand = f"Incremental{time.time_ns()}"
+    target = Target(city="Tel Aviv Yafo", latitude=32.0853, longitude=34.7818, brand=brand)
+    now = time.time()
+    posts = [
+        {"kind": "t3", "data": {"name": f"t3_{i}", "title": f"Post {i}", "selftext": "", "created_utc": now - i}}
+        for i in range(3)
+    ]
+    analyzed = []
+
+    async def fake_weather_batch(targets, client=None):
+        return {t.key: [{"source": "open-meteo", "city": t.city, "temperature_c": 20.0}] for t in targets}
+
+    async def fake_analyze(text):
+        analyzed.append(text)
+        return {"sentiment_summary": "positive", "news_summary": "new drop", "popularity_score": 60.0}
+
+    monkeypatch.setattr(aggregator, "fetch_weather_batch", fake_weather_batch)
+    monkeypatch.setattr(aggregator, "analyze_osint_async", fake_analyze)
+
+    def handler(request):
+        return httpx.Response(200, json={"data": {"after": None, "children": posts}})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        sources = [osint_sources.RedditSource()]
+        first = await aggregator.aggregate_all_data(targets=[target], client=client, sources=sources)
+        second = await aggregator.aggregate_all_data(targets=[target], client=client, sources=sources)
+
+    assert first["targets"][0]["sources"]["osint"]["new_posts"] == 3
+    sources = second["targets"][0]["sources"]
+    assert sources["osint"]["new_posts"] == 0
+    assert sources["gemini"]["status"] == "unchanged"
+    assert sources["gemini"]["popularity_score"] == 60.0
+    assert second["targets"][0]["db_record_id"] is not None
+    # Gemini only ran for the first batch of posts
+    assert len(analyzed) == 1
+
+
+@pytest.mark.asyncio
+async def test_capped_reddit_run_keeps_its_watermark(monkeypatch, fresh_weather_cache):
+    brand = f"Capped{time.time_ns()}"
+    target = Target(city="Tel Aviv Yafo", latitude=32.0853, longitude=34.7818, brand=brand)
+    now = time.time()
+    posts = [
+        {"kind": "t3", "data": {"name": f"t3_{i}", "title": f"Post {i}", "selftext": "", "created_utc": now - i}}
+        for i in range(5)
+    ]
+
+    class CappedReddit(osint_sources.RedditSource):
+        def stream(self, target, client, since=None, on_truncated=None):
+            return osint.iter_reddit_posts(
+                target.search_query, client=client, max_posts=2, since=since, on_truncated=on_truncated
+            )
+
+    async def fake_weather_batch(targets, client=None):
+        return {t.key: [{"source": "open-meteo", "city": t.city, "temperature_c": 20.0}] for t in targets}
+
+    async def fake_analyze(text):
+        return {"sentiment_summary": "positive", "news_summary": "new drop", "popularity_score": 60.0}
+
+    monkeypatch.setattr(aggregator, "fetch_weather_batch", fake_weather_batch)
+    monkeypatch.setattr(aggregator, "analyze_osint_async", fake_analyze)
+
+    def handler(request):
+        return httpx.Response(200, json={"data": {"after": None, "children": posts}})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        results = await aggregator.aggregate_all_data(targets=[target], client=client, sources=[CappedReddit()])
+
+    report = results["targets"][0]["sources"]["osint"]["sources"]["reddit"]
+    assert report["status"] == "success" and report["truncated"]
+    # The posts it did read are marked seen, but the watermark stays put for the rest
+    state = await load_incremental_state(brand, "reddit")
+    assert state.watermark is None
+    assert state.seen_ids == {"t3_0", "t3_1"}
+
+
+def test_stored_posts_keep_the_newest_trimmed_sample():
+    stored = aggregator.StoredPosts(max_posts=3, max_text_chars=10)
+    for i in (5, 1, 9, 3, 7, 2):
+        stored.add({"id": f"t3_{i}", "created_utc": float(i), "text": "x" * 50})
+
+    posts = stored.newest_first()
+    assert [post["id"] for post in posts] == ["t3_9", "t3_7", "t3_5"]
+    assert all(len(post["text"]) == 10 for post in posts)
+    assert stored.count == 6
+    assert stored.truncated
+
+
+RSS_FEED = """<?xml version="1.0"?>
+<rss version="2.0"><channel><title>News</title>
+<item><guid>a1</guid><title>Gymshark opens a London store</title>
+<description>&lt;b&gt;Gymshark&lt;/b&gt; expands retail</description>
+<pubDate>Mon, 06 Jan 2025 10:00:00 GMT</pubDate></item>
+<item><guid>a2</guid><title>Unrelated headline</title><description>Other news</description>
+<pubDate>Mon, 06 Jan 2025 09:00:00 GMT</pubDate></item>
+</channel></rss>"""
+
+
+@pytest.mark.asyncio
+async def test_long_post_ids_are_hashed_to_fit_the_state_tables():
+    brand = f"LongGuid{time.time_ns()}"
+    guid = "https://news.google.com/rss/articles/" + "CBMi" * 60 + "?oc=5"
+    state = await load_incremental_state(brand, "rss")
+    assert state.is_new({"id": guid, "created_utc": time.time()})
+    await state.commit()
+
+    with SessionLocal() as db:
+        watermark = db.query(OsintWatermark).filter_by(brand_name=brand, source="rss").one()
+        stored = [post_id for (post_id,) in db.query(SeenPost.post_id).filter_by(brand_name=brand)]
+    assert len(watermark.last_post_id) <= POST_ID_MAX_LENGTH
+    assert stored == [watermark.last_post_id]
+
+    state = await load_incremental_state(brand, "rss")
+    assert not state.is_new({"id": guid, "created_utc": time.time()})
+
+
+@pytest.mark.asyncio
+async def test_concurrent_runs_storing_the_same_posts_both_commit():
+    brand = f"Overlap{time.time_ns()}"
+    now = time.time()
+    first, second = [await load_incremental_state(brand, "reddit") for _ in range(2)]
+    for state in (first, second):
+        assert state.is_new({"id": "t3_shared", "created_utc": now})
+    assert second.is_new({"id": "t3_newer", "created_utc": now + 60})
+
+    await first.commit()
+    # The shared post is already stored; the second run still advances the watermark
+    await second.commit()
+
+    state = await load_incremental_state(brand, "reddit")
+    assert state.seen_ids == {"t3_shared", "t3_newer"}
+    assert state.watermark == now + 60
+
+
+class StubTrendReq:
+    """Stand-in for pytrends.request.TrendReq."""
+
+    def __init__(self, **kwargs):
+        pass
+
+    def build_payload(self, kw_list, timeframe, geo):
+        self.query = kw_list[0]
+
+    def interest_over_time(self):
+        import pandas as pd
+        index = pd.to_datetime(["2025-01-05", "2025-01-06"])
+        return pd.DataFrame({self.query: [40, 80], "isPartial": [False, True]}, index=index)
+
+    def related_queries(self):
+        import pandas as pd
+        return {self.query: {"top": None, "rising": pd.DataFrame({"query": ["gymshark sale"], "value": [300]})}}
+
+
+@pytest.mark.asyncio
+async def test_sources_run_concurrently_and_slow_source_times_out(monkeypatch):
+    monkeypatch.setattr(osint_sources, "TrendReq", StubTrendReq)
+
+    async def handler(request):
+        if request.url.host == "feeds.test":
+            return httpx.Response(200, text=RSS_FEED)
+        await asyncio.sleep(5)  # Reddit stand-in never answers in time
+        return httpx.Response(200, json={"data": {"after": None, "children": []}})
+
+    sources = [
+        osint_sources.RedditSource(timeout=0.5),
+        osint_sources.RssSource(timeout=5, feed_urls=["https://feeds.test/all.xml"]),
+        osint_sources.TrendsSource(timeout=5),
+    ]
+    posts = []
+    started = time.perf_counter()
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        report = await osint_sources.collect_from_sources(TEL_AVIV, sources, client, posts.append)
+
+    assert time.perf_counter() - started < 2
+    assert report["reddit"]["status"] == "timeout"
+    assert report["rss"] == {**report["rss"], "status": "success", "posts": 1}
+    assert report["trends"]["status"] == "success"
+    by_source = {post["source"]: post for post in posts}
+    # Feeds without a {query} placeholder are filtered to entries mentioning the brand
+    assert by_source["rss"]["text"] == "Gymshark expands retail"
+    assert "latest 80/100" in by_source["trends"]["text"]
+    assert "gymshark sale" in by_source["trends"]["text"]
+
+
+@pytest.mark.asyncio
+async def test_overall_deadline_cancels_remaining_sources():
+    class SlowSource(osint_sources.OsintSource):
+        name = "slow"
+
+        async def stream(self, target, client, since=None, on_truncated=None):
+            yield {"id": "1", "title": "early", "text": ""}
+            await asyncio.sleep(5)
+            yield {"id": "2", "title": "late", "text": ""}
+
+    posts = []
+    report = await osint_sources.collect_from_sources(
+        TEL_AVIV, [SlowSource(timeout=10)], client=None, on_post=posts.append, deadline=0.2
+    )
+
+    assert report["slow"]["status"] == "timeout"
+    # Posts that arrived before the deadline are kept
+    assert [post["title"] for post in posts] == ["early"]